@@ -1,34 +1,53 @@
 import os
 import sys
+import hmac
 import json
+import time
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+from flask import (
+    Flask, render_template, request, redirect, url_for, flash, session, jsonify, Response, g,
+    before_render_template, template_rendered
+)
 from werkzeug.security import generate_password_hash, check_password_hash
 from functools import wraps
-import pandas as pd
-import numpy as np
 
-from utils.db_connect import get_db_connection, execute_query
+from utils.db_connect import execute_query, get_pool
+from utils.query_profile import SLOW_QUERY_MS, top_statements, slow_queries
 from utils.helpers import (
     validate_gmail, validate_mobile, validate_password, validate_name,
-    validate_prediction_input, get_aqi_category, sanitize_float,
-    FEATURE_ORDER, get_ist_timestamp, validate_csv_columns
+    validate_prediction_input, get_aqi_category, categorize_aqi,
+    FEATURE_ORDER, get_ist_timestamp
+)
+from utils.preprocess import preprocess_data, load_preprocessor
+from utils.ingest import ingest_airdata, read_airdata_csv
+from utils.dashboard_stats import get_dashboard_stats, invalidate_dashboard_stats
+from utils.instrumentation import (
+    METRICS_ENABLED, request_started, request_finished, count_response, observe_phase, render_prometheus
 )
-from utils.preprocess import preprocess_data, prepare_training_data, load_preprocessor
-from utils.metrics import calculate_all_metrics
 
-from ml.train_linear import train_linear_regression, load_linear_model, predict_with_linear
-from ml.train_randomforest import train_random_forest, load_rf_model, predict_with_rf, get_feature_importance as get_rf_importance
-from ml.train_xgboost import train_xgboost, load_xgb_model, predict_with_xgb, get_feature_importance as get_xgb_importance
-from ml.compare_models import compare_models, get_best_model, get_latest_metrics_per_model
+from ml.train_linear import load_linear_model, predict_with_linear
+from ml.train_randomforest import load_rf_model, predict_with_rf
+from ml.train_xgboost import load_xgb_model, predict_with_xgb
+from ml.batch_predict import (
+    MODEL_PREDICTORS, DEFAULT_MODEL, load_batch_input, predict_batch, save_batch_predictions
+)
+from ml.microbatch import Overloaded, get_batcher, get_microbatch_stats
+from ml.prediction_cache import cached_predict, get_prediction_cache
+from ml.prediction_log import get_prediction_log
+from ml.training_jobs import enqueue_training_job, get_training_job
+from ml.insights import get_insights_snapshot, InsightsDelta
+from ml.compare_models import compare_models, get_best_model
 
 from database.init_postgres import init_database
 
 app = Flask(__name__)
 app.secret_key = os.environ.get('SESSION_SECRET', 'aurora-air-secret-key-2024')
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
+app.config['UPLOAD_DATASET_MAX_CONTENT_LENGTH'] = int(os.environ.get('UPLOAD_DATASET_MAX_MB', '1024')) * 1024 * 1024
+app.config['UPLOAD_STREAM_MAX_CONTENT_LENGTH'] = int(os.environ.get('UPLOAD_STREAM_MAX_MB', '20480')) * 1024 * 1024
+app.config['PREDICT_BATCH_MAX_CONTENT_LENGTH'] = int(os.environ.get('PREDICT_BATCH_MAX_MB', '64')) * 1024 * 1024
 
 UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), 'uploads')
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
@@ -58,34 +77,35 @@ def admin_required(f):
     return decorated_function
 
 
-def get_dashboard_stats():
-    try:
-        predictions_count = execute_query(
-            "SELECT COUNT(*) as count FROM predictions",
-            fetchone=True
-        )
-        models_count = execute_query(
-            "SELECT COUNT(DISTINCT modelname) as count FROM modelperformance",
-            fetchone=True
-        )
-        data_count = execute_query(
-            "SELECT COUNT(*) as count FROM airdata",
-            fetchone=True
-        )
-        users_count = execute_query(
-            "SELECT COUNT(*) as count FROM users",
-            fetchone=True
-        )
-        
-        return {
-            'total_predictions': predictions_count['count'] if predictions_count else 0,
-            'models_trained': models_count['count'] if models_count else 0,
-            'data_records': data_count['count'] if data_count else 0,
-            'total_users': users_count['count'] if users_count else 0
-        }
-    except Exception as e:
-        print(f"Error getting stats: {e}")
-        return {'total_predictions': 0, 'models_trained': 0, 'data_records': 0, 'total_users': 0}
+def upload_limit(config_key):
+    """Override MAX_CONTENT_LENGTH for one route with the limit in app.config[config_key]."""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            request.max_content_length = app.config[config_key]
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+def api_login_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            return jsonify({'error': 'Authentication required.'}), 401
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def log_prediction(user_id, model_name, features, aqi_pred, category):
+    get_prediction_log().log(
+        (user_id, model_name,
+         features['Temperature'], features['Humidity'],
+         features['PM2_5'], features['PM10'],
+         features['CO'], features['NO2'],
+         features['SO2'], features['O3'],
+         float(aqi_pred), category)
+    )
 
 
 @app.route('/')
@@ -144,6 +164,7 @@ def register():
                    VALUES (%s, %s, %s, %s, 'User')""",
                 (name, email, mobile, password_hash)
             )
+            invalidate_dashboard_stats()
             
             flash('Registration successful! Please login.', 'success')
             return redirect(url_for('login'))
@@ -217,9 +238,10 @@ def dashboard():
             fetch=True
         )
         
-        for pred in recent_predictions or []:
-            _, color, _ = get_aqi_category(pred['predictedaqi'])
-            pred['color'] = color
+        if recent_predictions:
+            _, _, colors = categorize_aqi([pred['predictedaqi'] for pred in recent_predictions])
+            for pred, color in zip(recent_predictions, colors):
+                pred['color'] = color
             
     except Exception as e:
         recent_predictions = []
@@ -271,28 +293,20 @@ def predict():
                 flash('Models not trained yet. Please ask admin to train models first.', 'warning')
                 return render_template('predict.html', prediction=None)
             
-            X = preprocess_data(features)
-            
-            if model_choice == 'Linear Regression':
-                aqi_pred = predict_with_linear(X)[0]
-            elif model_choice == 'Random Forest':
-                aqi_pred = predict_with_rf(X)[0]
-            else:
-                aqi_pred = predict_with_xgb(X)[0]
+            def predict_row(row):
+                X = preprocess_data(dict(zip(FEATURE_ORDER, row)), preprocessor=preprocessor)
+                if model_choice == 'Linear Regression':
+                    return predict_with_linear(X)[0]
+                elif model_choice == 'Random Forest':
+                    return predict_with_rf(X)[0]
+                else:
+                    return predict_with_xgb(X)[0]
+
+            aqi_pred = cached_predict(model_choice, [features[f] for f in FEATURE_ORDER], predict_row)
             
             category, color, message = get_aqi_category(aqi_pred)
             
-            execute_query(
-                """INSERT INTO predictions 
-                   (userid, modelused, temperature, humidity, pm2_5, pm10, co, no2, so2, o3, predictedaqi, category)
-                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
-                (session['user_id'], model_choice, 
-                 features['Temperature'], features['Humidity'],
-                 features['PM2_5'], features['PM10'],
-                 features['CO'], features['NO2'],
-                 features['SO2'], features['O3'],
-                 float(aqi_pred), category)
-            )
+            log_prediction(session['user_id'], model_choice, features, aqi_pred, category)
             
             prediction = {
                 'aqi': float(aqi_pred),
@@ -314,6 +328,143 @@ def predict():
     return render_template('predict.html', prediction=prediction)
 
 
+@app.route('/api/predict', methods=['POST'])
+@api_login_required
+def api_predict():
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'Request body must be a JSON object.'}), 400
+
+    model_choice = payload.get('model', DEFAULT_MODEL)
+    if model_choice not in MODEL_PREDICTORS:
+        return jsonify({'error': f"Unknown model. Choose one of: {', '.join(MODEL_PREDICTORS)}"}), 400
+
+    source = payload.get('features', payload)
+    if not isinstance(source, dict):
+        return jsonify({'error': 'features must be a JSON object.'}), 400
+
+    features = {}
+    errors = []
+    for feature in FEATURE_ORDER:
+        value = source.get(feature, source.get(feature.lower()))
+        valid, converted, msg = validate_prediction_input(value, feature)
+        if not valid:
+            errors.append(msg)
+        else:
+            features[feature] = converted
+
+    if errors:
+        return jsonify({'errors': errors}), 400
+
+    model_loader = {
+        'Linear Regression': load_linear_model,
+        'Random Forest': load_rf_model,
+        'XGBoost': load_xgb_model
+    }[model_choice]
+    if load_preprocessor() is None or model_loader() is None:
+        return jsonify({'error': 'Models not trained yet.'}), 503
+
+    try:
+        aqi_pred = cached_predict(model_choice, [features[f] for f in FEATURE_ORDER],
+                                  get_batcher(model_choice).predict)
+    except Overloaded as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        print(f"API prediction error: {e}")
+        return jsonify({'error': 'Prediction failed.'}), 500
+
+    category, color, message = get_aqi_category(aqi_pred)
+
+    try:
+        log_prediction(session['user_id'], model_choice, features, aqi_pred, category)
+    except Exception as e:
+        print(f"API prediction error: {e}")
+        return jsonify({'error': 'Prediction failed.'}), 500
+
+    return jsonify({
+        'aqi': aqi_pred,
+        'category': category,
+        'color': color,
+        'message': message,
+        'model': model_choice,
+        'timestamp': get_ist_timestamp()
+    })
+
+
+@app.route('/api/predict/stats')
+@admin_required
+def api_predict_stats():
+    return jsonify({
+        'batchers': get_microbatch_stats(),
+        'prediction_cache': get_prediction_cache().stats(),
+        'prediction_log': get_prediction_log().stats()
+    })
+
+
+@app.route('/admin/queries')
+@admin_required
+def admin_queries():
+    limit = request.args.get('limit', 20, type=int)
+    sort = request.args.get('sort', 'total_ms')
+    return jsonify({
+        'slow_query_ms': SLOW_QUERY_MS,
+        'statements': top_statements(limit, sort),
+        'slow_queries': slow_queries(limit)
+    })
+
+
+@app.route('/predict_batch', methods=['POST'])
+@login_required
+@upload_limit('PREDICT_BATCH_MAX_CONTENT_LENGTH')
+def predict_batch_route():
+    model_choice = request.values.get('model', DEFAULT_MODEL)
+    if model_choice not in MODEL_PREDICTORS:
+        model_choice = DEFAULT_MODEL
+
+    def batch_error(message, status=400):
+        if request.is_json:
+            return jsonify({'error': message}), status
+        flash(message, 'error')
+        return redirect(url_for('predict'))
+
+    try:
+        if request.is_json:
+            payload = request.get_json(silent=True)
+            if payload is None:
+                return batch_error('Request body must be valid JSON.')
+            df = load_batch_input(payload)
+        else:
+            file = request.files.get('file')
+            if file is None or file.filename == '':
+                return batch_error('No file selected.')
+            if not file.filename.lower().endswith(('.csv', '.json')):
+                return batch_error('Only CSV or JSON files are allowed.')
+            df = load_batch_input(file.stream, file.filename)
+    except ValueError as e:
+        # Malformed JSON/CSV (json and pandas parser errors are ValueErrors too).
+        return batch_error(str(e), 400)
+
+    try:
+        result, rejected = predict_batch(df, model_choice)
+        save_batch_predictions(session['user_id'], model_choice, result)
+        invalidate_dashboard_stats()
+
+    except ValueError as e:
+        return batch_error(str(e))
+    except Exception as e:
+        print(f"Batch prediction error: {e}")
+        return batch_error('Batch prediction failed. Please try again.', 500)
+
+    return Response(
+        result.to_csv(index=False),
+        mimetype='text/csv',
+        headers={
+            'Content-Disposition': 'attachment; filename=aqi_predictions.csv',
+            'X-Rejected-Rows': str(rejected)
+        }
+    )
+
+
 @app.route('/compare')
 @login_required
 def compare():
@@ -355,55 +506,20 @@ def insights():
     aqi_distribution = json.dumps({})
     
     try:
-        data_count = execute_query(
-            "SELECT COUNT(*) as count FROM airdata",
-            fetchone=True
-        )
+        snapshot = get_insights_snapshot()
         
-        if data_count and data_count['count'] > 0:
+        if snapshot and snapshot['rows'] > 0:
             has_data = True
             
-            xgb_imp = get_xgb_importance()
-            if xgb_imp:
-                xgb_importance = json.dumps(xgb_imp)
+            if snapshot['xgb_importance']:
+                xgb_importance = json.dumps(snapshot['xgb_importance'])
             
-            rf_imp = get_rf_importance()
-            if rf_imp:
-                rf_importance = json.dumps(rf_imp)
-            
-            data = execute_query(
-                f"""SELECT temperature, humidity, pm2_5, pm10, co, no2, so2, o3, aqi
-                    FROM airdata""",
-                fetch=True
-            )
+            if snapshot['rf_importance']:
+                rf_importance = json.dumps(snapshot['rf_importance'])
             
-            if data:
-                df = pd.DataFrame(data)
-                df.columns = [col.lower() for col in df.columns]
-                
-                feature_cols = ['temperature', 'humidity', 'pm2_5', 'pm10', 'co', 'no2', 'so2', 'o3']
-                
-                for col in feature_cols:
-                    if col in df.columns:
-                        stats = {
-                            'feature': col.upper().replace('_', '.'),
-                            'mean': float(df[col].mean()),
-                            'std': float(df[col].std()),
-                            'min': float(df[col].min()),
-                            'max': float(df[col].max())
-                        }
-                        data_stats.append(stats)
-                
-                if all(col in df.columns for col in feature_cols):
-                    corr = df[feature_cols].corr().values.tolist()
-                    correlation_matrix = json.dumps(corr)
-                
-                if 'aqi' in df.columns:
-                    dist = {}
-                    for aqi in df['aqi']:
-                        cat, _, _ = get_aqi_category(aqi)
-                        dist[cat] = dist.get(cat, 0) + 1
-                    aqi_distribution = json.dumps(dist)
+            data_stats = snapshot['data_stats']
+            correlation_matrix = json.dumps(snapshot['correlation_matrix'])
+            aqi_distribution = json.dumps(snapshot['aqi_distribution'])
                     
     except Exception as e:
         print(f"Error fetching insights: {e}")
@@ -433,9 +549,10 @@ def admin():
             fetch=True
         )
         
-        for pred in predictions_log or []:
-            _, color, _ = get_aqi_category(pred['predictedaqi'])
-            pred['color'] = color
+        if predictions_log:
+            _, _, colors = categorize_aqi([pred['predictedaqi'] for pred in predictions_log])
+            for pred, color in zip(predictions_log, colors):
+                pred['color'] = color
             
         users_list = execute_query(
             "SELECT userid, name, email, mobile, role, createdat FROM users ORDER BY createdat DESC",
@@ -455,6 +572,7 @@ def admin():
 
 @app.route('/upload_dataset', methods=['POST'])
 @admin_required
+@upload_limit('UPLOAD_DATASET_MAX_CONTENT_LENGTH')
 def upload_dataset():
     if 'file' not in request.files:
         flash('No file uploaded.', 'error')
@@ -471,51 +589,20 @@ def upload_dataset():
         return redirect(url_for('admin'))
     
     try:
-        df = pd.read_csv(file)
-        
-        valid, msg = validate_csv_columns(df.columns.tolist())
-        if not valid:
-            flash(msg, 'error')
-            return redirect(url_for('admin'))
-        
-        column_mapping = {}
-        for col in df.columns:
-            col_clean = col.strip().lower().replace(' ', '_')
-            for feature in FEATURE_ORDER + ['AQI']:
-                if col_clean == feature.lower().replace(' ', '_'):
-                    column_mapping[col] = feature
-                    break
-        
-        df = df.rename(columns=column_mapping)
-        
-        for col in FEATURE_ORDER + ['AQI']:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-        
-        df = df.dropna(subset=FEATURE_ORDER + ['AQI'])
-        
-        if len(df) == 0:
+        insights_delta = InsightsDelta()
+        result = ingest_airdata(read_airdata_csv(file.stream), on_chunk=insights_delta.add_chunk,
+                                before_commit=insights_delta.apply)
+        invalidate_dashboard_stats()
+
+        if result['rows'] == 0:
             flash('No valid data rows after cleaning.', 'error')
             return redirect(url_for('admin'))
+
+        flash(f"Successfully uploaded {result['rows']} records "
+              f"({result['rejected']} rejected, {result['rows_per_sec']:,.0f} rows/sec).", 'success')
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        for _, row in df.iterrows():
-            cursor.execute(
-                """INSERT INTO airdata (temperature, humidity, pm2_5, pm10, co, no2, so2, o3, aqi)
-                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)""",
-                (float(row['Temperature']), float(row['Humidity']),
-                 float(row['PM2_5']), float(row['PM10']),
-                 float(row['CO']), float(row['NO2']),
-                 float(row['SO2']), float(row['O3']),
-                 float(row['AQI']))
-            )
-        
-        conn.commit()
-        conn.close()
-        
-        flash(f'Successfully uploaded {len(df)} records.', 'success')
-        
+    except ValueError as e:
+        flash(str(e), 'error')
     except Exception as e:
         flash(f'Upload failed: {str(e)}', 'error')
         print(f"Upload error: {e}")
@@ -523,65 +610,79 @@ def upload_dataset():
     return redirect(url_for('admin'))
 
 
+@app.route('/upload_dataset/stream', methods=['POST', 'PUT'])
+@admin_required
+@upload_limit('UPLOAD_STREAM_MAX_CONTENT_LENGTH')
+def upload_dataset_stream():
+    """Ingest a raw CSV request body (Content-Type: text/csv) chunk by chunk."""
+    try:
+        insights_delta = InsightsDelta()
+        result = ingest_airdata(read_airdata_csv(request.stream), on_chunk=insights_delta.add_chunk,
+                                before_commit=insights_delta.apply)
+        invalidate_dashboard_stats()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Upload error: {e}")
+        return jsonify({'error': f'Upload failed: {str(e)}'}), 500
+
+    if result['rows'] == 0:
+        return jsonify({'error': 'No valid data rows after cleaning.', **result}), 400
+    return jsonify(result)
+
+
 @app.route('/train_all_models', methods=['POST'])
 @admin_required
 def train_all_models():
     try:
-        data = execute_query(
-            """SELECT temperature, humidity, pm2_5, pm10, co, no2, so2, o3, aqi
-               FROM airdata""",
-            fetch=True
-        )
-        
-        if not data or len(data) < 10:
-            flash('Not enough data to train models. Please upload at least 10 records.', 'error')
-            return redirect(url_for('admin'))
-        
-        df = pd.DataFrame(data)
-        df.columns = [col.capitalize() if col != 'pm2_5' and col != 'pm10' else col.upper().replace('_', '_') 
-                      for col in df.columns]
-        
-        column_mapping = {
-            'Temperature': 'Temperature',
-            'Humidity': 'Humidity',
-            'Pm2_5': 'PM2_5',
-            'PM2_5': 'PM2_5',
-            'Pm10': 'PM10',
-            'PM10': 'PM10',
-            'Co': 'CO',
-            'CO': 'CO',
-            'No2': 'NO2',
-            'NO2': 'NO2',
-            'So2': 'SO2',
-            'SO2': 'SO2',
-            'O3': 'O3',
-            'Aqi': 'AQI',
-            'AQI': 'AQI'
-        }
-        
-        df = df.rename(columns=column_mapping)
-        
-        X_processed, y = prepare_training_data(df)
-        
-        linear_result = train_linear_regression(X_processed, y)
-        flash(f'Linear Regression trained. R²: {linear_result["metrics"]["r2"]:.4f}', 'success')
-        
-        rf_result = train_random_forest(X_processed, y)
-        flash(f'Random Forest trained. R²: {rf_result["metrics"]["r2"]:.4f}', 'success')
-        
-        xgb_result = train_xgboost(X_processed, y)
-        flash(f'XGBoost trained. R²: {xgb_result["metrics"]["r2"]:.4f}', 'success')
-        
+        mode = request.form.get('mode', 'full')
+        job, created = enqueue_training_job(session.get('user_id'), mode)
+        if created:
+            flash(f'Training job #{job["id"]} ({mode}) queued. Progress is shown below.', 'success')
+        elif job:
+            flash(f'Training job #{job["id"]} is already {job["status"]}.', 'warning')
     except Exception as e:
-        flash(f'Training failed: {str(e)}', 'error')
+        flash(f'Could not start training: {str(e)}', 'error')
         print(f"Training error: {e}")
-    
+
     return redirect(url_for('admin'))
 
 
+@app.route('/api/train_jobs/latest')
+@admin_required
+def api_latest_training_job():
+    return jsonify({'job': get_training_job()})
+
+
+@app.route('/api/train_jobs/<int:job_id>')
+@admin_required
+def api_training_job(job_id):
+    job = get_training_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Training job not found.'}), 404
+    return jsonify({'job': job})
+
+
+@app.route('/metrics')
+def metrics():
+    token = os.environ.get('METRICS_TOKEN')
+    authorized = session.get('role') == 'Admin' or bool(token) and hmac.compare_digest(
+        request.headers.get('Authorization', '').encode('utf-8'), f'Bearer {token}'.encode('utf-8')
+    )
+    if not authorized:
+        return Response('Forbidden\n', status=403, mimetype='text/plain')
+
+    pool = get_pool().stats()
+    return Response(render_prometheus({
+        'db_pool_in_use': ('Pooled connections checked out.', pool['in_use']),
+        'db_pool_idle': ('Idle pooled connections.', pool['idle'])
+    }), mimetype='text/plain; version=0.0.4')
+
+
 @app.before_request
 def before_request():
-    pass
+    if METRICS_ENABLED:
+        g.request_started = request_started()
 
 
 @app.after_request
@@ -589,9 +690,33 @@ def after_request(response):
     response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
     response.headers['Pragma'] = 'no-cache'
     response.headers['Expires'] = '0'
+    if METRICS_ENABLED:
+        count_response(request.endpoint, request.method, response.status_code)
     return response
 
 
+@app.teardown_request
+def teardown_request(exc):
+    started = g.pop('request_started', None)
+    if started is not None:
+        request_finished(request.endpoint, started)
+
+
+def _render_started(sender, template, context, **extra):
+    g.render_started = time.perf_counter()
+
+
+def _render_finished(sender, template, context, **extra):
+    started = g.pop('render_started', None)
+    if started is not None:
+        observe_phase('render', time.perf_counter() - started)
+
+
+if METRICS_ENABLED:
+    before_render_template.connect(_render_started, app)
+    template_rendered.connect(_render_finished, app)
+
+
 with app.app_context():
     try:
         init_database()
@@ -0,0 +1,107 @@
+"""
+Generate synthetic airdata with realistic correlations between features and AQI.
+
+A seasonal factor drives temperature (cooler in winter) and a shared
+pollution level (higher in winter); a traffic factor adds to CO and NO2.
+Humidity falls as temperature rises, PM10 follows PM2.5, and O3 rises with
+temperature and falls with NO2. AQI is the largest CPCB (India) sub-index
+of PM2.5, PM10, NO2, SO2, CO and O3 plus a little noise, so the tree models
+have the same piecewise structure to learn as in real readings.
+
+Rows are generated in fixed-size batches, each from its own seeded
+generator, so a given (rows, seed) always produces the same data.
+
+    python benchmarks/airdata.py --rows 1000000 --output airdata_1m.csv
+"""
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from utils.helpers import FEATURE_ORDER
+
+AIRDATA_CSV_COLUMNS = FEATURE_ORDER + ['AQI']
+GENERATOR_BATCH_ROWS = 100_000
+
+# Concentration at the upper end of each CPCB band (Good ... Severe); the
+# last value is where the sub-index reaches 500.
+SUB_INDEX_LEVELS = (0, 50, 100, 200, 300, 400, 500)
+SUB_INDEX_BREAKPOINTS = {
+    'PM2_5': (0, 30, 60, 90, 120, 250, 380),
+    'PM10': (0, 50, 100, 250, 350, 430, 600),
+    'NO2': (0, 40, 80, 180, 280, 400, 520),
+    'SO2': (0, 40, 80, 380, 800, 1600, 2100),
+    'CO': (0, 1.0, 2.0, 10, 17, 34, 50),
+    'O3': (0, 50, 100, 168, 208, 748, 1000)
+}
+
+
+def sub_index(pollutant, values):
+    """Piecewise-linear CPCB sub-index of a pollutant, capped at 500."""
+    return np.interp(values, SUB_INDEX_BREAKPOINTS[pollutant], SUB_INDEX_LEVELS)
+
+
+def generate_airdata(rows, rng):
+    """
+    Return a DataFrame of rows synthetic readings with AIRDATA_CSV_COLUMNS.
+
+    Args:
+        rows: Number of rows
+        rng: numpy Generator
+    """
+    season = rng.random(rows) * 2 * np.pi
+    winter = (1 + np.cos(season)) / 2
+    pollution = np.exp(rng.normal(0.0, 0.5, rows) + 0.8 * winter)
+    traffic = np.exp(rng.normal(0.0, 0.4, rows))
+
+    temperature = 27 - 10 * winter + rng.normal(0.0, 3.0, rows)
+    humidity = np.clip(60 - 1.2 * (temperature - 27) + rng.normal(0.0, 12.0, rows), 5, 100)
+    pm2_5 = 35 * pollution * np.exp(rng.normal(0.0, 0.25, rows))
+    pm10 = pm2_5 * (1.4 + 0.6 * rng.random(rows)) + np.abs(rng.normal(0.0, 5.0, rows))
+    co = 0.6 * traffic * np.sqrt(pollution) * np.exp(rng.normal(0.0, 0.3, rows))
+    no2 = 22 * traffic * pollution ** 0.6 * np.exp(rng.normal(0.0, 0.3, rows))
+    so2 = 9 * pollution ** 0.7 * np.exp(rng.normal(0.0, 0.5, rows))
+    o3 = np.clip(30 + 1.5 * (temperature - 27) - 0.25 * (no2 - 25) + rng.normal(0.0, 10.0, rows), 2, None)
+
+    features = {
+        'Temperature': temperature, 'Humidity': humidity,
+        'PM2_5': pm2_5, 'PM10': pm10,
+        'CO': co, 'NO2': no2,
+        'SO2': so2, 'O3': o3
+    }
+    aqi = np.max([sub_index(name, features[name]) for name in SUB_INDEX_BREAKPOINTS], axis=0)
+    features['AQI'] = np.clip(aqi + rng.normal(0.0, 5.0, rows), 0, 500)
+    return pd.DataFrame(features, columns=AIRDATA_CSV_COLUMNS)
+
+
+def iter_airdata_frames(rows, seed=0, batch_rows=GENERATOR_BATCH_ROWS):
+    """Yield DataFrames of at most batch_rows rows adding up to rows."""
+    for index, start in enumerate(range(0, rows, batch_rows)):
+        yield generate_airdata(min(batch_rows, rows - start), np.random.default_rng([seed, index]))
+
+
+def write_airdata_csv(path, rows, seed=0):
+    """Write rows synthetic readings to a CSV in the upload format and return path."""
+    with open(path, 'w', newline='') as f:
+        for index, frame in enumerate(iter_airdata_frames(rows, seed)):
+            frame.to_csv(f, header=index == 0, index=False, float_format='%.3f')
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='airdata_synthetic.csv')
+    args = parser.parse_args()
+
+    write_airdata_csv(args.output, args.rows, args.seed)
+    print(f"Wrote {args.rows} rows to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,334 @@
+"""
+End-to-end benchmark: ingestion, data loading, training, inference and pages.
+
+For each size, synthetic airdata (benchmarks/airdata.py) is written to a
+CSV and uploaded through /upload_dataset with the Flask test client. Then
+the suite times loading the training set (COPY, cold cache, warm cache),
+fitting the preprocessor and each trainer, single-row and batch inference
+for every model, and the /insights and /dashboard pages. Everything runs
+against the PostgreSQL database in DATABASE_URL. Models and the airdata
+cache are written to a temporary directory, never to models/ or cache/.
+
+The airdata table is TRUNCATEd before each size, so point DATABASE_URL at
+a scratch database and pass --reset to confirm.
+
+Results are written as JSON (--output). With --baseline, every timing
+that is more than --tolerance slower than in the baseline (or throughput
+that is lower) is listed under "regressions", and the exit status is 1.
+
+    python benchmarks/end_to_end.py --reset --sizes 10000 1000000 10000000 --output bench.json
+    python benchmarks/end_to_end.py --reset --sizes 10000 --baseline bench.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from benchmarks.airdata import write_airdata_csv, iter_airdata_frames
+
+DEFAULT_SIZES = (10_000, 1_000_000, 10_000_000)
+STEPS = ('ingest', 'load', 'train', 'inference', 'pages')
+PAGES = ('/insights', '/dashboard')
+
+
+def _seconds_since(start):
+    return round(time.perf_counter() - start, 4)
+
+
+def _latency(timings):
+    timings = np.asarray(timings)
+    return {'p50_ms': round(float(np.percentile(timings, 50)) * 1000, 4),
+            'p99_ms': round(float(np.percentile(timings, 99)) * 1000, 4)}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _redirect_artifacts(directory):
+    """Point the preprocessor and every model path at directory."""
+    import utils.preprocess as preprocess
+    import ml.train_linear as train_linear
+    import ml.train_randomforest as train_randomforest
+    import ml.train_xgboost as train_xgboost
+    preprocess.MODELS_DIR = directory
+    preprocess.PREPROCESSOR_PATH = os.path.join(directory, 'preprocessor.pkl')
+    for module in (train_linear, train_randomforest, train_xgboost):
+        name = os.path.basename(module.MODEL_PATH)
+        module.MODELS_DIR = directory
+        module.MODEL_PATH = os.path.join(directory, name)
+        module.LEGACY_MODEL_PATH = os.path.join(directory, os.path.splitext(name)[0] + '.pkl')
+
+
+def _client(app):
+    app.config['UPLOAD_DATASET_MAX_CONTENT_LENGTH'] = None
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = 0
+        sess['user_name'] = 'Benchmark'
+        sess['user_email'] = 'benchmark@gmail.com'
+        sess['role'] = 'Admin'
+    return client
+
+
+def _flashed_errors(client):
+    with client.session_transaction() as sess:
+        flashes = sess.pop('_flashes', [])
+    return [message for category, message in flashes if category == 'error']
+
+
+def reset_airdata():
+    """Empty airdata and bring the cached stats and insights snapshot in line."""
+    from utils.db_connect import execute_query
+    from utils.dashboard_stats import invalidate_dashboard_stats
+    from ml.insights import refresh_insights_snapshot
+    execute_query("TRUNCATE airdata RESTART IDENTITY")
+    invalidate_dashboard_stats()
+    refresh_insights_snapshot()
+
+
+def bench_ingest(client, rows, directory, seed):
+    from utils.dashboard_stats import get_dashboard_stats
+    path = os.path.join(directory, f'airdata_{rows}.csv')
+    start = time.perf_counter()
+    write_airdata_csv(path, rows, seed)
+    generate_seconds = _seconds_since(start)
+    csv_mb = round(os.path.getsize(path) / 1024 ** 2, 1)
+
+    start = time.perf_counter()
+    with open(path, 'rb') as f:
+        response = client.post('/upload_dataset', data={'file': (f, 'airdata.csv')},
+                               content_type='multipart/form-data')
+    seconds = _seconds_since(start)
+    os.remove(path)
+
+    errors = _flashed_errors(client)
+    if response.status_code != 302 or errors:
+        raise RuntimeError(f"Upload failed ({response.status_code}): {'; '.join(errors)}")
+    loaded = get_dashboard_stats()['data_records']
+    if loaded != rows:
+        raise RuntimeError(f"Uploaded {rows} rows but airdata holds {loaded}")
+    return {'generate_seconds': generate_seconds, 'csv_mb': csv_mb,
+            'seconds': seconds, 'rows_per_s': round(rows / seconds)}
+
+
+def bench_load(cache_dir):
+    from ml.train_all import load_training_data
+    results = {}
+    start = time.perf_counter()
+    load_training_data(use_cache=False)
+    results['copy'] = {'seconds': _seconds_since(start)}
+
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    for name in ('cache_cold', 'cache_warm'):
+        start = time.perf_counter()
+        load_training_data(use_cache=True)
+        results[name] = {'seconds': _seconds_since(start)}
+    return results
+
+
+def bench_train(directory):
+    from sklearn.model_selection import train_test_split
+    from utils.preprocess import fit_preprocessor, apply_preprocessor
+    from ml.train_all import load_training_data, TRAINERS
+    from ml.train_xgboost_external import train_xgboost_external
+    from ml.insights import update_snapshot_importances
+
+    X, y, _, _ = load_training_data()
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    results = {}
+    start = time.perf_counter()
+    preprocessor = fit_preprocessor(X_train)
+    X_train = apply_preprocessor(preprocessor, X_train)
+    X_test = apply_preprocessor(preprocessor, X_test)
+    results['preprocessor'] = {'seconds': _seconds_since(start)}
+
+    for name, fit in TRAINERS.items():
+        start = time.perf_counter()
+        result = fit(X_train, y_train, X_test, y_test)
+        results[name] = {'seconds': _seconds_since(start),
+                         'r2': round(result['metrics']['r2'], 5),
+                         'rmse': round(result['metrics']['rmse'], 5)}
+    del X, y, X_train, X_test
+
+    start = time.perf_counter()
+    result = train_xgboost_external(model_path=os.path.join(directory, 'xgb_external.ubj'),
+                                    cache_dir=directory, save_metrics=False)
+    results['XGBoost (external memory)'] = {'seconds': _seconds_since(start),
+                                            'r2': round(result['metrics']['r2'], 5),
+                                            'rmse': round(result['metrics']['rmse'], 5)}
+    update_snapshot_importances()
+    return results
+
+
+def bench_inference(calls, batch_rows, seed):
+    from utils.helpers import FEATURE_ORDER
+    from utils.preprocess import load_preprocessor, preprocess_data
+    from ml.batch_predict import MODEL_PREDICTORS, predict_batch
+
+    preprocessor = load_preprocessor()
+    sample = next(iter_airdata_frames(max(calls, batch_rows), seed=seed + 1,
+                                      batch_rows=max(calls, batch_rows)))
+    rows = [dict(zip(FEATURE_ORDER, values)) for values in sample[FEATURE_ORDER].to_numpy()[:calls]]
+    batch = sample.head(batch_rows)
+
+    results = {}
+    for name, predictor in MODEL_PREDICTORS.items():
+        predictor(preprocess_data(rows[0], preprocessor=preprocessor))
+        timings = []
+        for row in rows:
+            start = time.perf_counter()
+            predictor(preprocess_data(row, preprocessor=preprocessor))
+            timings.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        predict_batch(batch, name)
+        results[name] = dict(_latency(timings), batch_rows_per_s=round(len(batch) / (time.perf_counter() - start)))
+    return results
+
+
+def bench_pages(client, requests_per_page):
+    results = {}
+    for path in PAGES:
+        client.get(path)
+        timings = []
+        for _ in range(requests_per_page):
+            start = time.perf_counter()
+            response = client.get(path)
+            timings.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                raise RuntimeError(f"GET {path} returned {response.status_code}")
+        results[path] = _latency(timings)
+    return results
+
+
+def run_size(client, rows, args, directory, cache_dir):
+    print(f"Benchmarking {rows} rows")
+    reset_airdata()
+    results = {}
+    # Training, inference and pages need the rows ingested, so ingest always runs.
+    results['ingest'] = bench_ingest(client, rows, directory, args.seed)
+    if 'load' in args.steps:
+        results['load'] = bench_load(cache_dir)
+    if 'train' in args.steps or 'inference' in args.steps:
+        results['train'] = bench_train(directory)
+    if 'inference' in args.steps:
+        results['inference'] = bench_inference(args.calls, args.batch_rows, args.seed)
+    if 'pages' in args.steps:
+        results['pages'] = bench_pages(client, args.page_requests)
+    return results
+
+
+def flatten(results, prefix=''):
+    """Flatten nested results into {'rows/step/.../metric': value}."""
+    flat = {}
+    for key, value in results.items():
+        name = f'{prefix}/{key}' if prefix else str(key)
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        else:
+            flat[name] = value
+    return flat
+
+
+def find_regressions(current, baseline, tolerance):
+    """
+    Compare two runs' 'sizes' sections metric by metric.
+
+    Timings (seconds, *_ms) regress when they grow by more than tolerance;
+    throughputs (*_per_s) regress when they shrink by more than tolerance.
+    Metrics missing from either run are skipped.
+    """
+    old = flatten(baseline)
+    regressions = []
+    for name, value in flatten(current).items():
+        before = old.get(name)
+        if not isinstance(value, (int, float)) or not isinstance(before, (int, float)) or not before:
+            continue
+        if name.endswith('_per_s'):
+            change = (before - value) / before
+        elif name.endswith(('seconds', '_ms')) and not name.endswith('generate_seconds'):
+            change = (value - before) / before
+        else:
+            continue
+        if change > tolerance:
+            regressions.append({'metric': name, 'baseline': before, 'current': value,
+                                'change': round(change, 3)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--steps', nargs='+', choices=STEPS, default=list(STEPS))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--calls', type=int, default=1000, help='single-row predictions per model')
+    parser.add_argument('--batch-rows', type=int, default=100_000)
+    parser.add_argument('--page-requests', type=int, default=50)
+    parser.add_argument('--output', help='write the results JSON here (default: stdout)')
+    parser.add_argument('--baseline', help='results JSON of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--reset', action='store_true', help='allow TRUNCATE of airdata in DATABASE_URL')
+    args = parser.parse_args()
+    if not args.reset:
+        parser.error('the suite empties the airdata table; pass --reset with DATABASE_URL '
+                     'pointing at a scratch database')
+
+    started_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    directory = tempfile.mkdtemp(prefix='aurora-e2e-')
+    cache_dir = os.path.join(directory, 'cache')
+    # Read by utils.data_cache at import time, so set before the app is imported.
+    os.environ['TRAINING_CACHE_DIR'] = cache_dir
+    try:
+        from app import app
+        _redirect_artifacts(directory)
+        client = _client(app)
+        sizes = {str(rows): run_size(client, rows, args, directory, cache_dir) for rows in args.sizes}
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    report = {
+        'commit': _git_commit(),
+        'started_at': started_at,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'seed': args.seed,
+        'sizes': sizes
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        report['baseline_commit'] = baseline.get('commit')
+        report['regressions'] = find_regressions(sizes, baseline.get('sizes', {}), args.tolerance)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    for regression in report.get('regressions', []):
+        print(f"REGRESSION {regression['metric']}: {regression['baseline']} -> {regression['current']} "
+              f"({regression['change']:+.0%})", file=sys.stderr)
+    if report.get('regressions'):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
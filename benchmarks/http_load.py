@@ -0,0 +1,371 @@
+"""
+Load-test the Flask routes under gunicorn with concurrent logged-in users.
+
+A local gunicorn is started for each --workers x --threads combination
+(gthread workers when threads > 1) against the PostgreSQL database in
+DATABASE_URL. N synthetic users are created in the users table if missing
+(loadtest<i>@gmail.com) and logged in through /login. Then they replay a
+weighted mix of /predict (POST with synthetic readings), /dashboard,
+/compare and /insights as a closed loop: each user sends its next request
+as soon as the previous one returns, plus an optional think time.
+
+Requests are sent from --client-procs processes so the load generator is
+not limited by one GIL. Per route, the report has throughput,
+p50/p95/p99 latency and the error rate. HTTP errors, connection failures,
+redirects (lost session) and /predict responses without a successful
+prediction all count as errors. Every --users level is run against each
+server configuration, which gives saturation curves.
+
+/predict logs its predictions, so use a scratch database with trained
+models. Use --url to target a server that is already running; no sweep
+over workers or threads is done then.
+
+    python benchmarks/http_load.py --workers 1 2 4 --threads 1 4 --users 10 50 100 --duration 30
+    python benchmarks/http_load.py --url http://127.0.0.1:5000 --users 20 --mix predict=1
+"""
+import os
+import sys
+import json
+import time
+import random
+import signal
+import socket
+import argparse
+import itertools
+import subprocess
+import http.client
+import multiprocessing
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from benchmarks.airdata import generate_airdata
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROUTES = ('predict', 'dashboard', 'compare', 'insights')
+DEFAULT_MIX = 'predict=4 dashboard=3 compare=1 insights=2'
+MODEL_CHOICES = ('XGBoost', 'Random Forest', 'Linear Regression')
+USER_PASSWORD = 'LoadTest#2024'
+PREDICT_ROWS = 10_000
+SERVER_START_TIMEOUT = 120
+REQUEST_TIMEOUT = 60
+
+
+def parse_mix(specs):
+    """Parse ['predict=4', 'dashboard=3'] (or one space-separated string) into {route: weight}."""
+    mix = {}
+    for spec in ' '.join(specs).split():
+        route, _, weight = spec.partition('=')
+        if route not in ROUTES:
+            raise ValueError(f"Unknown route '{route}' in --mix (choose from {', '.join(ROUTES)})")
+        mix[route] = float(weight or 1)
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError("--mix needs at least one route with a positive weight")
+    return mix
+
+
+def ensure_users(count):
+    """
+    Create loadtest<i>@gmail.com users that do not exist yet and return their emails.
+
+    Raises:
+        RuntimeError: If some users could not be created (e.g. their mobile
+            7<i, 9 digits> already belongs to another account)
+    """
+    from werkzeug.security import generate_password_hash
+    from utils.db_connect import execute_query
+
+    def existing_emails():
+        rows = execute_query("SELECT email FROM users WHERE email = ANY(%s)", (emails,), fetch=True) or []
+        return {row['email'] for row in rows}
+
+    emails = [f'loadtest{i}@gmail.com' for i in range(count)]
+    existing = existing_emails()
+    for i, email in enumerate(emails):
+        if email in existing:
+            continue
+        execute_query(
+            """INSERT INTO users (name, email, mobile, passwordhash, role)
+               VALUES (%s, %s, %s, %s, 'User') ON CONFLICT DO NOTHING""",
+            (f'Load Test {i}', email, f'7{i:09d}',
+             generate_password_hash(USER_PASSWORD, method='pbkdf2:sha256'))
+        )
+
+    existing = existing_emails()
+    missing = [email for email in emails if email not in existing]
+    if missing:
+        raise RuntimeError(
+            f"Could not create {len(missing)} load-test users, probably because their mobile "
+            f"number is already taken: {', '.join(missing)}"
+        )
+    return emails
+
+
+class Client:
+    """One user's keep-alive HTTP connection and session cookie."""
+
+    def __init__(self, base_url, cookie=None):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.cookie = cookie
+        self.conn = None
+
+    def request(self, method, path, form=None):
+        """Send one request and return (status, body)."""
+        headers = {}
+        body = None
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        if form is not None:
+            body = urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=REQUEST_TIMEOUT)
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            content = response.read()
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = None
+            raise
+        cookies = SimpleCookie(response.getheader('Set-Cookie') or '')
+        if 'session' in cookies:
+            self.cookie = f"session={cookies['session'].value}"
+        return response.status, content
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+
+
+def login(base_url, email):
+    """Log one user in and return its session cookie."""
+    client = Client(base_url)
+    try:
+        status, _ = client.request('POST', '/login', {'email': email, 'password': USER_PASSWORD})
+    finally:
+        client.close()
+    if status != 302 or not client.cookie:
+        raise RuntimeError(f"Login failed for {email} (HTTP {status})")
+    return client.cookie
+
+
+def _predict_forms(seed):
+    from utils.helpers import FEATURE_ORDER
+    frame = generate_airdata(PREDICT_ROWS, np.random.default_rng(seed))
+    names = [feature.lower() for feature in FEATURE_ORDER]
+    return [dict(zip(names, (f'{value:.3f}' for value in row))) for row in frame[FEATURE_ORDER].to_numpy()]
+
+
+def _send(client, route, rng, forms):
+    """Send one request for route; return True if it succeeded."""
+    if route == 'predict':
+        form = dict(forms[rng.randrange(len(forms))], model=rng.choice(MODEL_CHOICES))
+        status, body = client.request('POST', '/predict', form)
+        return status == 200 and b'Prediction successful' in body
+    status, _ = client.request('GET', f'/{route}')
+    return status == 200
+
+
+def _user_loop(base_url, cookie, mix, started_at, warmup, duration, think, seed, forms):
+    rng = random.Random(seed)
+    routes = list(mix)
+    weights = [mix[route] for route in routes]
+    measure_from = started_at + warmup
+    deadline = measure_from + duration
+    samples = {route: [] for route in routes}
+    errors = {route: 0 for route in routes}
+    client = Client(base_url, cookie)
+    try:
+        while True:
+            now = time.time()
+            if now >= deadline:
+                break
+            route = rng.choices(routes, weights)[0]
+            start = time.perf_counter()
+            try:
+                ok = _send(client, route, rng, forms)
+            except (OSError, http.client.HTTPException):
+                ok = False
+            elapsed = time.perf_counter() - start
+            if now >= measure_from and time.time() <= deadline:
+                samples[route].append(elapsed)
+                errors[route] += not ok
+            if think:
+                time.sleep(rng.expovariate(1 / think))
+    finally:
+        client.close()
+    return samples, errors
+
+
+def _client_process(args):
+    base_url, cookies, mix, started_at, warmup, duration, think, seed = args
+    forms = _predict_forms(seed)
+    with ThreadPoolExecutor(max_workers=len(cookies)) as pool:
+        futures = [pool.submit(_user_loop, base_url, cookie, mix, started_at, warmup, duration, think,
+                               seed * 100_003 + i, forms)
+                   for i, cookie in enumerate(cookies)]
+        results = [future.result() for future in futures]
+
+    samples = {route: [] for route in mix}
+    errors = {route: 0 for route in mix}
+    for user_samples, user_errors in results:
+        for route in mix:
+            samples[route].extend(user_samples[route])
+            errors[route] += user_errors[route]
+    return samples, errors
+
+
+def summarize(samples, errors, duration):
+    timings = np.asarray(samples, dtype=np.float64) * 1000
+    count = len(timings)
+    return {
+        'requests': count,
+        'errors': errors,
+        'error_rate': round(errors / count, 4) if count else 0.0,
+        'throughput_rps': round(count / duration, 2),
+        'p50_ms': round(float(np.percentile(timings, 50)), 2) if count else None,
+        'p95_ms': round(float(np.percentile(timings, 95)), 2) if count else None,
+        'p99_ms': round(float(np.percentile(timings, 99)), 2) if count else None
+    }
+
+
+def run_load(base_url, cookies, mix, args):
+    """Replay the mix with one thread per cookie and return the per-route report."""
+    procs = max(1, min(args.client_procs, len(cookies)))
+    started_at = time.time() + 1.0
+    jobs = [(base_url, cookies[i::procs], mix, started_at, args.warmup, args.duration,
+             args.think_ms / 1000, args.seed + i)
+            for i in range(procs)]
+    with multiprocessing.get_context('fork').Pool(procs) as pool:
+        results = pool.map(_client_process, jobs)
+
+    samples = {route: [] for route in mix}
+    errors = {route: 0 for route in mix}
+    for process_samples, process_errors in results:
+        for route in mix:
+            samples[route].extend(process_samples[route])
+            errors[route] += process_errors[route]
+
+    routes = {route: summarize(samples[route], errors[route], args.duration) for route in mix}
+    total = summarize(list(itertools.chain.from_iterable(samples.values())),
+                      sum(errors.values()), args.duration)
+    return {'users': len(cookies), 'total': total, 'routes': routes}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(workers, threads, log_path):
+    """Start gunicorn on a free local port and wait until /login answers."""
+    port = _free_port()
+    command = [sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--threads', str(threads),
+               '--bind', f'127.0.0.1:{port}', '--timeout', str(REQUEST_TIMEOUT * 2), 'app:app']
+    log = open(log_path, 'ab')
+    process = subprocess.Popen(command, cwd=REPO_ROOT, stdout=log, stderr=subprocess.STDOUT)
+    log.close()
+
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with status {process.returncode}; see {log_path}")
+        try:
+            status, _ = Client(base_url).request('GET', '/login')
+            if status == 200:
+                return process, base_url
+        except (OSError, http.client.HTTPException):
+            pass
+        time.sleep(0.5)
+    stop_gunicorn(process)
+    raise RuntimeError(f"gunicorn did not answer within {SERVER_START_TIMEOUT}s; see {log_path}")
+
+
+def stop_gunicorn(process):
+    if process.poll() is None:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def run_server_config(base_url, emails, mix, args):
+    results = []
+    for users in sorted(args.users):
+        with ThreadPoolExecutor(max_workers=min(16, users)) as pool:
+            cookies = list(pool.map(lambda email: login(base_url, email), emails[:users]))
+        result = run_load(base_url, cookies, mix, args)
+        print(f"  {users:>4} users: {result['total']['throughput_rps']:>8.1f} req/s, "
+              f"p99 {result['total']['p99_ms']} ms, errors {result['total']['error_rate']:.2%}",
+              file=sys.stderr)
+        results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[2])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1])
+    parser.add_argument('--users', type=int, nargs='+', default=[20])
+    parser.add_argument('--mix', nargs='+', default=[DEFAULT_MIX],
+                        help=f'route=weight pairs (default: {DEFAULT_MIX})')
+    parser.add_argument('--duration', type=float, default=30.0, help='measured seconds per run')
+    parser.add_argument('--warmup', type=float, default=5.0, help='unmeasured seconds before each run')
+    parser.add_argument('--think-ms', type=float, default=0.0, help='mean pause between a user\'s requests')
+    parser.add_argument('--client-procs', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--url', help='test a running server instead of starting gunicorn')
+    parser.add_argument('--log', default='gunicorn_loadtest.log', help='gunicorn output file')
+    parser.add_argument('--output', help='write the results JSON here (default: stdout)')
+    args = parser.parse_args()
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    emails = ensure_users(max(args.users))
+
+    runs = []
+    if args.url:
+        print(f"Target {args.url}", file=sys.stderr)
+        for result in run_server_config(args.url.rstrip('/'), emails, mix, args):
+            runs.append(dict(result, workers=None, threads=None))
+    else:
+        for workers, threads in itertools.product(args.workers, args.threads):
+            print(f"gunicorn --workers {workers} --threads {threads}", file=sys.stderr)
+            process, base_url = start_gunicorn(workers, threads, args.log)
+            try:
+                for result in run_server_config(base_url, emails, mix, args):
+                    runs.append(dict(result, workers=workers, threads=threads))
+            finally:
+                stop_gunicorn(process)
+
+    report = {
+        'mix': mix,
+        'duration': args.duration,
+        'warmup': args.warmup,
+        'think_ms': args.think_ms,
+        'client_procs': args.client_procs,
+        'runs': runs
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
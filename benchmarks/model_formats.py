@@ -0,0 +1,98 @@
+"""
+Compare load time and size of joblib pickles vs the native model formats.
+
+Each model is fitted on synthetic data, saved both as a joblib pickle and
+in its native format (UBJSON for XGBoost, memory-mappable .npz for Random
+Forest and Linear Regression), then loaded repeatedly with the registry
+bypassed. Load time includes one single-row prediction, so lazily mapped
+pages are counted. Files are written to a temporary directory.
+
+    python benchmarks/model_formats.py --rows 200000 --repeat 20
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from xgboost import XGBRegressor
+
+from utils.model_formats import save_forest, load_forest, save_linear, load_linear, save_xgb, load_xgb
+from ml.train_randomforest import RF_PARAMS
+from ml.train_xgboost import XGB_PARAMS
+
+
+def synthetic_data(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(rows, 8))
+    y = X @ rng.random(8) * 20 + np.sin(X[:, 0] * 3) * 10 + rng.normal(scale=2.0, size=rows)
+    return X, y
+
+
+def fit_models(X, y, n_jobs=-1):
+    return {
+        'Linear Regression': (LinearRegression().fit(X, y), save_linear, load_linear, 'npz'),
+        'Random Forest': (RandomForestRegressor(**RF_PARAMS, random_state=42, n_jobs=n_jobs).fit(X, y),
+                          save_forest, load_forest, 'npz'),
+        'XGBoost': (XGBRegressor(**XGB_PARAMS, random_state=42, n_jobs=n_jobs, verbosity=0).fit(X, y),
+                    save_xgb, load_xgb, 'ubj')
+    }
+
+
+def time_load(loader, path, row, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        model = loader(path)
+        model.predict(row)
+        timings.append(time.perf_counter() - start)
+    return model, float(np.median(timings) * 1000)
+
+
+def run_benchmark(rows, repeat):
+    X, y = synthetic_data(rows)
+    row = X[:1]
+    check = X[:1000]
+    results = []
+    with tempfile.TemporaryDirectory(prefix='aurora-formats-') as directory:
+        for name, (model, dumper, loader, ext) in fit_models(X, y).items():
+            slug = name.lower().replace(' ', '_')
+            pkl_path = os.path.join(directory, f'{slug}.pkl')
+            native_path = os.path.join(directory, f'{slug}.{ext}')
+            joblib.dump(model, pkl_path)
+            dumper(model, native_path)
+
+            _, pkl_ms = time_load(joblib.load, pkl_path, row, repeat)
+            native, native_ms = time_load(loader, native_path, row, repeat)
+            expected = model.predict(check)
+            results.append({
+                'model': name,
+                'pickle_ms': round(pkl_ms, 3),
+                'native_ms': round(native_ms, 3),
+                'speedup': round(pkl_ms / native_ms, 1) if native_ms else None,
+                'pickle_kb': round(os.path.getsize(pkl_path) / 1024, 1),
+                'native_kb': round(os.path.getsize(native_path) / 1024, 1),
+                'max_abs_diff': float(np.abs(native.predict(check) - expected).max())
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    results = run_benchmark(args.rows, args.repeat)
+    print(json.dumps({'rows': args.rows, 'repeat': args.repeat, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Compare model.predict with the packed tree engine (ml/tree_engine.py).
+
+Random Forest and XGBoost are fitted on synthetic data with the
+production hyperparameters. For each, p50/p99 single-row latency and
+batch throughput are measured for model.predict and PackedEnsemble, and
+the largest absolute difference between their outputs is reported.
+
+    python benchmarks/tree_engine.py --rows 100000 --calls 2000
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from xgboost import XGBRegressor
+
+from ml.tree_engine import compile_model
+from ml.train_randomforest import RF_PARAMS
+from ml.train_xgboost import XGB_PARAMS
+from benchmarks.model_formats import synthetic_data
+
+
+def latency_ms(predict, rows, calls):
+    timings = np.empty(calls)
+    for i in range(calls):
+        row = rows[i % len(rows)][None, :]
+        start = time.perf_counter()
+        predict(row)
+        timings[i] = time.perf_counter() - start
+    return {'p50_ms': round(float(np.percentile(timings, 50)) * 1000, 4),
+            'p99_ms': round(float(np.percentile(timings, 99)) * 1000, 4)}
+
+
+def batch_rows_per_second(predict, X):
+    start = time.perf_counter()
+    predict(X)
+    return round(len(X) / (time.perf_counter() - start))
+
+
+def run_benchmark(rows, calls, batch):
+    X, y = synthetic_data(rows)
+    X_eval = synthetic_data(batch, seed=1)[0]
+    models = {
+        'Random Forest': RandomForestRegressor(**RF_PARAMS, random_state=42, n_jobs=-1).fit(X, y),
+        'XGBoost': XGBRegressor(**XGB_PARAMS, random_state=42, verbosity=0).fit(X, y)
+    }
+
+    results = []
+    for name, model in models.items():
+        engine = compile_model(model)
+        model_latency = latency_ms(model.predict, X_eval, calls)
+        engine_latency = latency_ms(engine.predict, X_eval, calls)
+        results.append({
+            'model': name,
+            'predict': dict(model_latency, batch_rows_per_s=batch_rows_per_second(model.predict, X_eval)),
+            'engine': dict(engine_latency, batch_rows_per_s=batch_rows_per_second(engine.predict, X_eval)),
+            'p50_speedup': round(model_latency['p50_ms'] / engine_latency['p50_ms'], 1),
+            'max_abs_diff': float(np.abs(engine.predict(X_eval) - model.predict(X_eval)).max())
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--batch', type=int, default=10_000)
+    args = parser.parse_args()
+
+    results = run_benchmark(args.rows, args.calls, args.batch)
+    print(json.dumps({'rows': args.rows, 'calls': args.calls, 'batch': args.batch,
+                      'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Compare peak RSS and wall time of in-memory vs out-of-core XGBoost training.
+
+Each path runs in a fresh process on the same synthetic airdata stream, so
+ru_maxrss is the peak of that path alone. Models and preprocessors are
+written to a temporary directory, never to models/.
+
+    python benchmarks/xgb_external.py --rows 2000000 --batch-rows 250000
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+
+def synthetic_batches(rows, batch_rows, seed=0):
+    """Yield (n, 10) arrays of id, FEATURE_ORDER features and AQI."""
+    rng = np.random.default_rng(seed)
+    weights = rng.random(8)
+    for start in range(0, rows, batch_rows):
+        n = min(batch_rows, rows - start)
+        X = (rng.random((n, 8)) * 100).astype(np.float32).astype(np.float64)
+        y = X @ weights + rng.normal(scale=5.0, size=n)
+        ids = np.arange(start + 1, start + n + 1, dtype=np.float64)
+        yield np.column_stack([ids, X, y])
+
+
+def _redirect_artifacts(directory):
+    import utils.preprocess as preprocess
+    import ml.train_xgboost as train_xgboost
+    preprocess.MODELS_DIR = directory
+    preprocess.PREPROCESSOR_PATH = os.path.join(directory, 'preprocessor.pkl')
+    train_xgboost.MODELS_DIR = directory
+    train_xgboost.MODEL_PATH = os.path.join(directory, 'xgb_model.ubj')
+    return train_xgboost.MODEL_PATH
+
+
+def _run_in_memory(rows, batch_rows, directory):
+    from utils.preprocess import fit_preprocessor, apply_preprocessor
+    from ml.train_xgboost import fit_xgboost
+    from ml.train_xgboost_external import EXTERNAL_TEST_MODULUS
+    _redirect_artifacts(directory)
+
+    data = np.vstack(list(synthetic_batches(rows, batch_rows)))
+    test = (data[:, 0].astype(np.int64) % EXTERNAL_TEST_MODULUS) == 0
+    X_train, y_train = data[~test, 1:-1], data[~test, -1]
+    X_test, y_test = data[test, 1:-1], data[test, -1]
+    preprocessor = fit_preprocessor(X_train)
+    result = fit_xgboost(apply_preprocessor(preprocessor, X_train), y_train,
+                         apply_preprocessor(preprocessor, X_test), y_test)
+    return result['metrics']
+
+
+def _run_external(rows, batch_rows, directory):
+    from ml.train_xgboost_external import train_xgboost_external
+    model_path = _redirect_artifacts(directory)
+    result = train_xgboost_external(synthetic_batches(rows, batch_rows), model_path=model_path,
+                                    cache_dir=directory, save_metrics=False)
+    return result['metrics']
+
+
+RUNNERS = {'in_memory': _run_in_memory, 'external': _run_external}
+
+
+def _child(name, rows, batch_rows, queue):
+    with tempfile.TemporaryDirectory(prefix='aurora-bench-') as directory:
+        start = time.perf_counter()
+        metrics = RUNNERS[name](rows, batch_rows, directory)
+        seconds = time.perf_counter() - start
+    queue.put({
+        'path': name,
+        'seconds': round(seconds, 2),
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'r2': round(metrics['r2'], 5),
+        'rmse': round(metrics['rmse'], 5)
+    })
+
+
+def run_benchmark(rows, batch_rows, paths=tuple(RUNNERS)):
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for name in paths:
+        queue = context.Queue()
+        process = context.Process(target=_child, args=(name, rows, batch_rows, queue))
+        process.start()
+        results.append(queue.get())
+        process.join()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--batch-rows', type=int, default=250_000)
+    parser.add_argument('--paths', nargs='+', choices=list(RUNNERS), default=list(RUNNERS))
+    args = parser.parse_args()
+
+    results = run_benchmark(args.rows, args.batch_rows, args.paths)
+    print(json.dumps({'rows': args.rows, 'batch_rows': args.batch_rows, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
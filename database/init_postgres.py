@@ -13,6 +13,98 @@ ADMIN_MOBILE = "9999999999"
 ADMIN_NAME = "Administrator"
 
 
+STATS_COUNTED_TABLES = {
+    'predictions': 'total_predictions',
+    'airdata': 'data_records',
+    'users': 'total_users'
+}
+
+
+def create_stats_counters(cursor):
+    """
+    Create the appstats counters table and the triggers that keep it current.
+
+    Row counts for predictions, airdata and users are maintained by
+    statement-level triggers using transition tables, so bulk COPY loads
+    cost one counter update per statement. models_trained is recomputed from
+    the small modelperformance table whenever it changes. Counters are
+    seeded from the real tables (after the triggers exist) only when they
+    do not exist yet.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS appstats (
+            name VARCHAR(50) PRIMARY KEY,
+            value BIGINT NOT NULL DEFAULT 0
+        );
+    """)
+
+    cursor.execute("""
+        CREATE OR REPLACE FUNCTION appstats_count_rows() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                UPDATE appstats SET value = value + (SELECT COUNT(*) FROM new_rows)
+                WHERE name = TG_ARGV[0];
+            ELSIF TG_OP = 'DELETE' THEN
+                UPDATE appstats SET value = value - (SELECT COUNT(*) FROM old_rows)
+                WHERE name = TG_ARGV[0];
+            ELSIF TG_OP = 'TRUNCATE' THEN
+                UPDATE appstats SET value = 0 WHERE name = TG_ARGV[0];
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    cursor.execute("""
+        CREATE OR REPLACE FUNCTION appstats_count_models() RETURNS trigger AS $$
+        BEGIN
+            UPDATE appstats SET value = (SELECT COUNT(DISTINCT modelname) FROM modelperformance)
+            WHERE name = 'models_trained';
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    for table, counter in STATS_COUNTED_TABLES.items():
+        _create_trigger_if_missing(cursor, f"{table}_appstats_insert", table, f"""
+            AFTER INSERT ON {table} REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION appstats_count_rows('{counter}')
+        """)
+        _create_trigger_if_missing(cursor, f"{table}_appstats_delete", table, f"""
+            AFTER DELETE ON {table} REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION appstats_count_rows('{counter}')
+        """)
+        _create_trigger_if_missing(cursor, f"{table}_appstats_truncate", table, f"""
+            AFTER TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION appstats_count_rows('{counter}')
+        """)
+        cursor.execute(
+            f"""INSERT INTO appstats (name, value)
+                SELECT %s, COUNT(*) FROM {table}
+                ON CONFLICT (name) DO NOTHING;""",
+            (counter,)
+        )
+
+    _create_trigger_if_missing(cursor, "modelperformance_appstats", "modelperformance", """
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON modelperformance
+        FOR EACH STATEMENT EXECUTE FUNCTION appstats_count_models()
+    """)
+    cursor.execute("""
+        INSERT INTO appstats (name, value)
+        SELECT 'models_trained', COUNT(DISTINCT modelname) FROM modelperformance
+        ON CONFLICT (name) DO NOTHING;
+    """)
+
+
+def _create_trigger_if_missing(cursor, name, table, definition):
+    cursor.execute(
+        "SELECT 1 FROM pg_trigger WHERE tgname = %s AND tgrelid = %s::regclass",
+        (name, table)
+    )
+    if cursor.fetchone() is None:
+        cursor.execute(f"CREATE TRIGGER {name} {definition};")
+
+
 def init_database():
     """
     Initialize PostgreSQL database:
@@ -93,10 +185,46 @@ def init_database():
             );
         """)
 
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS insightsnapshot (
+                id SMALLINT PRIMARY KEY,
+                payload JSONB NOT NULL,
+                createdat TIMESTAMP DEFAULT (NOW() AT TIME ZONE 'Asia/Kolkata')
+            );
+        """)
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS trainingjobs (
+                id SERIAL PRIMARY KEY,
+                status VARCHAR(20) NOT NULL DEFAULT 'queued'
+                    CHECK (status IN ('queued', 'running', 'succeeded', 'failed')),
+                requestedby INTEGER REFERENCES users(userid) ON DELETE SET NULL,
+                progress JSONB NOT NULL DEFAULT '{}',
+                error TEXT,
+                createdat TIMESTAMP DEFAULT (NOW() AT TIME ZONE 'Asia/Kolkata'),
+                startedat TIMESTAMP,
+                finishedat TIMESTAMP,
+                updatedat TIMESTAMP DEFAULT (NOW() AT TIME ZONE 'Asia/Kolkata')
+            );
+        """)
+
+        # At most one queued or running training job.
+        cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_trainingjobs_active
+            ON trainingjobs ((true)) WHERE status IN ('queued', 'running');
+        """)
+
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_predictions_userid ON predictions(userid);")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_modelperformance_modelname ON modelperformance(modelname);")
 
+        # Serialize schema setup across gunicorn workers starting together.
+        cursor.execute("SELECT pg_advisory_lock(hashtext('aurora_air_init'))")
+        try:
+            create_stats_counters(cursor)
+        finally:
+            cursor.execute("SELECT pg_advisory_unlock(hashtext('aurora_air_init'))")
+
         print("✔ Tables verified or created successfully!")
 
         cursor.execute("SELECT userid FROM users WHERE email = %s", (ADMIN_EMAIL,))
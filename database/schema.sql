@@ -59,7 +59,105 @@ CREATE TABLE IF NOT EXISTS predictions (
     createdat TIMESTAMP DEFAULT (NOW() AT TIME ZONE 'Asia/Kolkata')
 );
 
+-- InsightSnapshot Table: Precomputed /insights statistics (single row, id = 1)
+CREATE TABLE IF NOT EXISTS insightsnapshot (
+    id SMALLINT PRIMARY KEY,
+    payload JSONB NOT NULL,
+    createdat TIMESTAMP DEFAULT (NOW() AT TIME ZONE 'Asia/Kolkata')
+);
+
+-- TrainingJobs Table: Background retrain jobs with per-model progress
+CREATE TABLE IF NOT EXISTS trainingjobs (
+    id SERIAL PRIMARY KEY,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued'
+        CHECK (status IN ('queued', 'running', 'succeeded', 'failed')),
+    requestedby INTEGER REFERENCES users(userid) ON DELETE SET NULL,
+    progress JSONB NOT NULL DEFAULT '{}',
+    error TEXT,
+    createdat TIMESTAMP DEFAULT (NOW() AT TIME ZONE 'Asia/Kolkata'),
+    startedat TIMESTAMP,
+    finishedat TIMESTAMP,
+    updatedat TIMESTAMP DEFAULT (NOW() AT TIME ZONE 'Asia/Kolkata')
+);
+
+-- At most one queued or running training job
+CREATE UNIQUE INDEX IF NOT EXISTS idx_trainingjobs_active
+    ON trainingjobs ((true)) WHERE status IN ('queued', 'running');
+
 -- Create indexes for better query performance
 CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
 CREATE INDEX IF NOT EXISTS idx_predictions_userid ON predictions(userid);
 CREATE INDEX IF NOT EXISTS idx_modelperformance_modelname ON modelperformance(modelname);
+
+-- AppStats Table: Dashboard counters maintained by statement-level triggers
+CREATE TABLE IF NOT EXISTS appstats (
+    name VARCHAR(50) PRIMARY KEY,
+    value BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE OR REPLACE FUNCTION appstats_count_rows() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE appstats SET value = value + (SELECT COUNT(*) FROM new_rows) WHERE name = TG_ARGV[0];
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE appstats SET value = value - (SELECT COUNT(*) FROM old_rows) WHERE name = TG_ARGV[0];
+    ELSIF TG_OP = 'TRUNCATE' THEN
+        UPDATE appstats SET value = 0 WHERE name = TG_ARGV[0];
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION appstats_count_models() RETURNS trigger AS $$
+BEGIN
+    UPDATE appstats SET value = (SELECT COUNT(DISTINCT modelname) FROM modelperformance)
+    WHERE name = 'models_trained';
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS predictions_appstats_insert ON predictions;
+CREATE TRIGGER predictions_appstats_insert AFTER INSERT ON predictions
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION appstats_count_rows('total_predictions');
+DROP TRIGGER IF EXISTS predictions_appstats_delete ON predictions;
+CREATE TRIGGER predictions_appstats_delete AFTER DELETE ON predictions
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION appstats_count_rows('total_predictions');
+DROP TRIGGER IF EXISTS predictions_appstats_truncate ON predictions;
+CREATE TRIGGER predictions_appstats_truncate AFTER TRUNCATE ON predictions
+    FOR EACH STATEMENT EXECUTE FUNCTION appstats_count_rows('total_predictions');
+
+DROP TRIGGER IF EXISTS airdata_appstats_insert ON airdata;
+CREATE TRIGGER airdata_appstats_insert AFTER INSERT ON airdata
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION appstats_count_rows('data_records');
+DROP TRIGGER IF EXISTS airdata_appstats_delete ON airdata;
+CREATE TRIGGER airdata_appstats_delete AFTER DELETE ON airdata
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION appstats_count_rows('data_records');
+DROP TRIGGER IF EXISTS airdata_appstats_truncate ON airdata;
+CREATE TRIGGER airdata_appstats_truncate AFTER TRUNCATE ON airdata
+    FOR EACH STATEMENT EXECUTE FUNCTION appstats_count_rows('data_records');
+
+DROP TRIGGER IF EXISTS users_appstats_insert ON users;
+CREATE TRIGGER users_appstats_insert AFTER INSERT ON users
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION appstats_count_rows('total_users');
+DROP TRIGGER IF EXISTS users_appstats_delete ON users;
+CREATE TRIGGER users_appstats_delete AFTER DELETE ON users
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION appstats_count_rows('total_users');
+DROP TRIGGER IF EXISTS users_appstats_truncate ON users;
+CREATE TRIGGER users_appstats_truncate AFTER TRUNCATE ON users
+    FOR EACH STATEMENT EXECUTE FUNCTION appstats_count_rows('total_users');
+
+DROP TRIGGER IF EXISTS modelperformance_appstats ON modelperformance;
+CREATE TRIGGER modelperformance_appstats
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON modelperformance
+    FOR EACH STATEMENT EXECUTE FUNCTION appstats_count_models();
+
+INSERT INTO appstats (name, value) SELECT 'total_predictions', COUNT(*) FROM predictions ON CONFLICT (name) DO NOTHING;
+INSERT INTO appstats (name, value) SELECT 'data_records', COUNT(*) FROM airdata ON CONFLICT (name) DO NOTHING;
+INSERT INTO appstats (name, value) SELECT 'total_users', COUNT(*) FROM users ON CONFLICT (name) DO NOTHING;
+INSERT INTO appstats (name, value) SELECT 'models_trained', COUNT(DISTINCT modelname) FROM modelperformance ON CONFLICT (name) DO NOTHING;
@@ -0,0 +1,183 @@
+import io
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from utils.helpers import FEATURE_ORDER, categorize_aqi, map_csv_columns
+from utils.preprocess import preprocess_data
+from utils.db_connect import pooled_connection
+from utils.ingest import COPY_BINARY_HEADER, COPY_BINARY_TRAILER
+from ml.train_linear import predict_with_linear
+from ml.train_randomforest import predict_with_rf
+from ml.train_xgboost import predict_with_xgb
+
+MODEL_PREDICTORS = {
+    'Linear Regression': predict_with_linear,
+    'Random Forest': predict_with_rf,
+    'XGBoost': predict_with_xgb
+}
+DEFAULT_MODEL = 'XGBoost'
+
+PREDICTION_COLUMNS = [
+    'userid', 'modelused', 'temperature', 'humidity', 'pm2_5', 'pm10',
+    'co', 'no2', 'so2', 'o3', 'predictedaqi', 'category'
+]
+
+
+def get_predictor(model_name):
+    """Return the predict_with_* function for a model name (XGBoost by default)."""
+    return MODEL_PREDICTORS.get(model_name, MODEL_PREDICTORS[DEFAULT_MODEL])
+
+
+def load_batch_input(source, filename=''):
+    """
+    Load batch prediction input into a DataFrame.
+
+    Args:
+        source: CSV/JSON file stream, raw JSON string/bytes, or parsed JSON:
+            an array of readings or an object {"rows": [...]}, where each
+            reading is an object keyed by feature name or an 8-value list in
+            FEATURE_ORDER
+        filename: Optional upload filename used to detect JSON files
+
+    Returns:
+        DataFrame with one row per reading
+    """
+    if hasattr(source, 'read') and not filename.lower().endswith('.json'):
+        return pd.read_csv(source)
+
+    if isinstance(source, (str, bytes)):
+        records = json.loads(source)
+    elif hasattr(source, 'read'):
+        records = json.loads(source.read())
+    else:
+        records = source
+
+    if isinstance(records, dict):
+        if 'rows' not in records:
+            raise ValueError('JSON input must be an array of readings or an object with a "rows" array')
+        records = records['rows']
+    if not isinstance(records, (list, tuple)):
+        raise ValueError('JSON input must be an array of readings or an object with a "rows" array')
+
+    if all(isinstance(record, dict) for record in records):
+        return pd.DataFrame(list(records))
+    if all(isinstance(record, (list, tuple)) and len(record) == len(FEATURE_ORDER) for record in records):
+        return pd.DataFrame(list(records), columns=FEATURE_ORDER)
+    raise ValueError(
+        f"Each JSON reading must be an object keyed by feature name or a list of "
+        f"{len(FEATURE_ORDER)} values in the order {', '.join(FEATURE_ORDER)}"
+    )
+
+
+def predict_batch(df, model_name=DEFAULT_MODEL):
+    """
+    Score every row of a DataFrame with one preprocessor and model call.
+
+    Rows with a missing or non-numeric feature are dropped and counted.
+
+    Args:
+        df: DataFrame with the 8 feature columns (any extra columns are ignored)
+        model_name: 'Linear Regression', 'Random Forest' or 'XGBoost'
+
+    Returns:
+        Tuple (result_df, rejected_rows) where result_df has the feature
+        columns plus PredictedAQI and Category
+    """
+    df = df.rename(columns=map_csv_columns(df.columns))
+
+    missing = [col for col in FEATURE_ORDER if col not in df.columns]
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+
+    features = df[FEATURE_ORDER].apply(pd.to_numeric, errors='coerce').dropna()
+    rejected = len(df) - len(features)
+
+    if len(features) == 0:
+        raise ValueError("No valid rows to predict.")
+
+    X = preprocess_data(features)
+    predictions = np.asarray(get_predictor(model_name)(X), dtype=np.float64)
+
+    result = features.reset_index(drop=True)
+    result['PredictedAQI'] = predictions
+    result['Category'] = categorize_aqi(predictions)[1]
+    return result, rejected
+
+
+def encode_predictions_copy(user_id, model_name, result):
+    """
+    Encode a predict_batch result as a binary COPY payload for predictions.
+
+    Rows are packed per category, since every category has a fixed-width
+    layout that fits one NumPy structured array, then scattered back into
+    the input order.
+    """
+    model_bytes = model_name.encode('utf-8')
+    values = result[FEATURE_ORDER + ['PredictedAQI']].to_numpy(dtype=np.float32)
+    categories = result['Category'].to_numpy()
+
+    packed = []
+    row_sizes = np.empty(len(categories), dtype=np.int64)
+    for category in pd.unique(categories):
+        mask = categories == category
+        category_bytes = category.encode('utf-8')
+
+        layout = [('fields', '>i2'), ('userid_len', '>i4')]
+        if user_id is not None:
+            layout.append(('userid', '>i4'))
+        layout += [('model_len', '>i4'), ('model', f'S{len(model_bytes)}')]
+        for i in range(values.shape[1]):
+            layout += [(f'len{i}', '>i4'), (f'val{i}', '>f4')]
+        layout += [('category_len', '>i4'), ('category', f'S{len(category_bytes)}')]
+
+        rows = np.empty(int(mask.sum()), dtype=np.dtype(layout))
+        rows['fields'] = len(PREDICTION_COLUMNS)
+        if user_id is None:
+            rows['userid_len'] = -1
+        else:
+            rows['userid_len'] = 4
+            rows['userid'] = user_id
+        rows['model_len'] = len(model_bytes)
+        rows['model'] = model_bytes
+        for i in range(values.shape[1]):
+            rows[f'len{i}'] = 4
+            rows[f'val{i}'] = values[mask, i]
+        rows['category_len'] = len(category_bytes)
+        rows['category'] = category_bytes
+
+        row_sizes[mask] = rows.dtype.itemsize
+        packed.append((mask, rows))
+
+    offsets = np.concatenate(([0], np.cumsum(row_sizes)[:-1])) if len(row_sizes) else row_sizes
+    body = np.empty(int(row_sizes.sum()), dtype=np.uint8)
+    for mask, rows in packed:
+        row_bytes = rows.view(np.uint8).reshape(len(rows), rows.dtype.itemsize)
+        body[offsets[mask][:, None] + np.arange(rows.dtype.itemsize)] = row_bytes
+
+    return b''.join([COPY_BINARY_HEADER, body.tobytes(), COPY_BINARY_TRAILER])
+
+
+def save_batch_predictions(user_id, model_name, result):
+    """Write a predict_batch result to the predictions table with one binary COPY."""
+    payload = encode_predictions_copy(user_id, model_name, result)
+
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY predictions ({', '.join(PREDICTION_COLUMNS)}) FROM STDIN WITH (FORMAT binary)",
+                io.BytesIO(payload)
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+    return len(result)
@@ -0,0 +1,302 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from psycopg2.extras import Json
+
+from utils.db_connect import execute_query, pooled_connection
+from utils.helpers import FEATURE_ORDER, get_ist_timestamp, aqi_category_counts, aqi_category_sql
+from utils.running_stats import RunningStats
+from ml.train_randomforest import get_feature_importance as get_rf_importance
+from ml.train_xgboost import get_feature_importance as get_xgb_importance
+
+FEATURE_COLUMNS = [feature.lower() for feature in FEATURE_ORDER]
+STATS_COLUMNS = FEATURE_COLUMNS + ['aqi']
+
+AQI_CATEGORY_SQL = aqi_category_sql('aqi')
+
+
+def _feature_label(column):
+    return column.upper().replace('_', '.')
+
+
+def _nullable(value):
+    return None if value is None or not np.isfinite(value) else float(value)
+
+
+def build_insights_snapshot(stats, aqi_distribution, xgb_importance=None, rf_importance=None):
+    """
+    Build the /insights payload from a RunningStats over STATS_COLUMNS.
+
+    The accumulator state is stored alongside the derived values so later
+    uploads can be merged in without rescanning airdata.
+    """
+    n_features = len(FEATURE_COLUMNS)
+    std = stats.std()
+    corr = stats.correlation()[:n_features, :n_features]
+
+    return {
+        'rows': stats.count,
+        'data_stats': [{
+            'feature': _feature_label(col),
+            'mean': _nullable(stats.mean[i]),
+            'std': _nullable(std[i]),
+            'min': _nullable(stats.min[i]),
+            'max': _nullable(stats.max[i])
+        } for i, col in enumerate(FEATURE_COLUMNS)],
+        'correlation_matrix': [[_nullable(v) for v in row] for row in corr],
+        'aqi_distribution': aqi_distribution,
+        'xgb_importance': xgb_importance or [],
+        'rf_importance': rf_importance or [],
+        'accumulator': stats.to_dict(),
+        'computed_at': get_ist_timestamp()
+    }
+
+
+def _fetch(query, cursor=None, fetchone=False):
+    if cursor is None:
+        return execute_query(query, fetchone=fetchone, fetch=not fetchone)
+    cursor.execute(query)
+    return cursor.fetchone() if fetchone else cursor.fetchall()
+
+
+def load_airdata_moments(cursor=None):
+    """
+    Build a RunningStats over airdata from one aggregate query.
+
+    COUNT/AVG/MIN/MAX and COVAR_POP for every column pair are computed in
+    PostgreSQL and converted into the same accumulator state that chunked
+    updates maintain, so no airdata rows are transferred to Python.
+
+    Args:
+        cursor: Optional cursor to run on, e.g. inside an open transaction
+    """
+    select = ['COUNT(*) AS rows']
+    for col in STATS_COLUMNS:
+        select += [f'AVG({col})::float8 AS mean_{col}',
+                   f'MIN({col})::float8 AS min_{col}',
+                   f'MAX({col})::float8 AS max_{col}']
+    for i, a in enumerate(STATS_COLUMNS):
+        for b in STATS_COLUMNS[i:]:
+            select.append(f'COVAR_POP({a}, {b}) AS cov_{a}_{b}')
+    complete = ' AND '.join(f'{col} IS NOT NULL' for col in STATS_COLUMNS)
+
+    row = _fetch(f"SELECT {', '.join(select)} FROM airdata WHERE {complete}", cursor, fetchone=True)
+    if not row or not row['rows']:
+        return RunningStats(len(STATS_COLUMNS))
+
+    k = len(STATS_COLUMNS)
+    covariance = np.zeros((k, k))
+    for i, a in enumerate(STATS_COLUMNS):
+        for j in range(i, k):
+            covariance[i, j] = covariance[j, i] = row[f'cov_{a}_{STATS_COLUMNS[j]}']
+
+    return RunningStats.from_moments(
+        row['rows'],
+        [row[f'mean_{col}'] for col in STATS_COLUMNS],
+        covariance,
+        [row[f'min_{col}'] for col in STATS_COLUMNS],
+        [row[f'max_{col}'] for col in STATS_COLUMNS]
+    )
+
+
+def compute_insights_snapshot(cursor=None):
+    """
+    Compute the full /insights snapshot inside PostgreSQL.
+
+    Args:
+        cursor: Optional cursor to run on, e.g. inside an open transaction
+
+    Returns:
+        Snapshot dictionary, or None if airdata is empty
+    """
+    stats = load_airdata_moments(cursor)
+    if stats.count == 0:
+        return None
+
+    distribution = _fetch(
+        f"""SELECT {AQI_CATEGORY_SQL} AS category, COUNT(*) AS count
+            FROM airdata WHERE aqi IS NOT NULL GROUP BY 1""",
+        cursor
+    )
+
+    return build_insights_snapshot(
+        stats,
+        {r['category']: int(r['count']) for r in distribution or []},
+        get_xgb_importance(),
+        get_rf_importance()
+    )
+
+
+def save_insights_snapshot(snapshot, cursor=None):
+    """Store the snapshot as the single row of the insightsnapshot table."""
+    query = """INSERT INTO insightsnapshot (id, payload, createdat)
+               VALUES (1, %s, NOW() AT TIME ZONE 'Asia/Kolkata')
+               ON CONFLICT (id) DO UPDATE
+               SET payload = EXCLUDED.payload, createdat = EXCLUDED.createdat"""
+    if cursor is None:
+        execute_query(query, (Json(snapshot),))
+    else:
+        cursor.execute(query, (Json(snapshot),))
+
+
+def _lock_snapshot(cursor):
+    """
+    Lock the snapshot row and return its payload. An empty row is inserted
+    first if there is none, so concurrent first writers queue on it too.
+    """
+    cursor.execute("""INSERT INTO insightsnapshot (id, payload, createdat)
+                      VALUES (1, '{}', NOW() AT TIME ZONE 'Asia/Kolkata')
+                      ON CONFLICT (id) DO NOTHING""")
+    cursor.execute("SELECT payload FROM insightsnapshot WHERE id = 1 FOR UPDATE")
+    return cursor.fetchone()['payload']
+
+
+def _rebuild_snapshot(cursor):
+    """Recompute and store the snapshot on a cursor that holds its row lock."""
+    snapshot = compute_insights_snapshot(cursor)
+    if snapshot is None:
+        cursor.execute("DELETE FROM insightsnapshot WHERE id = 1")
+    else:
+        save_insights_snapshot(snapshot, cursor)
+    return snapshot
+
+
+def refresh_insights_snapshot():
+    """
+    Recompute and store the insights snapshot from the whole table.
+    Used for the first snapshot and after a failed incremental update. The
+    scan runs under the snapshot row lock, after any upload merging into
+    the snapshot has committed.
+    """
+    try:
+        with pooled_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                _lock_snapshot(cursor)
+                snapshot = _rebuild_snapshot(cursor)
+                conn.commit()
+                return snapshot
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+    except Exception as e:
+        print(f"Error refreshing insights snapshot: {e}")
+        return None
+
+
+class InsightsDelta:
+    """
+    Statistics for rows ingested by one upload, merged into the stored
+    snapshot in the upload's own transaction (pass apply as
+    ingest_airdata's before_commit), so the snapshot and the rows it
+    covers become visible together.
+    """
+
+    def __init__(self):
+        self.stats = RunningStats(len(STATS_COLUMNS))
+        self.aqi_distribution = {}
+
+    def add_chunk(self, df):
+        """
+        Fold a cleaned airdata chunk (FEATURE_ORDER + AQI columns) into the
+        delta. Values are rounded to float32 first, as stored in the REAL
+        airdata columns.
+        """
+        values = df.to_numpy(dtype=np.float32).astype(np.float64)
+        if len(values) == 0:
+            return
+        self.stats.update(values)
+        for category, count in aqi_category_counts(values[:, -1]).items():
+            self.aqi_distribution[category] = self.aqi_distribution.get(category, 0) + count
+
+    def apply(self, cursor=None):
+        """
+        Merge this delta into the stored snapshot under its row lock.
+
+        If there is no incremental state yet the snapshot is recomputed
+        from airdata while the lock is held. With a cursor the work runs
+        in the caller's open transaction (inside a savepoint, so a failure
+        only drops the snapshot and it is rebuilt on next read);
+        otherwise it runs and commits on its own connection.
+        """
+        if self.stats.count == 0:
+            return None
+        if cursor is None:
+            with pooled_connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    snapshot = self.apply(cursor)
+                    conn.commit()
+                    return snapshot
+                except Exception:
+                    conn.rollback()
+                    raise
+                finally:
+                    cursor.close()
+
+        cursor.execute("SAVEPOINT insights_delta")
+        try:
+            snapshot = self._merge(cursor)
+            cursor.execute("RELEASE SAVEPOINT insights_delta")
+            return snapshot
+        except Exception as e:
+            print(f"Error updating insights snapshot: {e}")
+            cursor.execute("ROLLBACK TO SAVEPOINT insights_delta")
+            cursor.execute("DELETE FROM insightsnapshot WHERE id = 1")
+            return None
+
+    def _merge(self, cursor):
+        payload = _lock_snapshot(cursor)
+        if 'accumulator' not in payload:
+            # The full scan sees this transaction's own rows, so the delta is already included.
+            return _rebuild_snapshot(cursor)
+
+        stats = RunningStats.from_dict(payload['accumulator']).merge(self.stats)
+        distribution = dict(payload.get('aqi_distribution', {}))
+        for category, count in self.aqi_distribution.items():
+            distribution[category] = distribution.get(category, 0) + count
+
+        snapshot = build_insights_snapshot(
+            stats, distribution,
+            payload.get('xgb_importance'), payload.get('rf_importance')
+        )
+        save_insights_snapshot(snapshot, cursor)
+        return snapshot
+
+
+def update_snapshot_importances():
+    """Replace the feature importances in the stored snapshot after training."""
+    try:
+        row = execute_query("SELECT payload FROM insightsnapshot WHERE id = 1", fetchone=True)
+        if not row or 'accumulator' not in row['payload']:
+            return refresh_insights_snapshot()
+        execute_query(
+            """UPDATE insightsnapshot
+               SET payload = payload || %s, createdat = NOW() AT TIME ZONE 'Asia/Kolkata'
+               WHERE id = 1""",
+            (Json({
+                'xgb_importance': get_xgb_importance() or [],
+                'rf_importance': get_rf_importance() or [],
+                'computed_at': get_ist_timestamp()
+            }),)
+        )
+    except Exception as e:
+        print(f"Error updating insights importances: {e}")
+
+
+def get_insights_snapshot():
+    """
+    Return the stored insights snapshot, computing it on first use.
+
+    Returns:
+        Snapshot dictionary, or None if there is no data yet
+    """
+    row = execute_query("SELECT payload FROM insightsnapshot WHERE id = 1", fetchone=True)
+    if row and row['payload']:
+        return row['payload']
+    return refresh_insights_snapshot()
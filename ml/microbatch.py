@@ -0,0 +1,169 @@
+import os
+import sys
+import time
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from utils.helpers import FEATURE_ORDER
+from utils.preprocess import transform_features
+from ml.batch_predict import MODEL_PREDICTORS, DEFAULT_MODEL, get_predictor
+
+BATCH_MAX_SIZE = int(os.environ.get('MICROBATCH_MAX_SIZE', '64'))
+BATCH_MAX_WAIT_MS = float(os.environ.get('MICROBATCH_MAX_WAIT_MS', '2'))
+RESULT_TIMEOUT = float(os.environ.get('MICROBATCH_RESULT_TIMEOUT', '30'))
+BATCH_MAX_QUEUE = int(os.environ.get('MICROBATCH_MAX_QUEUE', '1024'))
+
+
+class Overloaded(Exception):
+    """The batcher's queue is full or a prediction did not run within its timeout."""
+
+
+class MicroBatcher:
+    """
+    Coalesce concurrent single-row predictions into one model call.
+
+    Callers submit a raw feature row (FEATURE_ORDER) and block on a Future.
+    A background thread takes the first queued row, keeps collecting rows
+    for up to max_wait_ms or until max_batch_size rows are queued, then runs
+    the preprocessor and model once on the stacked (N, 8) matrix.
+
+    Coalescing only happens when requests are served concurrently inside
+    one process (threaded dev server or gunicorn gthread workers).
+
+    The queue holds at most max_queue rows; submit() raises Overloaded
+    instead of queueing more, and so does predict() when the row has not
+    been scored within its timeout.
+    """
+
+    def __init__(self, model_name, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS,
+                 max_queue=BATCH_MAX_QUEUE):
+        self.model_name = model_name
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.max_queue = max(1, max_queue)
+        self._queue = queue.Queue(self.max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.batches = 0
+        self.rows = 0
+        self.full_batches = 0
+        self.rejected = 0
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue(self.max_queue)
+                self._pid = os.getpid()
+                self._thread = threading.Thread(
+                    target=self._run, name=f'microbatch-{self.model_name}', daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, row):
+        """Queue one raw feature row and return a Future for its prediction."""
+        row = np.asarray(row, dtype=np.float64).reshape(len(FEATURE_ORDER))
+        self._ensure_worker()
+        future = Future()
+        try:
+            self._queue.put_nowait((row, future))
+        except queue.Full:
+            self.rejected += 1
+            raise Overloaded(f"{self.model_name} prediction queue is full ({self.max_queue} rows)")
+        return future
+
+    def predict(self, row, timeout=RESULT_TIMEOUT):
+        """Predict one raw feature row, blocking until its batch has run."""
+        future = self.submit(row)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            self.rejected += 1
+            raise Overloaded(f"{self.model_name} prediction did not run within {timeout:g}s")
+
+    def _collect(self):
+        items = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(items) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    items.append(self._queue.get(timeout=remaining))
+                else:
+                    items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self):
+        predictor = get_predictor(self.model_name)
+        while True:
+            items = self._collect()
+            batch = [(row, future) for row, future in items if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            rows = [row for row, _ in batch]
+            futures = [future for _, future in batch]
+
+            self.batches += 1
+            self.rows += len(rows)
+            if len(rows) >= self.max_batch_size:
+                self.full_batches += 1
+
+            try:
+                predictions = predictor(transform_features(np.vstack(rows)))
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            for future, value in zip(futures, predictions):
+                future.set_result(float(value))
+
+    def stats(self):
+        """Return counters for this batcher, including the average batch fill ratio."""
+        batches = self.batches
+        rows = self.rows
+        return {
+            'model': self.model_name,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+            'batches': batches,
+            'rows': rows,
+            'full_batches': self.full_batches,
+            'rejected': self.rejected,
+            'max_queue': self.max_queue,
+            'avg_batch_size': rows / batches if batches else 0.0,
+            'fill_ratio': rows / (batches * self.max_batch_size) if batches else 0.0
+        }
+
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batcher(model_name):
+    """Return the process-wide MicroBatcher for a model, creating it on first use."""
+    if model_name not in MODEL_PREDICTORS:
+        model_name = DEFAULT_MODEL
+    batcher = _batchers.get(model_name)
+    if batcher is None:
+        with _batchers_lock:
+            batcher = _batchers.get(model_name)
+            if batcher is None:
+                batcher = _batchers[model_name] = MicroBatcher(model_name)
+    return batcher
+
+
+def get_microbatch_stats():
+    """Return stats for every batcher created in this process."""
+    return [batcher.stats() for batcher in list(_batchers.values())]
@@ -0,0 +1,278 @@
+import os
+import sys
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.preprocess as preprocess
+import ml.train_linear as train_linear
+import ml.train_randomforest as train_randomforest
+import ml.train_xgboost as train_xgboost
+from utils.model_registry import CHECK_INTERVAL, get_loaded_version
+from ml.batch_predict import MODEL_PREDICTORS, DEFAULT_MODEL
+
+CACHE_ENABLED = os.environ.get('PREDICTION_CACHE', '1') == '1'
+CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', '10000'))
+CACHE_TTL = float(os.environ.get('PREDICTION_CACHE_TTL', '300'))
+# Decimal places features are rounded to before lookup and prediction (unset: exact).
+CACHE_ROUND = os.environ.get('PREDICTION_CACHE_ROUND', '')
+CACHE_SHARED_PATH = os.environ.get('PREDICTION_CACHE_SHARED_PATH', '')
+CACHE_SHARED_SIZE = int(os.environ.get('PREDICTION_CACHE_SHARED_SIZE', '100000'))
+SHARED_PRUNE_EVERY = int(os.environ.get('PREDICTION_CACHE_SHARED_PRUNE_EVERY', '1000'))
+SHARED_ERROR_LOG_INTERVAL = 60.0
+
+MODEL_MODULES = {
+    'Linear Regression': (train_linear, train_linear.load_linear_model),
+    'Random Forest': (train_randomforest, train_randomforest.load_rf_model),
+    'XGBoost': (train_xgboost, train_xgboost.load_xgb_model)
+}
+
+
+_versions = {}
+
+
+def artifact_versions(model_name):
+    """
+    Return (model version, preprocessor version) of the resident artifacts,
+    or None if either is missing.
+
+    The versions are read from the model registry after the loaders have
+    run, so they name the objects that will actually serve the prediction;
+    a retrain changes them and old entries are simply never looked up again.
+    The loaders run at most once per CHECK_INTERVAL per model, the same
+    interval at which the registry re-checks the files.
+    """
+    now = time.monotonic()
+    cached = _versions.get(model_name)
+    if cached is not None and now - cached[0] < CHECK_INTERVAL:
+        return cached[1]
+
+    module, loader = MODEL_MODULES[model_name]
+    versions = None
+    if loader() is not None and preprocess.load_preprocessor() is not None:
+        model_version = (get_loaded_version(module.MODEL_PATH, load=False)
+                         or get_loaded_version(module.LEGACY_MODEL_PATH, load=False))
+        preprocessor_version = get_loaded_version(preprocess.PREPROCESSOR_PATH, load=False)
+        if model_version is not None and preprocessor_version is not None:
+            versions = (model_version, preprocessor_version)
+    _versions[model_name] = (now, versions)
+    return versions
+
+
+class SharedStore:
+    """
+    Prediction store in a local SQLite file shared by all workers on a host.
+
+    WAL mode lets workers read while another writes. Every
+    SHARED_PRUNE_EVERY writes, expired rows are deleted and the table is
+    trimmed to max_entries. Errors are treated as misses; they are
+    counted and printed at most once per SHARED_ERROR_LOG_INTERVAL.
+    """
+
+    def __init__(self, path, max_entries, ttl):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+        self.errors = 0
+        self._error_logged_at = None
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("""CREATE TABLE IF NOT EXISTS predictioncache (
+            key TEXT PRIMARY KEY, value REAL NOT NULL, expires REAL NOT NULL)""")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _error(self, e):
+        self.errors += 1
+        now = time.monotonic()
+        if self._error_logged_at is None or now - self._error_logged_at >= SHARED_ERROR_LOG_INTERVAL:
+            self._error_logged_at = now
+            print(f"Prediction cache store error ({self.errors} so far): {e}")
+
+    def get(self, key):
+        try:
+            row = self._connection().execute(
+                "SELECT value FROM predictioncache WHERE key = ? AND expires > ?", (key, time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            self._error(e)
+            return None
+        return row[0] if row else None
+
+    def put(self, key, value):
+        try:
+            conn = self._connection()
+            conn.execute("INSERT OR REPLACE INTO predictioncache (key, value, expires) VALUES (?, ?, ?)",
+                         (key, value, time.time() + self.ttl))
+            self._writes += 1
+            if self._writes % SHARED_PRUNE_EVERY == 0:
+                self.prune(conn)
+        except sqlite3.Error as e:
+            self._error(e)
+
+    def prune(self, conn=None):
+        conn = conn or self._connection()
+        conn.execute("DELETE FROM predictioncache WHERE expires <= ?", (time.time(),))
+        conn.execute("""DELETE FROM predictioncache WHERE key IN (
+            SELECT key FROM predictioncache ORDER BY expires DESC LIMIT -1 OFFSET ?)""",
+                     (self.max_entries,))
+
+    def clear(self):
+        try:
+            self._connection().execute("DELETE FROM predictioncache")
+        except sqlite3.Error as e:
+            self._error(e)
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache of single-row predictions with a TTL.
+
+    Keys are (model name, model version, preprocessor version, feature
+    tuple). When a shared store is configured it is consulted on a local
+    miss, so a hit in one gunicorn worker serves every worker.
+    """
+
+    def __init__(self, max_entries=CACHE_SIZE, ttl=CACHE_TTL, round_digits=None, shared=None):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.round_digits = round_digits
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def normalize(self, row):
+        """Return the feature tuple used for the key (and for prediction)."""
+        if self.round_digits is None:
+            return tuple(float(v) for v in row)
+        return tuple(round(float(v), self.round_digits) for v in row)
+
+    def _get_local(self, key, now):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def _put_local(self, key, value, now):
+        with self._lock:
+            self._entries[key] = (value, now + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_predict(self, model_name, row, predict):
+        """
+        Return the prediction for one raw FEATURE_ORDER row.
+
+        Args:
+            model_name: Model the prediction is for
+            row: Raw feature values in FEATURE_ORDER
+            predict: Callable(row) -> float run on a miss, with the
+                normalized (possibly rounded) row
+        """
+        features = self.normalize(row)
+        versions = artifact_versions(model_name)
+        if versions is None:
+            return predict(features)
+
+        key = (model_name,) + versions + features
+        now = time.monotonic()
+        value = self._get_local(key, now)
+        if value is not None:
+            return value
+
+        shared_key = '|'.join(repr(part) for part in key) if self.shared is not None else None
+        if shared_key is not None:
+            value = self.shared.get(shared_key)
+            if value is not None:
+                with self._lock:
+                    self.shared_hits += 1
+                self._put_local(key, value, now)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        value = float(predict(features))
+        self._put_local(key, value, now)
+        if shared_key is not None:
+            self.shared.put(shared_key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'round_digits': self.round_digits,
+                'shared': self.shared.path if self.shared is not None else None,
+                'shared_errors': self.shared.errors if self.shared is not None else 0,
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': (self.hits + self.shared_hits) / lookups if lookups else 0.0
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_prediction_cache():
+    """Return the process-wide PredictionCache, created from the environment on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                shared = None
+                if CACHE_SHARED_PATH:
+                    shared = SharedStore(CACHE_SHARED_PATH, CACHE_SHARED_SIZE, CACHE_TTL)
+                _cache = PredictionCache(
+                    round_digits=int(CACHE_ROUND) if CACHE_ROUND else None,
+                    shared=shared
+                )
+    return _cache
+
+
+def cached_predict(model_name, row, predict):
+    """
+    Predict one raw row through the prediction cache (or directly when
+    PREDICTION_CACHE=0). Unknown model names fall back to DEFAULT_MODEL.
+    """
+    if model_name not in MODEL_PREDICTORS:
+        model_name = DEFAULT_MODEL
+    if not CACHE_ENABLED:
+        return float(predict(tuple(row)))
+    return get_prediction_cache().get_or_predict(model_name, row, predict)
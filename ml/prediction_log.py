@@ -0,0 +1,229 @@
+import os
+import sys
+import time
+import queue
+import atexit
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from psycopg2.extras import execute_values
+
+from utils.db_connect import pooled_connection
+from utils.dashboard_stats import invalidate_dashboard_stats
+from ml.batch_predict import PREDICTION_COLUMNS
+
+# 'async': the request only enqueues. Rows still queued when the process
+# dies uncleanly are lost, and so is a batch that fails LOG_RETRIES + 1
+# times (logged as DROPPED). 'sync': every row is inserted before returning.
+LOG_MODE = os.environ.get('PREDICTION_LOG_MODE', 'async').lower()
+LOG_MAX_QUEUE = int(os.environ.get('PREDICTION_LOG_MAX_QUEUE', '10000'))
+LOG_FLUSH_ROWS = int(os.environ.get('PREDICTION_LOG_FLUSH_ROWS', '500'))
+LOG_FLUSH_INTERVAL_MS = float(os.environ.get('PREDICTION_LOG_FLUSH_INTERVAL_MS', '200'))
+LOG_ENQUEUE_TIMEOUT = float(os.environ.get('PREDICTION_LOG_ENQUEUE_TIMEOUT', '0.05'))
+LOG_RETRIES = int(os.environ.get('PREDICTION_LOG_RETRIES', '3'))
+LOG_CLOSE_TIMEOUT = float(os.environ.get('PREDICTION_LOG_CLOSE_TIMEOUT', '10'))
+
+LOG_MODES = ('async', 'sync')
+
+_STOP = object()
+
+
+def write_prediction_rows(rows):
+    """Insert prediction rows (tuples in PREDICTION_COLUMNS order) with one multi-row INSERT."""
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            execute_values(
+                cursor,
+                f"INSERT INTO predictions ({', '.join(PREDICTION_COLUMNS)}) VALUES %s",
+                rows,
+                page_size=len(rows)
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+
+class PredictionLogWriter:
+    """
+    Buffered writer for the predictions table.
+
+    log() puts a row on a bounded in-memory queue and returns. A
+    background thread takes the first queued row, keeps collecting for up
+    to flush_interval_ms or until flush_rows rows are queued, and writes
+    them with one multi-row INSERT (retried up to LOG_RETRIES times).
+
+    When the queue is full, log() waits up to enqueue_timeout seconds for
+    room and then writes the row itself, so a slow database pushes back on
+    callers instead of growing memory.
+
+    Delivery is best effort: a batch that still fails after its retries
+    is dropped (counted in stats()['dropped'] and logged loudly), and a
+    retry after a commit whose acknowledgement was lost can insert the
+    batch twice. Use PREDICTION_LOG_MODE=sync where every row must be
+    stored exactly once or the request must fail.
+    """
+
+    def __init__(self, mode=LOG_MODE, max_queue=LOG_MAX_QUEUE, flush_rows=LOG_FLUSH_ROWS,
+                 flush_interval_ms=LOG_FLUSH_INTERVAL_MS, enqueue_timeout=LOG_ENQUEUE_TIMEOUT):
+        if mode not in LOG_MODES:
+            raise ValueError(f"PREDICTION_LOG_MODE must be one of: {', '.join(LOG_MODES)}")
+        self.mode = mode
+        self.max_queue = max(1, max_queue)
+        self.flush_rows = max(1, flush_rows)
+        self.flush_interval = max(0.0, flush_interval_ms) / 1000.0
+        self.enqueue_timeout = max(0.0, enqueue_timeout)
+        self._queue = queue.Queue(self.max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._closed = False
+        self.written = 0
+        self.batches = 0
+        self.inline_writes = 0
+        self.failed_batches = 0
+        self.dropped = 0
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue(self.max_queue)
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='prediction-log', daemon=True)
+                self._thread.start()
+
+    def _write(self, rows):
+        write_prediction_rows(rows)
+        invalidate_dashboard_stats()
+
+    def log(self, row):
+        """Record one prediction row (a tuple in PREDICTION_COLUMNS order)."""
+        if self.mode == 'sync' or self._closed:
+            self._write([row])
+            return
+
+        self._ensure_worker()
+        try:
+            self._queue.put(row, timeout=self.enqueue_timeout)
+        except queue.Full:
+            self.inline_writes += 1
+            self._write([row])
+
+    def _collect(self):
+        rows = []
+        markers = []
+        item = self._queue.get()
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            if item is _STOP or isinstance(item, threading.Event):
+                markers.append(item)
+                break
+            rows.append(item)
+            if len(rows) >= self.flush_rows:
+                break
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+        return rows, markers
+
+    def _write_batch(self, rows):
+        for attempt in range(LOG_RETRIES + 1):
+            try:
+                self._write(rows)
+                self.written += len(rows)
+                self.batches += 1
+                return
+            except Exception as e:
+                self.failed_batches += 1
+                print(f"Prediction log write failed ({len(rows)} rows, attempt {attempt + 1}): {e}")
+                if attempt < LOG_RETRIES:
+                    time.sleep(min(2.0, 0.1 * 2 ** attempt))
+        self.dropped += len(rows)
+        print(f"DROPPED {len(rows)} prediction log rows after {LOG_RETRIES + 1} failed attempts "
+              f"({self.dropped} dropped in total)")
+
+    def _run(self):
+        while True:
+            rows, markers = self._collect()
+            if rows:
+                self._write_batch(rows)
+            for marker in markers:
+                if marker is _STOP:
+                    return
+                marker.set()
+
+    def flush(self, timeout=None):
+        """Block until every row queued before this call has been written."""
+        if self.mode == 'sync' or self._thread is None or self._pid != os.getpid():
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=LOG_CLOSE_TIMEOUT):
+        """Flush the queue and stop the writer; later rows are written synchronously."""
+        self._closed = True
+        thread = self._thread
+        if thread is None or self._pid != os.getpid() or not thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+        if thread.is_alive():
+            return
+
+        # Rows enqueued while the writer was stopping.
+        rows = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is not _STOP:
+                rows.append(item)
+        if rows:
+            self._write_batch(rows)
+
+    def stats(self):
+        return {
+            'mode': self.mode,
+            'queued': self._queue.qsize(),
+            'max_queue': self.max_queue,
+            'written': self.written,
+            'batches': self.batches,
+            'avg_batch_size': self.written / self.batches if self.batches else 0.0,
+            'inline_writes': self.inline_writes,
+            'failed_batches': self.failed_batches,
+            'dropped': self.dropped
+        }
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_prediction_log():
+    """Return the process-wide PredictionLogWriter, creating it on first use."""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = PredictionLogWriter()
+                atexit.register(close_prediction_log)
+    return _writer
+
+
+def close_prediction_log():
+    """Flush and stop the writer, e.g. from a gunicorn worker_exit hook (also run at exit)."""
+    if _writer is not None:
+        _writer.close()
@@ -0,0 +1,390 @@
+import os
+import sys
+import shutil
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from sklearn.model_selection import train_test_split
+
+from utils.db_connect import execute_query, fetch_array
+from utils.helpers import FEATURE_ORDER
+from utils.preprocess import (
+    MODELS_DIR, fit_preprocessor, save_preprocessor, load_preprocessor, apply_preprocessor
+)
+from utils.model_registry import load_artifact, save_artifact, install_artifact
+from utils.dashboard_stats import get_dashboard_stats
+from utils.data_cache import CACHE_ENABLED, load_airdata_columns
+from ml.train_linear import (
+    fit_linear_regression, linear_sufficient_stats, update_linear_regression, save_metrics_to_db
+)
+from ml.train_randomforest import fit_random_forest, update_random_forest
+from ml.train_xgboost import fit_xgboost, update_xgboost
+import ml.train_linear as train_linear
+import ml.train_randomforest as train_randomforest
+import ml.train_xgboost as train_xgboost
+
+TRAIN_PARALLEL = os.environ.get('TRAIN_PARALLEL', '1') == '1'
+TRAIN_RF_JOBS = int(os.environ.get('TRAIN_RF_JOBS', '0'))
+TRAIN_XGB_JOBS = int(os.environ.get('TRAIN_XGB_JOBS', '0'))
+
+TRAINERS = {
+    'Linear Regression': fit_linear_regression,
+    'Random Forest': fit_random_forest,
+    'XGBoost': fit_xgboost
+}
+MATRICES = ('X_train', 'X_test', 'y_train', 'y_test')
+MIN_TRAINING_ROWS = 10
+TRAINING_COLUMNS = [feature.lower() for feature in FEATURE_ORDER] + ['aqi']
+
+TRAINING_STATE_PATH = os.path.join(MODELS_DIR, 'training_state.pkl')
+HOLDOUT_MAX_ROWS = int(os.environ.get('TRAIN_HOLDOUT_MAX_ROWS', '100000'))
+
+
+def _model_paths():
+    """Installed path of each model (read at call time, so overrides apply)."""
+    return {
+        'Linear Regression': train_linear.MODEL_PATH,
+        'Random Forest': train_randomforest.MODEL_PATH,
+        'XGBoost': train_xgboost.MODEL_PATH
+    }
+
+
+def split_cores(cpu_count=None):
+    """
+    Split the available cores between RF (n_jobs) and XGBoost (n_jobs/nthread).
+
+    Linear regression takes one core and finishes long before the tree
+    models; RF gets the larger share as it is usually the slowest fit.
+    TRAIN_RF_JOBS / TRAIN_XGB_JOBS override either side.
+    """
+    cpu_count = cpu_count or os.cpu_count() or 1
+    available = max(1, cpu_count - 1)
+    rf_jobs = TRAIN_RF_JOBS or max(1, (available + 1) // 2)
+    xgb_jobs = TRAIN_XGB_JOBS or max(1, available - rf_jobs)
+    return rf_jobs, xgb_jobs
+
+
+def load_training_data(after_id=None, use_cache=CACHE_ENABLED):
+    """
+    Load airdata as a raw (X, y) training set.
+
+    By default rows come from the local columnar cache (utils.data_cache),
+    which only fetches rows added since its last sync and is read through
+    memory maps. Without the cache, rows are streamed into one NumPy array
+    with binary COPY (no per-row dicts or DataFrame). Either way rows with
+    any NULL are dropped.
+
+    Args:
+        after_id: Only load rows with id > after_id (incremental training)
+        use_cache: Read through the local airdata cache (TRAINING_CACHE)
+
+    Returns:
+        Tuple (X, y, high_water_mark, rows_read) where high_water_mark is
+        the largest airdata.id read (or after_id if there were no new rows)
+        and rows_read counts every row read, including dropped NULL rows
+
+    Raises:
+        ValueError: If a full load finds fewer than MIN_TRAINING_ROWS records
+    """
+    data = None
+    if use_cache:
+        try:
+            columns = load_airdata_columns()
+            start = 0
+            if after_id is not None:
+                start = int(np.searchsorted(columns['id'], after_id, side='right'))
+            data = np.column_stack([columns[col][start:] for col in ['id'] + TRAINING_COLUMNS])
+        except (OSError, ValueError) as e:
+            print(f"Airdata cache unavailable, loading from the database: {e}")
+
+    if data is None:
+        query = f"SELECT id, {', '.join(TRAINING_COLUMNS)} FROM airdata"
+        params = None
+        row_hint = get_dashboard_stats()['data_records']
+        if after_id is not None:
+            query += " WHERE id > %s"
+            params = (after_id,)
+            row_hint = None
+
+        data = fetch_array(query, ['id'] + TRAINING_COLUMNS, params=params, row_hint=row_hint)
+
+    high_water_mark = int(data[:, 0].max()) if len(data) else after_id
+    rows_read = len(data)
+    data = data[~np.isnan(data[:, 1:]).any(axis=1), 1:]
+    if after_id is None and len(data) < MIN_TRAINING_ROWS:
+        raise ValueError(
+            f'Not enough data to train models. Please upload at least {MIN_TRAINING_ROWS} records.'
+        )
+    return data[:, :-1], data[:, -1], high_water_mark, rows_read
+
+
+def load_training_state():
+    """Return the state saved by the last training run, or None."""
+    return load_artifact(TRAINING_STATE_PATH)
+
+
+def training_state_is_current(state):
+    """
+    Check that the rows at or below the saved high-water mark are exactly
+    the ones the saved state was built from.
+
+    airdata ids are assigned at insert time, not in commit order, so a long
+    upload can commit ids below a mark an incremental run has already
+    recorded; those rows would never be picked up by later incremental
+    runs. Any difference in the count (late commits or deletions) means a
+    full rebuild is needed.
+    """
+    covered_rows = state.get('covered_rows')
+    if covered_rows is None or state['high_water_mark'] is None:
+        return False
+    row = execute_query(
+        "SELECT COUNT(*) AS count FROM airdata WHERE id <= %s",
+        (state['high_water_mark'],), fetchone=True
+    )
+    return row['count'] == covered_rows
+
+
+def _save_training_state(high_water_mark, covered_rows, xtx, xty, holdout_X, holdout_y, rows, random_state=42):
+    if len(holdout_X) > HOLDOUT_MAX_ROWS:
+        keep = np.random.default_rng(random_state).choice(len(holdout_X), HOLDOUT_MAX_ROWS, replace=False)
+        holdout_X, holdout_y = holdout_X[keep], holdout_y[keep]
+    save_artifact({
+        'high_water_mark': high_water_mark,
+        'covered_rows': covered_rows,
+        'rows': rows,
+        'xtx': xtx,
+        'xty': xty,
+        'holdout_X': np.asarray(holdout_X, dtype=np.float64),
+        'holdout_y': np.asarray(holdout_y, dtype=np.float64)
+    }, TRAINING_STATE_PATH)
+
+
+def _save_matrices(directory, matrices):
+    for name, array in matrices.items():
+        np.save(os.path.join(directory, f'{name}.npy'), np.ascontiguousarray(array))
+
+
+def _load_matrices(directory):
+    return {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r')
+            for name in MATRICES}
+
+
+def _fit_worker(model_name, directory, kwargs):
+    """Run one trainer on the memory-mapped matrices; return only picklable results."""
+    m = _load_matrices(directory)
+    result = TRAINERS[model_name](m['X_train'], m['y_train'], m['X_test'], m['y_test'], **kwargs)
+    result.pop('model', None)
+    return result
+
+
+def train_all_models(X, y, test_size=0.2, random_state=42, parallel=TRAIN_PARALLEL,
+                     started=None, progress=None, high_water_mark=None, rows_read=None):
+    """
+    Train Linear Regression, Random Forest and XGBoost on one shared split.
+
+    The split is made once and the preprocessor is fitted on X_train, so
+    the models are trained on exactly the transform that /predict applies.
+    Models are written to a staging directory next to models/; only when
+    every fit has succeeded are the preprocessor and the models installed
+    (and their metrics recorded), so /predict never pairs a new scaler
+    with old models. The scaled matrices are written once as .npy files
+    and memory-mapped read-only by each worker process; the three fits
+    run concurrently with the cores split between RF and XGBoost.
+
+    Args:
+        X: Raw feature matrix (FEATURE_ORDER)
+        y: AQI targets
+        parallel: Run the fits in a process pool (falls back to sequential
+            on single-core hosts)
+        started: Optional callback(model_name) called in the parent when a
+            model's fit is started
+        progress: Optional callback(model_name, result) called in the parent
+            as each model finishes
+        high_water_mark: Largest airdata.id in X; when given, the state
+            needed by update_all_models() is saved after a successful run
+        rows_read: Rows read from airdata for X (load_training_data),
+            saved with the state to detect rows committed below the mark
+
+    Returns:
+        Dictionary mapping model name to its result (metrics, model_path,
+        feature_importance for the tree models)
+    """
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=test_size, random_state=random_state
+    )
+    # Installed only after every model has been fitted, together with them.
+    preprocessor = fit_preprocessor(X_train, save=False)
+    matrices = {
+        'X_train': apply_preprocessor(preprocessor, X_train),
+        'X_test': apply_preprocessor(preprocessor, X_test),
+        'y_train': np.asarray(y_train, dtype=np.float64),
+        'y_test': np.asarray(y_test, dtype=np.float64)
+    }
+
+    parallel = parallel and (os.cpu_count() or 1) > 1
+    if parallel:
+        rf_jobs, xgb_jobs = split_cores()
+    else:
+        rf_jobs, xgb_jobs = -1, None
+    model_paths = _model_paths()
+    os.makedirs(os.path.dirname(model_paths['Linear Regression']), exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.staging-', dir=os.path.dirname(model_paths['Linear Regression']))
+    staged_paths = {name: os.path.join(staging, os.path.basename(path)) for name, path in model_paths.items()}
+    kwargs = {
+        'Linear Regression': {'model_path': staged_paths['Linear Regression']},
+        'Random Forest': {'random_state': random_state, 'n_jobs': rf_jobs,
+                          'model_path': staged_paths['Random Forest']},
+        'XGBoost': {'random_state': random_state, 'n_jobs': xgb_jobs,
+                    'model_path': staged_paths['XGBoost']}
+    }
+
+    results = {}
+    errors = []
+
+    def finish(model_name, result):
+        results[model_name] = result
+        if progress is not None:
+            progress(model_name, result)
+
+    try:
+        _run_trainers(matrices, kwargs, parallel, started, finish, errors)
+        if errors:
+            raise errors[0]
+
+        save_preprocessor(preprocessor)
+        for model_name, path in model_paths.items():
+            install_artifact(staged_paths[model_name], path)
+            results[model_name]['model_path'] = path
+            save_metrics_to_db(model_name, results[model_name]['metrics'])
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    if high_water_mark is not None:
+        xtx, xty = linear_sufficient_stats(matrices['X_train'], matrices['y_train'])
+        _save_training_state(high_water_mark, rows_read, xtx, xty, X_test, y_test, len(X_train), random_state)
+    return results
+
+
+def _run_trainers(matrices, kwargs, parallel, started, finish, errors):
+    """Run every trainer (in a spawn process pool when parallel); collect failures in errors."""
+    if not parallel:
+        for model_name, trainer in TRAINERS.items():
+            if started is not None:
+                started(model_name)
+            try:
+                result = trainer(matrices['X_train'], matrices['y_train'],
+                                 matrices['X_test'], matrices['y_test'], **kwargs[model_name])
+                result.pop('model', None)
+                finish(model_name, result)
+            except Exception as e:
+                print(f"Error training {model_name}: {e}")
+                errors.append(e)
+    else:
+        directory = tempfile.mkdtemp(prefix='aurora-train-')
+        try:
+            _save_matrices(directory, matrices)
+            # spawn keeps the workers clear of the parent's DB pool and threads.
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=len(TRAINERS), mp_context=context) as pool:
+                futures = {}
+                for model_name in TRAINERS:
+                    futures[model_name] = pool.submit(_fit_worker, model_name, directory, kwargs[model_name])
+                    if started is not None:
+                        started(model_name)
+                for model_name, future in futures.items():
+                    try:
+                        finish(model_name, future.result())
+                    except Exception as e:
+                        print(f"Error training {model_name}: {e}")
+                        errors.append(e)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def update_all_models(X_new, y_new, high_water_mark, rows_read, test_size=0.2, random_state=42,
+                      started=None, progress=None):
+    """
+    Update the saved models with rows added since the last training run.
+
+    The preprocessor is kept as fitted by the last full run. New rows are
+    split like a full run: the training part is used to continue boosting
+    XGBoost, grow the Random Forest with extra trees and add to the linear
+    regression's AᵀA / Aᵀy statistics; the test part joins the stored
+    holdout set that metrics are computed on. Use train_all_models() for a
+    full rebuild (e.g. after the feature distribution has shifted).
+
+    As in train_all_models(), the updated models are written to a staging
+    directory and installed (with their metrics and the new training
+    state) only after all three updates have succeeded, so a failed run
+    leaves models and state as they were and can simply be retried.
+
+    rows_read (from load_training_data) is added to the state's covered
+    row count, which training_state_is_current() checks before the next
+    incremental run.
+
+    Returns:
+        Dictionary mapping model name to its result
+
+    Raises:
+        ValueError: If there is no saved training state (run a full rebuild)
+    """
+    state = load_training_state()
+    preprocessor = load_preprocessor()
+    if state is None or preprocessor is None:
+        raise ValueError("No saved training state. Please run a full training first.")
+
+    if len(X_new) >= 5:
+        X_train, X_test, y_train, y_test = train_test_split(
+            X_new, y_new, test_size=test_size, random_state=random_state
+        )
+    else:
+        X_train, X_test, y_train, y_test = X_new, X_new[:0], y_new, y_new[:0]
+
+    holdout_X = np.vstack([state['holdout_X'], X_test])
+    holdout_y = np.concatenate([state['holdout_y'], y_test])
+    Z_train = apply_preprocessor(preprocessor, X_train)
+    Z_holdout = apply_preprocessor(preprocessor, holdout_X)
+
+    xtx, xty = linear_sufficient_stats(Z_train, y_train)
+    xtx = xtx + state['xtx']
+    xty = xty + state['xty']
+
+    model_paths = _model_paths()
+    os.makedirs(os.path.dirname(model_paths['Linear Regression']), exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.staging-', dir=os.path.dirname(model_paths['Linear Regression']))
+    staged_paths = {name: os.path.join(staging, os.path.basename(path)) for name, path in model_paths.items()}
+    updates = {
+        'Linear Regression': lambda: update_linear_regression(
+            xtx, xty, Z_holdout, holdout_y, model_path=staged_paths['Linear Regression']),
+        'Random Forest': lambda: update_random_forest(
+            Z_train, y_train, Z_holdout, holdout_y, model_path=staged_paths['Random Forest']),
+        'XGBoost': lambda: update_xgboost(
+            Z_train, y_train, Z_holdout, holdout_y, random_state=random_state,
+            model_path=staged_paths['XGBoost'])
+    }
+
+    results = {}
+    try:
+        for model_name, update in updates.items():
+            if started is not None:
+                started(model_name)
+            result = update()
+            result.pop('model', None)
+            results[model_name] = result
+            if progress is not None:
+                progress(model_name, result)
+
+        for model_name, path in model_paths.items():
+            install_artifact(staged_paths[model_name], path)
+            results[model_name]['model_path'] = path
+            save_metrics_to_db(model_name, results[model_name]['metrics'])
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    _save_training_state(high_water_mark, state['covered_rows'] + rows_read, xtx, xty, holdout_X, holdout_y,
+                         state['rows'] + len(X_train), random_state)
+    return results
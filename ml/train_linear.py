@@ -3,21 +3,23 @@ import sys
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-import joblib
+import numpy as np
 from sklearn.linear_model import LinearRegression
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 
 from utils.metrics import calculate_all_metrics
 from utils.db_connect import execute_query
+from utils.model_registry import load_artifact, save_artifact
+from utils.instrumentation import timed
+from utils.model_formats import save_linear, load_linear
 
 MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'models')
-MODEL_PATH = os.path.join(MODELS_DIR, 'linear_model.pkl')
+MODEL_PATH = os.path.join(MODELS_DIR, 'linear_model.npz')
+LEGACY_MODEL_PATH = os.path.join(MODELS_DIR, 'linear_model.pkl')
 
 
 def train_linear_regression(X, y, test_size=0.2, random_state=42):
-    os.makedirs(MODELS_DIR, exist_ok=True)
-
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=test_size, random_state=random_state
     )
@@ -26,21 +28,67 @@ def train_linear_regression(X, y, test_size=0.2, random_state=42):
     X_train = scaler.fit_transform(X_train)
     X_test = scaler.transform(X_test)
 
+    result = fit_linear_regression(X_train, y_train, X_test, y_test)
+    save_metrics_to_db('Linear Regression', result['metrics'])
+    return result
+
+
+def fit_linear_regression(X_train, y_train, X_test, y_test, model_path=None):
+    """
+    Fit on an already split and scaled dataset, save the model and return its metrics.
+    model_path overrides MODEL_PATH (e.g. to stage the file before installing it).
+    """
+    model_path = model_path or MODEL_PATH
+    os.makedirs(os.path.dirname(model_path), exist_ok=True)
+
     model = LinearRegression()
     model.fit(X_train, y_train)
 
     y_pred = model.predict(X_test)
     metrics = calculate_all_metrics(y_test, y_pred)
 
-    joblib.dump(model, MODEL_PATH)
-    print(f"Linear Regression model saved to {MODEL_PATH}")
+    save_artifact(model, model_path, dumper=save_linear)
+    print(f"Linear Regression model saved to {model_path}")
+
+    return {
+        'model': model,
+        'metrics': metrics,
+        'model_path': model_path
+    }
+
 
-    save_metrics_to_db('Linear Regression', metrics)
+def linear_sufficient_stats(X, y):
+    """Return (AᵀA, Aᵀy) for A = [1, X], the normal-equation statistics of OLS."""
+    A = np.column_stack([np.ones(len(X)), X])
+    return A.T @ A, A.T @ np.asarray(y, dtype=np.float64)
+
+
+def update_linear_regression(xtx, xty, X_test, y_test, model_path=None):
+    """
+    Solve the regression from accumulated (AᵀA, Aᵀy) statistics, save the
+    model and return its metrics. Adding the statistics of new rows to the
+    stored ones gives the same fit as refitting on all rows.
+    model_path overrides MODEL_PATH (e.g. to stage the file before installing it).
+    """
+    model_path = model_path or MODEL_PATH
+    os.makedirs(os.path.dirname(model_path), exist_ok=True)
+
+    solution = np.linalg.lstsq(xtx, xty, rcond=None)[0]
+    model = LinearRegression()
+    model.intercept_ = float(solution[0])
+    model.coef_ = solution[1:]
+    model.n_features_in_ = len(model.coef_)
+
+    y_pred = model.predict(X_test)
+    metrics = calculate_all_metrics(y_test, y_pred)
+
+    save_artifact(model, model_path, dumper=save_linear)
+    print(f"Linear Regression model saved to {model_path}")
 
     return {
         'model': model,
         'metrics': metrics,
-        'model_path': MODEL_PATH
+        'model_path': model_path
     }
 
 
@@ -59,11 +107,13 @@ def save_metrics_to_db(model_name, metrics):
 
 
 def load_linear_model():
-    if os.path.exists(MODEL_PATH):
-        return joblib.load(MODEL_PATH)
-    return None
+    model = load_artifact(MODEL_PATH, loader=load_linear)
+    if model is None:
+        model = load_artifact(LEGACY_MODEL_PATH)
+    return model
 
 
+@timed('inference')
 def predict_with_linear(X):
     model = load_linear_model()
     if model is None:
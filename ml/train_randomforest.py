@@ -3,21 +3,30 @@ import sys
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-import joblib
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 
 from utils.metrics import calculate_all_metrics
 from utils.db_connect import execute_query
+from utils.model_registry import load_artifact, save_artifact
+from utils.instrumentation import timed
+from utils.model_formats import FlatForest, save_forest, load_forest
+from ml.tree_engine import predict_with_engine
 
 MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'models')
-MODEL_PATH = os.path.join(MODELS_DIR, 'rf_model.pkl')
+MODEL_PATH = os.path.join(MODELS_DIR, 'rf_model.npz')
+LEGACY_MODEL_PATH = os.path.join(MODELS_DIR, 'rf_model.pkl')
+RF_PARAMS = {
+    'n_estimators': 300,
+    'max_depth': 12,
+    'min_samples_split': 5,
+    'min_samples_leaf': 3
+}
+INCREMENTAL_TREES = int(os.environ.get('TRAIN_INCREMENTAL_RF_TREES', '30'))
 
 
 def train_random_forest(X, y, test_size=0.2, random_state=42):
-    os.makedirs(MODELS_DIR, exist_ok=True)
-
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=test_size, random_state=random_state
     )
@@ -26,13 +35,23 @@ def train_random_forest(X, y, test_size=0.2, random_state=42):
     X_train = scaler.fit_transform(X_train)
     X_test = scaler.transform(X_test)
 
+    result = fit_random_forest(X_train, y_train, X_test, y_test, random_state=random_state)
+    save_metrics_to_db('Random Forest', result['metrics'])
+    return result
+
+
+def fit_random_forest(X_train, y_train, X_test, y_test, random_state=42, n_jobs=-1, model_path=None):
+    """
+    Fit on an already split and scaled dataset, save the model and return its metrics.
+    model_path overrides MODEL_PATH (e.g. to stage the file before installing it).
+    """
+    model_path = model_path or MODEL_PATH
+    os.makedirs(os.path.dirname(model_path), exist_ok=True)
+
     model = RandomForestRegressor(
-        n_estimators=300,
-        max_depth=12,
-        min_samples_split=5,
-        min_samples_leaf=3,
+        **RF_PARAMS,
         random_state=random_state,
-        n_jobs=-1
+        n_jobs=n_jobs
     )
 
     model.fit(X_train, y_train)
@@ -40,15 +59,53 @@ def train_random_forest(X, y, test_size=0.2, random_state=42):
     y_pred = model.predict(X_test)
     metrics = calculate_all_metrics(y_test, y_pred)
 
-    joblib.dump(model, MODEL_PATH)
-    print(f"Random Forest model saved to {MODEL_PATH}")
+    save_artifact(FlatForest.from_sklearn(model), model_path, dumper=save_forest)
+    print(f"Random Forest model saved to {model_path}")
+
+    return {
+        'model': model,
+        'metrics': metrics,
+        'model_path': model_path,
+        'feature_importance': model.feature_importances_.tolist()
+    }
 
-    save_metrics_to_db('Random Forest', metrics)
+
+def update_random_forest(X_new, y_new, X_test, y_test, n_new_trees=INCREMENTAL_TREES, n_jobs=-1,
+                         model_path=None):
+    """
+    Grow the saved forest with n_new_trees trees fitted on new rows only,
+    save it and return its metrics. The new trees are appended to the flat
+    forest's arrays (averaged with equal weight like the existing trees);
+    they are seeded with the current tree count, so each update draws
+    different bootstrap samples.
+    model_path overrides MODEL_PATH (e.g. to stage the file before installing it).
+    """
+    model_path = model_path or MODEL_PATH
+    current = load_rf_model()
+    if current is None:
+        raise ValueError("Random Forest model not found. Please train first.")
+    if not isinstance(current, FlatForest):
+        current = FlatForest.from_sklearn(current)
+
+    grown = RandomForestRegressor(
+        **dict(RF_PARAMS, n_estimators=n_new_trees),
+        random_state=current.n_estimators,
+        n_jobs=n_jobs
+    )
+    grown.fit(X_new, y_new)
+    # concat builds new arrays; the registry instance keeps serving meanwhile.
+    model = current.concat(FlatForest.from_sklearn(grown))
+
+    y_pred = model.predict(X_test)
+    metrics = calculate_all_metrics(y_test, y_pred)
+
+    save_artifact(model, model_path, dumper=save_forest)
+    print(f"Random Forest model updated with {n_new_trees} trees ({model.n_estimators} total)")
 
     return {
         'model': model,
         'metrics': metrics,
-        'model_path': MODEL_PATH,
+        'model_path': model_path,
         'feature_importance': model.feature_importances_.tolist()
     }
 
@@ -68,16 +125,19 @@ def save_metrics_to_db(model_name, metrics):
 
 
 def load_rf_model():
-    if os.path.exists(MODEL_PATH):
-        return joblib.load(MODEL_PATH)
-    return None
+    """Return the saved forest (a FlatForest, or the legacy sklearn pickle)."""
+    model = load_artifact(MODEL_PATH, loader=load_forest)
+    if model is None:
+        model = load_artifact(LEGACY_MODEL_PATH)
+    return model
 
 
+@timed('inference')
 def predict_with_rf(X):
     model = load_rf_model()
     if model is None:
         raise ValueError("Random Forest model not found. Please train first.")
-    return model.predict(X)
+    return predict_with_engine(model, X)
 
 
 def get_feature_importance():
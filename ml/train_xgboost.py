@@ -3,21 +3,32 @@ import sys
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-import joblib
 from xgboost import XGBRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 
 from utils.metrics import calculate_all_metrics
 from utils.db_connect import execute_query
+from utils.model_registry import load_artifact, save_artifact
+from utils.instrumentation import timed
+from utils.model_formats import save_xgb, load_xgb
+from ml.tree_engine import predict_with_engine
 
 MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'models')
-MODEL_PATH = os.path.join(MODELS_DIR, 'xgb_model.pkl')
+MODEL_PATH = os.path.join(MODELS_DIR, 'xgb_model.ubj')
+LEGACY_MODEL_PATH = os.path.join(MODELS_DIR, 'xgb_model.pkl')
+XGB_PARAMS = {
+    'n_estimators': 400,
+    'learning_rate': 0.05,
+    'max_depth': 6,
+    'subsample': 0.8,
+    'colsample_bytree': 0.8,
+    'objective': 'reg:squarederror'
+}
+INCREMENTAL_ROUNDS = int(os.environ.get('TRAIN_INCREMENTAL_XGB_ROUNDS', '50'))
 
 
 def train_xgboost(X, y, test_size=0.2, random_state=42):
-    os.makedirs(MODELS_DIR, exist_ok=True)
-
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=test_size, random_state=random_state
     )
@@ -26,14 +37,23 @@ def train_xgboost(X, y, test_size=0.2, random_state=42):
     X_train = scaler.fit_transform(X_train)
     X_test = scaler.transform(X_test)
 
+    result = fit_xgboost(X_train, y_train, X_test, y_test, random_state=random_state)
+    save_metrics_to_db('XGBoost', result['metrics'])
+    return result
+
+
+def fit_xgboost(X_train, y_train, X_test, y_test, random_state=42, n_jobs=None, model_path=None):
+    """
+    Fit on an already split and scaled dataset, save the model and return its metrics.
+    model_path overrides MODEL_PATH (e.g. to stage the file before installing it).
+    """
+    model_path = model_path or MODEL_PATH
+    os.makedirs(os.path.dirname(model_path), exist_ok=True)
+
     model = XGBRegressor(
-        n_estimators=400,
-        learning_rate=0.05,
-        max_depth=6,
-        subsample=0.8,
-        colsample_bytree=0.8,
+        **XGB_PARAMS,
         random_state=random_state,
-        objective='reg:squarederror',
+        n_jobs=n_jobs,
         verbosity=0
     )
 
@@ -42,15 +62,51 @@ def train_xgboost(X, y, test_size=0.2, random_state=42):
     y_pred = model.predict(X_test)
     metrics = calculate_all_metrics(y_test, y_pred)
 
-    joblib.dump(model, MODEL_PATH)
-    print(f"XGBoost model saved to {MODEL_PATH}")
+    save_artifact(model, model_path, dumper=save_xgb)
+    print(f"XGBoost model saved to {model_path}")
+
+    return {
+        'model': model,
+        'metrics': metrics,
+        'model_path': model_path,
+        'feature_importance': model.feature_importances_.tolist()
+    }
+
 
-    save_metrics_to_db('XGBoost', metrics)
+def update_xgboost(X_new, y_new, X_test, y_test, n_rounds=INCREMENTAL_ROUNDS, random_state=42, n_jobs=None,
+                   model_path=None):
+    """
+    Continue boosting the saved model for n_rounds rounds on new rows only,
+    save it and return its metrics.
+
+    The estimator is built from XGB_PARAMS: a model loaded from the native
+    .ubj file only carries its booster, not the sklearn hyperparameters.
+    model_path overrides MODEL_PATH (e.g. to stage the file before installing it).
+    """
+    model_path = model_path or MODEL_PATH
+    current = load_xgb_model()
+    if current is None:
+        raise ValueError("XGBoost model not found. Please train first.")
+
+    # A new estimator keeps the registry instance (and its booster) untouched.
+    model = XGBRegressor(
+        **dict(XGB_PARAMS, n_estimators=n_rounds),
+        random_state=random_state,
+        n_jobs=n_jobs,
+        verbosity=0
+    )
+    model.fit(X_new, y_new, xgb_model=current.get_booster())
+
+    y_pred = model.predict(X_test)
+    metrics = calculate_all_metrics(y_test, y_pred)
+
+    save_artifact(model, model_path, dumper=save_xgb)
+    print(f"XGBoost model updated with {n_rounds} rounds ({model.get_booster().num_boosted_rounds()} total)")
 
     return {
         'model': model,
         'metrics': metrics,
-        'model_path': MODEL_PATH,
+        'model_path': model_path,
         'feature_importance': model.feature_importances_.tolist()
     }
 
@@ -70,16 +126,18 @@ def save_metrics_to_db(model_name, metrics):
 
 
 def load_xgb_model():
-    if os.path.exists(MODEL_PATH):
-        return joblib.load(MODEL_PATH)
-    return None
+    model = load_artifact(MODEL_PATH, loader=load_xgb)
+    if model is None:
+        model = load_artifact(LEGACY_MODEL_PATH)
+    return model
 
 
+@timed('inference')
 def predict_with_xgb(X):
     model = load_xgb_model()
     if model is None:
         raise ValueError("XGBoost model not found. Please train first.")
-    return model.predict(X)
+    return predict_with_engine(model, X)
 
 
 def get_feature_importance():
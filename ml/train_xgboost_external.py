@@ -0,0 +1,218 @@
+import os
+import sys
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import xgboost
+from xgboost import XGBRegressor
+
+from utils.db_connect import iter_array_batches
+from utils.data_cache import CACHE_ENABLED, load_airdata_columns, iter_cached_batches
+from utils.helpers import FEATURE_ORDER
+from utils.preprocess import fit_preprocessor_streaming, load_preprocessor, apply_preprocessor
+from utils.model_registry import save_artifact
+from utils.model_formats import save_xgb
+from ml.train_xgboost import MODELS_DIR, XGB_PARAMS, save_metrics_to_db
+
+# Kept apart from MODEL_PATH: this model is scored on its own id-based
+# holdout and is not part of the training state update_all_models() uses.
+EXTERNAL_MODEL_PATH = os.path.join(MODELS_DIR, 'xgb_external_model.ubj')
+EXTERNAL_BATCH_ROWS = int(os.environ.get('TRAIN_EXTERNAL_BATCH_ROWS', '500000'))
+EXTERNAL_MAX_BIN = int(os.environ.get('TRAIN_EXTERNAL_MAX_BIN', '256'))
+EXTERNAL_CACHE_DIR = os.environ.get('TRAIN_EXTERNAL_CACHE_DIR') or None
+# Rows with id % EXTERNAL_TEST_MODULUS == 0 form the test set (20% by default).
+EXTERNAL_TEST_MODULUS = int(os.environ.get('TRAIN_EXTERNAL_TEST_MODULUS', '5'))
+
+AIRDATA_COLUMNS = ['id'] + [feature.lower() for feature in FEATURE_ORDER] + ['aqi']
+
+
+def iter_airdata_batches(batch_rows=EXTERNAL_BATCH_ROWS, use_cache=CACHE_ENABLED):
+    """
+    Stream complete airdata rows as (n, 10) arrays of id, FEATURE_ORDER, AQI.
+
+    Batches are sliced from the local airdata cache's memory maps when it
+    is enabled, otherwise read from PostgreSQL through a server-side cursor.
+    """
+    if use_cache:
+        columns = load_airdata_columns()
+        return (batch[~np.isnan(batch).any(axis=1)]
+                for batch in iter_cached_batches(columns, batch_rows))
+
+    complete = ' AND '.join(f'{col} IS NOT NULL' for col in AIRDATA_COLUMNS[1:])
+    return iter_array_batches(
+        f"SELECT {', '.join(AIRDATA_COLUMNS)} FROM airdata WHERE {complete}",
+        AIRDATA_COLUMNS,
+        batch_rows=batch_rows
+    )
+
+
+def write_batch_cache(batches, cache_dir, test_modulus=EXTERNAL_TEST_MODULUS):
+    """
+    Split streamed (id, features..., AQI) batches by id into train/test and
+    write each part to cache_dir as float32 .npy files (airdata columns are
+    REAL, so this is lossless).
+
+    Returns:
+        Tuple (train_files, test_files, train_rows)
+    """
+    train_files, test_files = [], []
+    train_rows = 0
+    for i, batch in enumerate(batches):
+        if len(batch) == 0:
+            continue
+        test = (batch[:, 0].astype(np.int64) % test_modulus) == 0
+        for part, files, mask in (('train', train_files, ~test), ('test', test_files, test)):
+            if mask.any():
+                path = os.path.join(cache_dir, f'{part}_{i:06d}.npy')
+                np.save(path, batch[mask, 1:].astype(np.float32))
+                files.append(path)
+        train_rows += int((~test).sum())
+    return train_files, test_files, train_rows
+
+
+def _load_batch(path, preprocessor):
+    data = np.load(path, mmap_mode='r')
+    X = apply_preprocessor(preprocessor, np.asarray(data[:, :-1], dtype=np.float64))
+    return X.astype(np.float32), np.asarray(data[:, -1], dtype=np.float32)
+
+
+class CachedBatchIter(xgboost.DataIter):
+    """
+    xgboost DataIter over the cached training batches.
+
+    Each batch is read from disk and preprocessed when XGBoost asks for it,
+    so only one raw batch is held in memory at a time.
+    """
+
+    def __init__(self, files, preprocessor, cache_prefix):
+        self.files = files
+        self.preprocessor = preprocessor
+        self._index = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data):
+        if self._index >= len(self.files):
+            return False
+        X, y = _load_batch(self.files[self._index], self.preprocessor)
+        input_data(data=X, label=y)
+        self._index += 1
+        return True
+
+    def reset(self):
+        self._index = 0
+
+
+def _streaming_metrics(model, files, preprocessor):
+    """MAE/MSE/RMSE/R² over the cached test batches, one batch at a time."""
+    n = 0
+    abs_error = squared_error = y_sum = y_squared = 0.0
+    for path in files:
+        X, y = _load_batch(path, preprocessor)
+        y = y.astype(np.float64)
+        error = y - model.predict(X)
+        n += len(y)
+        abs_error += np.abs(error).sum()
+        squared_error += np.square(error).sum()
+        y_sum += y.sum()
+        y_squared += np.square(y).sum()
+
+    if n == 0:
+        raise ValueError("No test rows to evaluate the model on")
+    mse = squared_error / n
+    total = y_squared - y_sum * y_sum / n
+    return {
+        'mae': float(abs_error / n),
+        'mse': float(mse),
+        'rmse': float(np.sqrt(mse)),
+        'r2': float(1.0 - squared_error / total) if total > 0 else 0.0
+    }
+
+
+def train_xgboost_external(batches=None, random_state=42, n_jobs=None, model_path=EXTERNAL_MODEL_PATH,
+                           cache_dir=EXTERNAL_CACHE_DIR, save_metrics=False):
+    """
+    Train the XGBoost model without loading the dataset into memory.
+
+    Batches (from PostgreSQL through a server-side cursor by default) are
+    split by id and spilled to a local .npy cache, then fed to XGBoost
+    through a DataIter into an external-memory quantile DMatrix with the
+    hist tree method, so peak memory is bounded by the batch size and the
+    quantized histogram pages rather than the raw table.
+
+    The saved preprocessor is reused so the model matches the other
+    models; it is only fitted (streaming) when none exists.
+
+    By default the model goes to EXTERNAL_MODEL_PATH and no metrics are
+    recorded: its id % EXTERNAL_TEST_MODULUS holdout differs from the
+    split train_all_models() scores on, and incremental updates continue
+    from the model in the training state. Pass model_path=MODEL_PATH and
+    save_metrics=True to serve it deliberately (then run a full training
+    before the next incremental one).
+
+    Args:
+        batches: Iterable of (n, 10) arrays of id, FEATURE_ORDER and AQI
+        model_path: Where to save the model (EXTERNAL_MODEL_PATH by default)
+        cache_dir: Parent directory for the temporary batch cache
+        save_metrics: Record the metrics as 'XGBoost' with save_metrics_to_db
+
+    Returns:
+        Dictionary with metrics, model_path, feature_importance and rows
+    """
+    if batches is None:
+        batches = iter_airdata_batches()
+
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    directory = tempfile.mkdtemp(prefix='aurora-xgb-', dir=cache_dir)
+    try:
+        train_files, test_files, train_rows = write_batch_cache(batches, directory)
+        if not train_files:
+            raise ValueError("No training rows found")
+
+        preprocessor = load_preprocessor()
+        if preprocessor is None:
+            preprocessor = fit_preprocessor_streaming(
+                np.load(path, mmap_mode='r')[:, :-1] for path in train_files
+            )
+
+        model = XGBRegressor(
+            **XGB_PARAMS,
+            tree_method='hist',
+            max_bin=EXTERNAL_MAX_BIN,
+            random_state=random_state,
+            n_jobs=n_jobs,
+            verbosity=0
+        )
+        params = model.get_xgb_params()
+
+        train_iter = CachedBatchIter(train_files, preprocessor, os.path.join(directory, 'xgb'))
+        if hasattr(xgboost, 'ExtMemQuantileDMatrix'):
+            dtrain = xgboost.ExtMemQuantileDMatrix(train_iter, max_bin=EXTERNAL_MAX_BIN, nthread=n_jobs)
+        else:
+            dtrain = xgboost.DMatrix(train_iter, nthread=n_jobs)
+        booster = xgboost.train(params, dtrain, num_boost_round=model.n_estimators)
+        del dtrain
+
+        model.load_model(booster.save_raw(raw_format='ubj'))
+        metrics = _streaming_metrics(model, test_files, preprocessor)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    save_artifact(model, model_path, dumper=save_xgb)
+    print(f"XGBoost model (external memory, {train_rows} rows) saved to {model_path}")
+    if save_metrics:
+        save_metrics_to_db('XGBoost', metrics)
+
+    return {
+        'metrics': metrics,
+        'model_path': model_path,
+        'feature_importance': model.feature_importances_.tolist(),
+        'rows': train_rows
+    }
+
+
+if __name__ == "__main__":
+    result = train_xgboost_external()
+    print(f"XGBoost trained on {result['rows']} rows. R²: {result['metrics']['r2']:.4f}")
@@ -0,0 +1,296 @@
+import os
+import sys
+import time
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from psycopg2 import errors
+from psycopg2.extras import Json
+
+from utils.db_connect import execute_query
+from utils.dashboard_stats import invalidate_dashboard_stats
+from ml.train_all import (
+    TRAINERS, load_training_data, load_training_state, training_state_is_current,
+    train_all_models, update_all_models
+)
+from ml.insights import update_snapshot_importances
+
+JOB_INLINE_WORKER = os.environ.get('TRAINING_JOB_INLINE_WORKER', '1') == '1'
+JOB_POLL_INTERVAL = float(os.environ.get('TRAINING_JOB_POLL_INTERVAL', '5'))
+JOB_HEARTBEAT_INTERVAL = float(os.environ.get('TRAINING_JOB_HEARTBEAT_INTERVAL', '15'))
+JOB_STALE_AFTER = float(os.environ.get('TRAINING_JOB_STALE_AFTER', '120'))
+
+JOB_MODES = ('full', 'incremental')
+
+JOB_COLUMNS = """id, status, requestedby, progress, error, createdat, startedat, finishedat,
+    EXTRACT(EPOCH FROM (COALESCE(finishedat, NOW() AT TIME ZONE 'Asia/Kolkata') - startedat))
+        AS elapsed_seconds"""
+
+
+def _initial_progress(mode):
+    return {'stage': 'queued', 'mode': mode,
+            'models': {name: {'status': 'pending'} for name in TRAINERS}}
+
+
+def _format_job(row):
+    if not row:
+        return None
+    return {
+        'id': row['id'],
+        'status': row['status'],
+        'requested_by': row['requestedby'],
+        'mode': row['progress'].get('mode', 'full'),
+        'stage': row['progress'].get('stage'),
+        'models': row['progress'].get('models', {}),
+        'error': row['error'],
+        'created_at': row['createdat'].isoformat() if row['createdat'] else None,
+        'started_at': row['startedat'].isoformat() if row['startedat'] else None,
+        'finished_at': row['finishedat'].isoformat() if row['finishedat'] else None,
+        'elapsed_seconds': float(row['elapsed_seconds']) if row['elapsed_seconds'] is not None else None
+    }
+
+
+def get_training_job(job_id=None):
+    """
+    Return a training job's status, or the most recent job if job_id is None.
+
+    Returns:
+        Dictionary with status, stage, per-model progress and metrics,
+        elapsed_seconds and error, or None if there is no such job
+    """
+    if job_id is None:
+        row = execute_query(
+            f"SELECT {JOB_COLUMNS} FROM trainingjobs ORDER BY id DESC LIMIT 1", fetchone=True
+        )
+    else:
+        row = execute_query(
+            f"SELECT {JOB_COLUMNS} FROM trainingjobs WHERE id = %s", (job_id,), fetchone=True
+        )
+    job = _format_job(row)
+    if job and job['status'] == 'queued' and JOB_INLINE_WORKER:
+        ensure_worker()
+    return job
+
+
+def fail_stale_jobs():
+    """Fail running jobs whose worker stopped sending heartbeats (e.g. a killed process)."""
+    execute_query(
+        """UPDATE trainingjobs
+           SET status = 'failed', error = 'Training worker stopped responding',
+               finishedat = NOW() AT TIME ZONE 'Asia/Kolkata'
+           WHERE status = 'running'
+             AND updatedat < NOW() AT TIME ZONE 'Asia/Kolkata' - make_interval(secs => %s)""",
+        (JOB_STALE_AFTER,)
+    )
+
+
+def enqueue_training_job(user_id=None, mode='full'):
+    """
+    Queue a retrain of all models.
+
+    mode is 'full' (rebuild from the whole airdata table) or 'incremental'
+    (update the models with rows added since the last run).
+
+    Only one job may be queued or running at a time (enforced by a partial
+    unique index), so a second request returns the active job instead.
+
+    Returns:
+        Tuple (job, created)
+    """
+    if mode not in JOB_MODES:
+        raise ValueError(f"Unknown training mode: {mode}")
+
+    fail_stale_jobs()
+    try:
+        row = execute_query(
+            """INSERT INTO trainingjobs (status, requestedby, progress)
+               VALUES ('queued', %s, %s) RETURNING id""",
+            (user_id, Json(_initial_progress(mode))),
+            fetchone=True
+        )
+        created = True
+        job_id = row['id']
+    except errors.UniqueViolation:
+        created = False
+        active = execute_query(
+            "SELECT id FROM trainingjobs WHERE status IN ('queued', 'running')", fetchone=True
+        )
+        job_id = active['id'] if active else None
+
+    if JOB_INLINE_WORKER:
+        ensure_worker()
+    return get_training_job(job_id) if job_id else None, created
+
+
+def claim_training_job():
+    """Mark the oldest queued job as running and return (id, mode), or None."""
+    row = execute_query(
+        """UPDATE trainingjobs
+           SET status = 'running',
+               startedat = NOW() AT TIME ZONE 'Asia/Kolkata',
+               updatedat = NOW() AT TIME ZONE 'Asia/Kolkata'
+           WHERE id = (SELECT id FROM trainingjobs WHERE status = 'queued'
+                       ORDER BY id LIMIT 1 FOR UPDATE SKIP LOCKED)
+           RETURNING id, progress->>'mode' AS mode""",
+        fetchone=True
+    )
+    return (row['id'], row['mode'] or 'full') if row else None
+
+
+def _set_stage(job_id, stage):
+    execute_query(
+        """UPDATE trainingjobs
+           SET progress = jsonb_set(progress, '{stage}', to_jsonb(%s::text)),
+               updatedat = NOW() AT TIME ZONE 'Asia/Kolkata'
+           WHERE id = %s""",
+        (stage, job_id)
+    )
+
+
+def _set_model_progress(job_id, model_name, entry):
+    execute_query(
+        """UPDATE trainingjobs
+           SET progress = jsonb_set(progress, ARRAY['models', %s], %s),
+               updatedat = NOW() AT TIME ZONE 'Asia/Kolkata'
+           WHERE id = %s""",
+        (model_name, Json(entry), job_id)
+    )
+
+
+def _finish_job(job_id, status, error=None):
+    execute_query(
+        """UPDATE trainingjobs
+           SET status = %s, error = %s,
+               progress = jsonb_set(progress, '{stage}', to_jsonb(%s::text)),
+               finishedat = NOW() AT TIME ZONE 'Asia/Kolkata',
+               updatedat = NOW() AT TIME ZONE 'Asia/Kolkata'
+           WHERE id = %s""",
+        (status, error, status, job_id)
+    )
+
+
+def _heartbeat(job_id, stop):
+    while not stop.wait(JOB_HEARTBEAT_INTERVAL):
+        try:
+            execute_query(
+                """UPDATE trainingjobs SET updatedat = NOW() AT TIME ZONE 'Asia/Kolkata'
+                   WHERE id = %s AND status = 'running'""",
+                (job_id,)
+            )
+        except Exception as e:
+            print(f"Error updating training job heartbeat: {e}")
+
+
+def run_training_job(job_id, mode='full'):
+    """Run a claimed job: load airdata, train or update all models and record progress."""
+    stop = threading.Event()
+    heartbeat = threading.Thread(
+        target=_heartbeat, args=(job_id, stop), name=f'training-heartbeat-{job_id}', daemon=True
+    )
+    heartbeat.start()
+
+    model_started = {}
+    finished = set()
+
+    def started(model_name):
+        model_started[model_name] = time.monotonic()
+        _set_model_progress(job_id, model_name, {'status': 'running'})
+
+    def progress(model_name, result):
+        finished.add(model_name)
+        _set_model_progress(job_id, model_name, {
+            'status': 'done',
+            'seconds': round(time.monotonic() - model_started.get(model_name, time.monotonic()), 2),
+            'metrics': {key: float(value) for key, value in result['metrics'].items()}
+        })
+
+    try:
+        state = load_training_state() if mode == 'incremental' else None
+        if mode == 'incremental' and state is None:
+            print(f"Training job {job_id}: no saved training state, running a full rebuild")
+            mode = 'full'
+        elif mode == 'incremental' and not training_state_is_current(state):
+            print(f"Training job {job_id}: airdata changed below the high-water mark, running a full rebuild")
+            mode = 'full'
+
+        _set_stage(job_id, 'loading data')
+        if mode == 'incremental':
+            X, y, high_water_mark, rows_read = load_training_data(after_id=state['high_water_mark'])
+        else:
+            X, y, high_water_mark, rows_read = load_training_data()
+
+        if mode == 'incremental' and len(X) == 0:
+            for model_name in TRAINERS:
+                finished.add(model_name)
+                _set_model_progress(job_id, model_name, {'status': 'skipped'})
+        elif mode == 'incremental':
+            _set_stage(job_id, f'updating with {len(X)} new rows')
+            update_all_models(X, y, high_water_mark, rows_read, started=started, progress=progress)
+        else:
+            _set_stage(job_id, 'training')
+            train_all_models(X, y, started=started, progress=progress,
+                             high_water_mark=high_water_mark, rows_read=rows_read)
+
+        _set_stage(job_id, 'refreshing insights')
+        invalidate_dashboard_stats()
+        update_snapshot_importances()
+
+        _finish_job(job_id, 'succeeded')
+        print(f"Training job {job_id} succeeded")
+    except Exception as e:
+        print(f"Training job {job_id} failed: {e}")
+        for model_name in TRAINERS:
+            if model_name not in finished:
+                _set_model_progress(job_id, model_name, {'status': 'failed'})
+        _finish_job(job_id, 'failed', str(e))
+    finally:
+        stop.set()
+
+
+def run_pending_jobs():
+    """Run queued jobs one after another until the queue is empty."""
+    while True:
+        claimed = claim_training_job()
+        if claimed is None:
+            return
+        run_training_job(*claimed)
+
+
+_worker = {'thread': None, 'pid': None}
+_worker_lock = threading.Lock()
+
+
+def ensure_worker():
+    """Start a background thread in this process to drain the queue, if none is running."""
+    with _worker_lock:
+        thread = _worker['thread']
+        if thread is not None and _worker['pid'] == os.getpid() and thread.is_alive():
+            return
+        thread = threading.Thread(target=_drain_queue, name='training-jobs', daemon=True)
+        _worker['thread'] = thread
+        _worker['pid'] = os.getpid()
+        thread.start()
+
+
+def _drain_queue():
+    try:
+        run_pending_jobs()
+    except Exception as e:
+        print(f"Training worker error: {e}")
+
+
+def run_worker():
+    """Standalone worker loop (run with TRAINING_JOB_INLINE_WORKER=0 on the web app)."""
+    print("Training job worker started")
+    while True:
+        try:
+            fail_stale_jobs()
+            run_pending_jobs()
+        except Exception as e:
+            print(f"Training worker error: {e}")
+        time.sleep(JOB_POLL_INTERVAL)
+
+
+if __name__ == "__main__":
+    run_worker()
@@ -0,0 +1,223 @@
+import os
+import sys
+import json
+import weakref
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from utils.model_formats import FlatForest
+
+TREE_ENGINE = os.environ.get('TREE_ENGINE', '1') == '1'
+ENGINE_CHUNK_ROWS = int(os.environ.get('TREE_ENGINE_CHUNK_ROWS', '2048'))
+
+# Objectives whose prediction is the raw margin (base_score + sum of leaves).
+XGB_IDENTITY_OBJECTIVES = ('reg:squarederror', 'reg:linear', 'reg:pseudohubererror', 'reg:absoluteerror')
+
+
+def _round_down_float32(threshold):
+    """Largest float32 <= threshold, so float32 x <= t64 iff x <= result."""
+    t32 = threshold.astype(np.float32)
+    over = t32.astype(np.float64) > threshold
+    t32[over] = np.nextafter(t32[over], np.float32(-np.inf))
+    return t32
+
+
+class PackedEnsemble:
+    """
+    Tree ensemble packed into flat float32/int32 node arrays.
+
+    Every node holds (feature, threshold, left, right, value); a row goes
+    left when x[feature] <= threshold, or when x[feature] is NaN and
+    default_left is set. Leaves point to themselves with an infinite
+    threshold, so traversal is a fixed max_depth steps of gathers with no
+    leaf checks. Thresholds are stored so the float32 comparison gives the
+    same branch as the source model (sklearn's x <= t64, XGBoost's x < t).
+
+    The prediction is base + value summed over trees, or averaged when
+    average is set (random forests).
+    """
+
+    def __init__(self, feature, threshold, left, right, value, default_left, roots,
+                 max_depth, base=0.0, average=False):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.default_left = default_left
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.base = float(base)
+        self.average = average
+
+    @classmethod
+    def _pack(cls, feature, threshold, left, right, value, default_left, roots, max_depth,
+              base=0.0, average=False):
+        """Build from global-index node arrays where leaves have left == -1."""
+        leaf = left < 0
+        index = np.arange(len(left), dtype=np.int32)
+        return cls(
+            np.where(leaf, 0, feature).astype(np.int32),
+            np.where(leaf, np.float32(np.inf), threshold).astype(np.float32),
+            np.where(leaf, index, left).astype(np.int32),
+            np.where(leaf, index, right).astype(np.int32),
+            np.asarray(value, dtype=np.float64),
+            np.asarray(default_left, dtype=bool),
+            np.asarray(roots, dtype=np.int32),
+            max_depth, base, average
+        )
+
+    @classmethod
+    def from_forest(cls, model):
+        """Pack a FlatForest or a fitted RandomForestRegressor."""
+        if not isinstance(model, FlatForest):
+            model = FlatForest.from_sklearn(model)
+        threshold = _round_down_float32(np.asarray(model.threshold, dtype=np.float64))
+        # NaN <= t is False in sklearn's traversal too, so missing goes right.
+        return cls._pack(np.asarray(model.feature), threshold, np.asarray(model.left),
+                         np.asarray(model.right), np.asarray(model.value),
+                         np.zeros(len(model.left), dtype=bool), np.asarray(model.roots),
+                         model.max_depth, average=True)
+
+    @classmethod
+    def from_xgboost(cls, model):
+        """
+        Pack an XGBRegressor from its JSON model dump.
+
+        Returns None for models the engine does not reproduce exactly
+        (non-identity objectives, dart/linear boosters, several trees per
+        round), which keep using model.predict.
+        """
+        booster = model.get_booster()
+        learner = json.loads(bytes(booster.save_raw(raw_format='json')))['learner']
+        objective = learner['objective']['name']
+        gbm = learner['gradient_booster']
+        if objective not in XGB_IDENTITY_OBJECTIVES or gbm.get('name') != 'gbtree':
+            return None
+        if int(gbm['model']['gbtree_model_param'].get('num_parallel_tree', '1')) != 1:
+            return None
+        best_iteration = getattr(model, 'best_iteration', None)
+        trees = gbm['model']['trees']
+        if best_iteration is not None:
+            trees = trees[:best_iteration + 1]
+
+        feature, threshold, left, right, value, default_left, roots = [], [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for tree in trees:
+            tree_left = np.asarray(tree['left_children'], dtype=np.int64)
+            tree_right = np.asarray(tree['right_children'], dtype=np.int64)
+            conditions = np.asarray(tree['split_conditions'], dtype=np.float32)
+            leaf = tree_left < 0
+
+            depth = np.zeros(len(tree_left), dtype=np.int64)
+            for node in range(len(tree_left)):
+                if not leaf[node]:
+                    depth[tree_left[node]] = depth[tree_right[node]] = depth[node] + 1
+            max_depth = max(max_depth, int(depth.max()) if len(depth) else 0)
+
+            feature.append(np.asarray(tree['split_indices'], dtype=np.int64))
+            # XGBoost goes left on x < t; for float32 x that is x <= nextafter(t, -inf).
+            threshold.append(np.nextafter(conditions, np.float32(-np.inf)))
+            left.append(np.where(leaf, -1, tree_left + offset))
+            right.append(np.where(leaf, -1, tree_right + offset))
+            value.append(np.where(leaf, conditions, 0.0))
+            default_left.append(np.asarray(tree['default_left'], dtype=bool))
+            roots.append(offset)
+            offset += len(tree_left)
+
+        base_score = learner['learner_model_param']['base_score'].strip('[]').split(',')[0]
+        return cls._pack(np.concatenate(feature), np.concatenate(threshold), np.concatenate(left),
+                         np.concatenate(right), np.concatenate(value), np.concatenate(default_left),
+                         roots, max_depth, base=float(base_score))
+
+    def _combine(self, leaves):
+        values = self.value[leaves]
+        total = values.mean(axis=-1) if self.average else values.sum(axis=-1)
+        return total + self.base
+
+    def predict_one(self, x):
+        """Fast path for one row: walk all trees at once with 1-D gathers."""
+        x = np.asarray(x, dtype=np.float32).reshape(-1)
+        node = self.roots
+        if np.isnan(x).any():
+            for _ in range(self.max_depth):
+                v = x[self.feature[node]]
+                go_left = (v <= self.threshold[node]) | (np.isnan(v) & self.default_left[node])
+                node = np.where(go_left, self.left[node], self.right[node])
+        else:
+            for _ in range(self.max_depth):
+                go_left = x[self.feature[node]] <= self.threshold[node]
+                node = np.where(go_left, self.left[node], self.right[node])
+        return float(self._combine(node))
+
+    def predict(self, X):
+        """Predict an (N, n_features) batch; a single row takes predict_one."""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if len(X) == 1:
+            return np.array([self.predict_one(X[0])])
+
+        out = np.empty(len(X), dtype=np.float64)
+        missing = bool(np.isnan(X).any())
+        for start in range(0, len(X), ENGINE_CHUNK_ROWS):
+            chunk = X[start:start + ENGINE_CHUNK_ROWS]
+            rows = np.arange(len(chunk))[:, None]
+            node = np.broadcast_to(self.roots, (len(chunk), len(self.roots)))
+            for _ in range(self.max_depth):
+                v = chunk[rows, self.feature[node]]
+                go_left = v <= self.threshold[node]
+                if missing:
+                    go_left |= np.isnan(v) & self.default_left[node]
+                node = np.where(go_left, self.left[node], self.right[node])
+            out[start:start + len(chunk)] = self._combine(node)
+        return out
+
+
+def compile_model(model):
+    """
+    Pack a tree model for the engine.
+
+    Returns:
+        PackedEnsemble, or None if the model is not a supported tree
+        ensemble (the caller then uses model.predict)
+    """
+    if isinstance(model, FlatForest) or hasattr(model, 'estimators_'):
+        return PackedEnsemble.from_forest(model)
+    if hasattr(model, 'get_booster'):
+        return PackedEnsemble.from_xgboost(model)
+    return None
+
+
+_compiled = weakref.WeakKeyDictionary()
+_compiled_lock = threading.Lock()
+
+
+def get_engine(model):
+    """
+    Return the PackedEnsemble for a loaded model, compiling it on first use.
+
+    Engines are cached per model object, so a model reloaded by the
+    registry (new file version) is compiled again and the old engine is
+    dropped with the old model.
+    """
+    try:
+        return _compiled[model]
+    except KeyError:
+        pass
+    engine = compile_model(model)
+    with _compiled_lock:
+        _compiled[model] = engine
+    return engine
+
+
+def predict_with_engine(model, X):
+    """Predict with the compiled engine when enabled and supported, else model.predict."""
+    engine = get_engine(model) if TREE_ENGINE else None
+    if engine is None:
+        return model.predict(X)
+    return engine.predict(X)
@@ -0,0 +1,50 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('xgboost')
+
+import ml.train_xgboost as train_xgboost
+from utils.model_registry import load_artifact, clear_registry
+from utils.model_formats import load_xgb
+
+
+@pytest.fixture
+def models_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(train_xgboost, 'MODELS_DIR', str(tmp_path))
+    monkeypatch.setattr(train_xgboost, 'MODEL_PATH', str(tmp_path / 'xgb_model.ubj'))
+    monkeypatch.setattr(train_xgboost, 'LEGACY_MODEL_PATH', str(tmp_path / 'xgb_model.pkl'))
+    monkeypatch.setitem(train_xgboost.XGB_PARAMS, 'n_estimators', 5)
+    return tmp_path
+
+
+def _data(rows, seed):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(rows, 8))
+    return X, X @ rng.random(8) + rng.normal(scale=0.1, size=rows)
+
+
+def test_update_keeps_xgb_params_after_native_round_trip(models_dir):
+    X, y = _data(200, 0)
+    X_new, y_new = _data(100, 1)
+    train_xgboost.fit_xgboost(X, y, X, y, random_state=7)
+
+    # Drop the fitted estimator save_artifact left resident, so the update
+    # starts from the model loaded from the native .ubj file.
+    clear_registry()
+    loaded = load_artifact(train_xgboost.MODEL_PATH, loader=load_xgb)
+    assert loaded is not None
+    assert loaded.get_params()['learning_rate'] is None
+    assert loaded.get_params()['max_depth'] is None
+
+    result = train_xgboost.update_xgboost(X_new, y_new, X, y, n_rounds=3, random_state=7)
+    params = result['model'].get_params()
+    for name in ('learning_rate', 'max_depth', 'subsample', 'colsample_bytree', 'objective'):
+        assert params[name] == train_xgboost.XGB_PARAMS[name]
+    assert params['random_state'] == 7
+    assert params['n_estimators'] == 3
+    assert result['model'].get_booster().num_boosted_rounds() == 8
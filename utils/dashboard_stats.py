@@ -0,0 +1,104 @@
+import os
+import time
+import threading
+
+from psycopg2 import errors
+
+from utils.db_connect import execute_query
+
+STATS_TTL = float(os.environ.get('DASHBOARD_STATS_TTL', '5'))
+
+STATS_KEYS = ('total_predictions', 'models_trained', 'data_records', 'total_users')
+
+_cache = {'stats': None, 'expires': 0.0, 'generation': 0}
+_cache_lock = threading.Lock()
+
+
+def _empty_stats():
+    return {key: 0 for key in STATS_KEYS}
+
+
+def _count_dashboard_stats():
+    """Compute the stats with full COUNT queries (used when appstats is missing)."""
+    predictions_count = execute_query(
+        "SELECT COUNT(*) as count FROM predictions",
+        fetchone=True
+    )
+    models_count = execute_query(
+        "SELECT COUNT(DISTINCT modelname) as count FROM modelperformance",
+        fetchone=True
+    )
+    data_count = execute_query(
+        "SELECT COUNT(*) as count FROM airdata",
+        fetchone=True
+    )
+    users_count = execute_query(
+        "SELECT COUNT(*) as count FROM users",
+        fetchone=True
+    )
+
+    return {
+        'total_predictions': predictions_count['count'] if predictions_count else 0,
+        'models_trained': models_count['count'] if models_count else 0,
+        'data_records': data_count['count'] if data_count else 0,
+        'total_users': users_count['count'] if users_count else 0
+    }
+
+
+def load_dashboard_stats():
+    """
+    Read the dashboard counters from the trigger-maintained appstats table.
+    Falls back to COUNT queries if the counters have not been created.
+    """
+    try:
+        rows = execute_query("SELECT name, value FROM appstats", fetch=True)
+    except errors.UndefinedTable:
+        return _count_dashboard_stats()
+
+    stats = _empty_stats()
+    found = 0
+    for row in rows or []:
+        if row['name'] in stats:
+            stats[row['name']] = int(row['value'])
+            found += 1
+
+    if found < len(STATS_KEYS):
+        return _count_dashboard_stats()
+    return stats
+
+
+def get_dashboard_stats():
+    """
+    Return dashboard stats, served from an in-process cache for up to
+    DASHBOARD_STATS_TTL seconds.
+
+    Returns:
+        Dictionary with total_predictions, models_trained, data_records
+        and total_users
+    """
+    now = time.monotonic()
+    stats = _cache['stats']
+    if stats is not None and now < _cache['expires']:
+        return dict(stats)
+
+    generation = _cache['generation']
+    try:
+        stats = load_dashboard_stats()
+    except Exception as e:
+        print(f"Error getting stats: {e}")
+        return _empty_stats()
+
+    with _cache_lock:
+        # Don't cache a result that raced with an invalidation.
+        if _cache['generation'] == generation:
+            _cache['stats'] = stats
+            _cache['expires'] = time.monotonic() + STATS_TTL
+    return dict(stats)
+
+
+def invalidate_dashboard_stats():
+    """Drop the cached stats so the next request reads fresh counters."""
+    with _cache_lock:
+        _cache['generation'] += 1
+        _cache['stats'] = None
+        _cache['expires'] = 0.0
@@ -0,0 +1,234 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+from utils.db_connect import execute_query, iter_array_batches
+from utils.dashboard_stats import load_dashboard_stats
+from utils.helpers import FEATURE_ORDER
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+CACHE_ENABLED = os.environ.get('TRAINING_CACHE', '1') == '1'
+CACHE_DIR = os.environ.get('TRAINING_CACHE_DIR') or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'airdata'
+)
+CACHE_FETCH_ROWS = int(os.environ.get('TRAINING_CACHE_FETCH_ROWS', '200000'))
+
+CACHE_COLUMNS = ['id'] + [feature.lower() for feature in FEATURE_ORDER] + ['aqi']
+CACHE_DTYPE = np.dtype('<f8')
+MANIFEST_NAME = 'manifest.json'
+
+_sync_lock = threading.Lock()
+
+
+def _column_path(directory, column, generation):
+    return os.path.join(directory, f'{column}.{generation}.f8')
+
+
+def _read_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('columns') != CACHE_COLUMNS or 'generation' not in manifest:
+        return None
+    for column in CACHE_COLUMNS:
+        path = _column_path(directory, column, manifest['generation'])
+        if not os.path.exists(path) or os.path.getsize(path) < manifest['rows'] * CACHE_DTYPE.itemsize:
+            return None
+    return manifest
+
+
+def _write_manifest(directory, rows, max_id, generation):
+    path = os.path.join(directory, MANIFEST_NAME)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'columns': CACHE_COLUMNS, 'rows': rows, 'max_id': max_id, 'generation': generation}, f)
+    os.replace(tmp_path, path)
+
+
+def _remove_other_generations(directory, generation):
+    """Unlink column files of other generations; open memory maps keep their data."""
+    keep = {os.path.basename(_column_path(directory, column, generation)) for column in CACHE_COLUMNS}
+    for name in os.listdir(directory):
+        if name.endswith('.f8') and name not in keep:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+
+@contextmanager
+def _locked(directory):
+    """Serialize cache updates across threads and (on POSIX) processes."""
+    with _sync_lock:
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, '.lock'), 'w') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def get_airdata_version():
+    """
+    Return (rows, max_id) for airdata.
+
+    The row count comes from the trigger-maintained appstats counter and
+    MAX(id) is a primary-key index lookup, so neither scans the table.
+    """
+    rows = load_dashboard_stats()['data_records']
+    row = execute_query("SELECT MAX(id) AS max_id FROM airdata", fetchone=True)
+    max_id = row['max_id'] if row else None
+    return int(rows), (int(max_id) if max_id is not None else 0)
+
+
+def _append_rows(directory, manifest_rows, after_id, generation):
+    """
+    Append airdata rows with id > after_id to the column files of a generation.
+
+    Anything past manifest_rows (left by an interrupted append) is
+    truncated first; only the manifest's rows are ever mapped by readers,
+    so this never touches mapped data. Rows are fetched in id order
+    through a server-side cursor, so memory is bounded by one batch.
+
+    Returns:
+        Tuple (rows appended, largest id appended or None)
+    """
+    files = {}
+    appended = 0
+    max_id = None
+    try:
+        for column in CACHE_COLUMNS:
+            path = _column_path(directory, column, generation)
+            f = open(path, 'r+b' if os.path.exists(path) else 'w+b')
+            files[column] = f
+            f.truncate(manifest_rows * CACHE_DTYPE.itemsize)
+            f.seek(0, os.SEEK_END)
+
+        query = f"SELECT {', '.join(CACHE_COLUMNS)} FROM airdata"
+        params = None
+        if after_id is not None:
+            query += " WHERE id > %s"
+            params = (after_id,)
+        query += " ORDER BY id"
+
+        for batch in iter_array_batches(query, CACHE_COLUMNS, params=params, batch_rows=CACHE_FETCH_ROWS):
+            if len(batch) == 0:
+                continue
+            ids = batch[:, 0]
+            if (np.diff(ids) <= 0).any() or (max_id is not None and ids[0] <= max_id):
+                raise ValueError("airdata rows arrived out of id order")
+            for i, column in enumerate(CACHE_COLUMNS):
+                files[column].write(np.ascontiguousarray(batch[:, i], dtype=CACHE_DTYPE).tobytes())
+            appended += len(batch)
+            max_id = int(batch[-1, 0])
+
+        for f in files.values():
+            f.flush()
+            os.fsync(f.fileno())
+    finally:
+        for f in files.values():
+            f.close()
+    return appended, max_id
+
+
+def sync_airdata_cache(directory=CACHE_DIR):
+    """
+    Bring the local airdata cache up to date and return its manifest.
+
+    The cache is keyed on airdata's (row count, MAX(id)). When only new
+    ids have been added (every cached row is still there) just the delta
+    is fetched and appended in place; if rows were deleted or the table
+    was reloaded the cache is rebuilt from scratch as a new generation of
+    column files. The manifest switches to it atomically and the old files
+    are unlinked, so memory maps held by other workers keep their inodes
+    and never see a truncated file.
+
+    Returns:
+        Dictionary with columns, rows and max_id
+    """
+    with _locked(directory):
+        rows, max_id = get_airdata_version()
+        manifest = _read_manifest(directory)
+        if manifest is not None and manifest['rows'] == rows and manifest['max_id'] == max_id:
+            return manifest
+
+        after_id, cached_rows = None, 0
+        if manifest is not None and manifest['rows'] and max_id > manifest['max_id']:
+            delta = execute_query(
+                "SELECT COUNT(*) AS count FROM airdata WHERE id > %s",
+                (manifest['max_id'],), fetchone=True
+            )
+            if rows - delta['count'] == manifest['rows']:
+                after_id, cached_rows = manifest['max_id'], manifest['rows']
+
+        if after_id is None:
+            generation = time.time_ns()
+            try:
+                appended, appended_max = _append_rows(directory, 0, None, generation)
+            except Exception:
+                _remove_other_generations(directory, manifest['generation'] if manifest else None)
+                raise
+        else:
+            generation = manifest['generation']
+            appended, appended_max = _append_rows(directory, cached_rows, after_id, generation)
+        total = cached_rows + appended
+        new_max = appended_max if appended_max is not None else (after_id or 0)
+        _write_manifest(directory, total, new_max, generation)
+        if after_id is None:
+            _remove_other_generations(directory, generation)
+            print(f"Airdata cache rebuilt with {total} rows")
+        else:
+            print(f"Airdata cache appended {appended} rows ({total} total)")
+        return {'columns': CACHE_COLUMNS, 'rows': total, 'max_id': new_max, 'generation': generation}
+
+
+def load_airdata_columns(directory=CACHE_DIR, sync=True):
+    """
+    Return the cached airdata as read-only memory maps, one per column.
+
+    Column files are raw little-endian float8 (NULLs as NaN) ordered by
+    id, so the maps are zero-copy and slicing by id is a searchsorted.
+
+    Args:
+        directory: Cache directory (CACHE_DIR by default)
+        sync: Update the cache from PostgreSQL first
+
+    Returns:
+        Dictionary mapping each of CACHE_COLUMNS to a 1-D np.memmap
+    """
+    if sync:
+        manifest = sync_airdata_cache(directory)
+    else:
+        manifest = _read_manifest(directory)
+        if manifest is None:
+            raise ValueError(f"No airdata cache in {directory}")
+
+    rows = manifest['rows']
+    if rows == 0:
+        return {column: np.empty(0, dtype=CACHE_DTYPE) for column in CACHE_COLUMNS}
+    return {column: np.memmap(_column_path(directory, column, manifest['generation']), dtype=CACHE_DTYPE, mode='r', shape=(rows,))
+            for column in CACHE_COLUMNS}
+
+
+def iter_cached_batches(columns, batch_rows, after_id=None):
+    """Yield (n, len(columns)) arrays from load_airdata_columns() output, batch_rows at a time."""
+    start = 0
+    if after_id is not None:
+        start = int(np.searchsorted(columns['id'], after_id, side='right'))
+    total = len(columns['id'])
+    for begin in range(start, total, batch_rows):
+        end = min(begin + batch_rows, total)
+        yield np.column_stack([columns[column][begin:end] for column in CACHE_COLUMNS])
@@ -1,7 +1,28 @@
 import os
+import time
+import itertools
+import threading
+from contextlib import contextmanager
+
+import numpy as np
 import psycopg2
+import psycopg2.pool
+from psycopg2 import extensions
 from psycopg2.extras import RealDictCursor
 
+from utils.instrumentation import METRICS_ENABLED, observe_phase
+from utils.query_profile import PROFILE_ENABLED, record_query, should_explain, explain_options, attach_explain
+
+POOL_MIN_SIZE = int(os.environ.get('DB_POOL_MIN_SIZE', '1'))
+POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '10'))
+POOL_IDLE_TIMEOUT = float(os.environ.get('DB_POOL_IDLE_TIMEOUT', '300'))
+POOL_CHECKOUT_TIMEOUT = float(os.environ.get('DB_POOL_CHECKOUT_TIMEOUT', '30'))
+POOL_HEALTH_CHECK = os.environ.get('DB_POOL_HEALTH_CHECK', '1').lower() not in ('0', 'false', 'no')
+POOL_HEALTH_CHECK_AFTER = float(os.environ.get('DB_POOL_HEALTH_CHECK_AFTER', '5'))
+FETCH_BATCH_ROWS = int(os.environ.get('DB_FETCH_BATCH_ROWS', '50000'))
+
+COPY_BINARY_SIGNATURE = b'PGCOPY\n\xff\r\n\x00'
+
 
 def get_db_connection():
     """
@@ -10,10 +31,10 @@ def get_db_connection():
     Returns connection with RealDictCursor for dictionary-like row access.
     """
     database_url = os.environ.get('DATABASE_URL')
-    
+
     if not database_url:
         raise ValueError("DATABASE_URL environment variable is not set")
-    
+
     try:
         conn = psycopg2.connect(database_url, cursor_factory=RealDictCursor)
         conn.autocommit = False
@@ -23,41 +44,430 @@ def get_db_connection():
         raise
 
 
+class ConnectionPool:
+    """
+    Thread-safe pool of PostgreSQL connections.
+
+    Idle connections are kept in LIFO order so the most recently used one is
+    handed out first. Connections idle for longer than idle_timeout are
+    closed (down to min_size), and a connection that has been idle for more
+    than health_check_after seconds is pinged with SELECT 1 before checkout.
+    """
+
+    def __init__(self, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE,
+                 idle_timeout=POOL_IDLE_TIMEOUT, checkout_timeout=POOL_CHECKOUT_TIMEOUT,
+                 health_check=POOL_HEALTH_CHECK, health_check_after=POOL_HEALTH_CHECK_AFTER):
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size, self.min_size)
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.health_check = health_check
+        self.health_check_after = health_check_after
+        self.pid = os.getpid()
+        self._idle = []
+        self._in_use = 0
+        self._cond = threading.Condition(threading.Lock())
+        self._closed = False
+
+    def _is_healthy(self, conn, idle_for):
+        if conn.closed:
+            return False
+        if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+            return False
+        if not self.health_check or idle_for < self.health_check_after:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _prune_idle(self, now):
+        expired = []
+        while len(self._idle) > self.min_size:
+            conn, released_at = self._idle[0]
+            if now - released_at < self.idle_timeout:
+                break
+            expired.append(self._idle.pop(0)[0])
+        return expired
+
+    def getconn(self):
+        """Check out a connection, blocking up to checkout_timeout when exhausted."""
+        deadline = time.monotonic() + self.checkout_timeout
+        while True:
+            candidate = None
+            expired = []
+            exhausted = False
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise psycopg2.pool.PoolError("connection pool is closed")
+                    now = time.monotonic()
+                    expired.extend(self._prune_idle(now))
+                    if self._idle:
+                        candidate = self._idle.pop()
+                        break
+                    if self._in_use < self.max_size:
+                        break
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        exhausted = True
+                        break
+                    self._cond.wait(remaining)
+                if not exhausted:
+                    self._in_use += 1
+
+            for conn in expired:
+                _close_quietly(conn)
+            if exhausted:
+                raise psycopg2.pool.PoolError(
+                    f"connection pool exhausted ({self.max_size} connections in use)"
+                )
+
+            if candidate is None:
+                try:
+                    return get_db_connection()
+                except Exception:
+                    self._release_slot()
+                    raise
+
+            conn, released_at = candidate
+            if self._is_healthy(conn, time.monotonic() - released_at):
+                return conn
+            _close_quietly(conn)
+            self._release_slot()
+
+    def _release_slot(self):
+        with self._cond:
+            self._in_use = max(0, self._in_use - 1)
+            self._cond.notify()
+
+    def putconn(self, conn, discard=False):
+        """Return a connection to the pool, closing it if it is broken."""
+        if not discard and not conn.closed:
+            try:
+                if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                discard = True
+
+        with self._cond:
+            self._in_use = max(0, self._in_use - 1)
+            if not discard and not conn.closed and not self._closed:
+                self._idle.append((conn, time.monotonic()))
+                conn = None
+            self._cond.notify()
+
+        if conn is not None:
+            _close_quietly(conn)
+
+    def closeall(self):
+        """Close every idle connection and refuse further checkouts."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for conn, _ in idle:
+            _close_quietly(conn)
+
+    def stats(self):
+        with self._cond:
+            return {'idle': len(self._idle), 'in_use': self._in_use, 'max_size': self.max_size}
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_inherited_pools = []
+
+
+def _reset_pool_after_fork():
+    # Keep a reference to the parent's pool so its connections are never
+    # garbage collected (and closed) from inside the child process.
+    global _pool, _pool_lock
+    if _pool is not None:
+        _inherited_pools.append(_pool)
+    _pool = None
+    _pool_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_pool_after_fork)
+
+
+def get_pool():
+    """
+    Return this process's connection pool, creating it on first use.
+
+    The pool is created lazily and tied to the PID that created it, so each
+    gunicorn pre-fork worker builds its own. Connections inherited from the
+    parent are kept referenced but never used or closed in the child, which
+    leaves the parent's sockets untouched.
+    """
+    global _pool
+    pool = _pool
+    if pool is not None and pool.pid == os.getpid():
+        return pool
+    with _pool_lock:
+        if _pool is not None and _pool.pid != os.getpid():
+            _inherited_pools.append(_pool)
+            _pool = None
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
+
+
+def close_pool():
+    """Close the current process's pool, e.g. from a gunicorn worker_exit hook."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool.pid == os.getpid():
+            _pool.closeall()
+        _pool = None
+
+
+@contextmanager
+def pooled_connection():
+    """
+    Context manager that checks a connection out of the pool and returns it.
+    Connections that raised a connection-level error are discarded. The
+    time from checkout to return is recorded as the 'db' phase.
+    """
+    started = time.perf_counter()
+    pool = get_pool()
+    conn = pool.getconn()
+    discard = False
+    try:
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        discard = True
+        raise
+    finally:
+        pool.putconn(conn, discard=discard)
+        if METRICS_ENABLED:
+            observe_phase('db', time.perf_counter() - started)
+
+
 def execute_query(query, params=None, fetch=False, fetchone=False):
     """
     Execute a SQL query with optional parameters.
-    
+
+    Connection checkout, execute and fetch times and the row count are
+    recorded per statement fingerprint (utils.query_profile); statements
+    slower than QUERY_SLOW_MS go to the slow-query log.
+
     Args:
         query: SQL query string
         params: Tuple of parameters for the query
         fetch: If True, fetch all results
         fetchone: If True, fetch only one result
-    
+
     Returns:
         Query results if fetch/fetchone is True, else None
     """
-    conn = None
+    started = time.perf_counter()
+    with pooled_connection() as conn:
+        connected = time.perf_counter()
+        executed = None
+        rows = 0
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            executed = time.perf_counter()
+
+            result = None
+            if fetchone:
+                result = cursor.fetchone()
+                rows = int(result is not None)
+            elif fetch:
+                result = cursor.fetchall()
+                rows = len(result)
+            else:
+                rows = max(0, cursor.rowcount)
+
+            conn.commit()
+            if PROFILE_ENABLED:
+                finished = time.perf_counter()
+                if record_query(query, connected - started, executed - connected, finished - executed, rows):
+                    _explain_slow_query(conn, query, params)
+            return result
+        except psycopg2.Error as e:
+            if not conn.closed:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    pass
+            print(f"Query execution error: {e}")
+            if PROFILE_ENABLED:
+                failed = time.perf_counter()
+                executed = executed or failed
+                record_query(query, connected - started, executed - connected, failed - executed, rows, error=True)
+            raise
+
+
+def _explain_slow_query(conn, query, params):
+    """Attach the EXPLAIN plan of a slow statement to the slow-query log (see explain_options)."""
+    if not should_explain(query):
+        return
+    cursor = conn.cursor(cursor_factory=extensions.cursor)
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        
-        result = None
-        if fetchone:
-            result = cursor.fetchone()
-        elif fetch:
-            result = cursor.fetchall()
-        
-        conn.commit()
-        return result
+        cursor.execute(f"{explain_options(query)} {query}", params)
+        attach_explain(query, '\n'.join(row[0] for row in cursor.fetchall()))
     except psycopg2.Error as e:
-        if conn:
-            conn.rollback()
-        print(f"Query execution error: {e}")
-        raise
+        print(f"EXPLAIN failed: {e}")
     finally:
-        if conn:
-            conn.close()
+        cursor.close()
+        conn.rollback()
+
+
+class _BinaryCopyArray:
+    """
+    File-like sink for COPY ... TO STDOUT (FORMAT binary) that decodes rows of
+    non-null float8 columns straight into a 2-D NumPy array.
+
+    psycopg2 calls write() once per row, so rows are only buffered there and
+    decoded in blocks with one structured-array view each.
+    """
+
+    BLOCK_BYTES = 1 << 20
+
+    def __init__(self, n_columns, dtype=np.float64, row_hint=None):
+        self.n_columns = n_columns
+        self.row_dtype = np.dtype(
+            [('fields', '>i2')] +
+            [item for i in range(n_columns) for item in ((f'len{i}', '>i4'), (f'val{i}', '>f8'))]
+        )
+        self.out = np.empty((max(1, row_hint or FETCH_BATCH_ROWS), n_columns), dtype=dtype)
+        self.rows = 0
+        self._header = True
+        self._buffer = bytearray()
+        self._pending = []
+        self._pending_bytes = 0
+
+    def write(self, data):
+        self._pending.append(data)
+        self._pending_bytes += len(data)
+        if self._pending_bytes >= self.BLOCK_BYTES:
+            self._decode()
+        return len(data)
+
+    def _decode(self):
+        self._buffer += b''.join(self._pending)
+        self._pending = []
+        self._pending_bytes = 0
+
+        if self._header:
+            if len(self._buffer) < 19:
+                return
+            if bytes(self._buffer[:11]) != COPY_BINARY_SIGNATURE:
+                raise ValueError("Unexpected COPY binary signature")
+            extension = int.from_bytes(self._buffer[15:19], 'big')
+            del self._buffer[:19 + extension]
+            self._header = False
+
+        count = len(self._buffer) // self.row_dtype.itemsize
+        if count == 0:
+            return
+        rows = np.frombuffer(self._buffer, dtype=self.row_dtype, count=count)
+        if (rows['fields'] != self.n_columns).any():
+            raise ValueError("COPY row has an unexpected number of fields")
+
+        if self.rows + count > len(self.out):
+            grown = np.empty((max(self.rows + count, 2 * len(self.out)), self.n_columns),
+                             dtype=self.out.dtype)
+            grown[:self.rows] = self.out[:self.rows]
+            self.out = grown
+        block = self.out[self.rows:self.rows + count]
+        for i in range(self.n_columns):
+            block[:, i] = rows[f'val{i}']
+        self.rows += count
+        del rows
+        del self._buffer[:count * self.row_dtype.itemsize]
+
+    def result(self):
+        self._decode()
+        if bytes(self._buffer) != b'\xff\xff':
+            raise ValueError("COPY stream ended without the binary trailer")
+        if self.rows < len(self.out) * 0.75:
+            return self.out[:self.rows].copy()
+        return self.out[:self.rows]
+
+
+def _numeric_select(query, columns):
+    select = ', '.join(f"COALESCE(q.{col}::float8, 'NaN'::float8)" for col in columns)
+    return f"SELECT {select} FROM ({query}) AS q"
+
+
+def fetch_array(query, columns, params=None, dtype=np.float64, row_hint=None):
+    """
+    Load numeric query results into an (N, len(columns)) NumPy array.
+
+    The query is streamed with binary COPY and decoded in blocks, so no
+    per-row Python objects are built. NULLs become NaN.
+
+    Args:
+        query: SELECT statement returning at least the given columns
+        columns: Column names to load, in output column order
+        params: Optional parameters for the query
+        dtype: Output dtype (float64 or float32)
+        row_hint: Expected row count, used to preallocate the array
+
+    Returns:
+        NumPy array with one row per result row
+    """
+    sink = _BinaryCopyArray(len(columns), dtype=dtype, row_hint=row_hint)
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            sql = _numeric_select(query, columns)
+            if params is not None:
+                sql = cursor.mogrify(sql, params).decode('utf-8')
+            cursor.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT binary)", sink)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+    return sink.result()
+
+
+_cursor_ids = itertools.count()
+
+
+def iter_array_batches(query, columns, params=None, dtype=np.float64, batch_rows=FETCH_BATCH_ROWS):
+    """
+    Stream numeric query results through a server-side (named) cursor.
+
+    Yields (n, len(columns)) arrays of at most batch_rows rows, so memory
+    stays bounded by one batch however large the result is. NULLs become NaN.
+    """
+    with pooled_connection() as conn:
+        cursor = conn.cursor(name=f'iter_array_{os.getpid()}_{next(_cursor_ids)}',
+                             cursor_factory=extensions.cursor)
+        try:
+            cursor.execute(_numeric_select(query, columns), params)
+            while True:
+                rows = cursor.fetchmany(batch_rows)
+                if not rows:
+                    break
+                yield np.array(rows, dtype=dtype)
+            cursor.close()
+            conn.commit()
+        except BaseException:
+            if not cursor.closed:
+                cursor.close()
+            conn.rollback()
+            raise
 
 
 def test_connection():
@@ -1,5 +1,7 @@
 import re
+import math
 from datetime import datetime
+import numpy as np
 import pytz
 
 FEATURE_ORDER = [
@@ -111,12 +113,37 @@ def validate_prediction_input(value, field_name):
     """
     if value is None or value == '':
         return False, None, f"{field_name} is required"
+    if isinstance(value, bool):
+        return False, None, f"{field_name} must be a valid number"
     
     try:
         float_val = float(value)
-        return True, float_val, ""
     except (ValueError, TypeError):
         return False, None, f"{field_name} must be a valid number"
+    if not math.isfinite(float_val):
+        return False, None, f"{field_name} must be a finite number"
+    return True, float_val, ""
+
+
+# EPA AQI categories: code i covers AQI_BREAKPOINTS[i-1] < aqi <= AQI_BREAKPOINTS[i].
+AQI_BREAKPOINTS = (50, 100, 150, 200, 300)
+AQI_CATEGORIES = (
+    "Good", "Moderate", "Unhealthy for Sensitive Groups",
+    "Unhealthy", "Very Unhealthy", "Hazardous"
+)
+AQI_COLORS = ("#00e400", "#ffff00", "#ff7e00", "#ff0000", "#8f3f97", "#7e0023")
+AQI_MESSAGES = (
+    "Air quality is satisfactory. Enjoy outdoor activities.",
+    "Air quality is acceptable. Sensitive individuals should limit outdoor exertion.",
+    "Sensitive groups may experience health effects. Reduce prolonged outdoor exertion.",
+    "Everyone may experience health effects. Avoid prolonged outdoor exertion.",
+    "Health alert: everyone may experience serious health effects. Stay indoors.",
+    "Health warning: emergency conditions. Everyone should avoid all outdoor activities."
+)
+
+_AQI_BREAKPOINTS_ARRAY = np.array(AQI_BREAKPOINTS, dtype=np.float64)
+_AQI_CATEGORIES_ARRAY = np.array(AQI_CATEGORIES, dtype=object)
+_AQI_COLORS_ARRAY = np.array(AQI_COLORS, dtype=object)
 
 
 def get_aqi_category(aqi):
@@ -127,17 +154,57 @@ def get_aqi_category(aqi):
     aqi = float(aqi)
     
     if aqi <= 50:
-        return "Good", "#00e400", "Air quality is satisfactory. Enjoy outdoor activities."
+        code = 0
     elif aqi <= 100:
-        return "Moderate", "#ffff00", "Air quality is acceptable. Sensitive individuals should limit outdoor exertion."
+        code = 1
     elif aqi <= 150:
-        return "Unhealthy for Sensitive Groups", "#ff7e00", "Sensitive groups may experience health effects. Reduce prolonged outdoor exertion."
+        code = 2
     elif aqi <= 200:
-        return "Unhealthy", "#ff0000", "Everyone may experience health effects. Avoid prolonged outdoor exertion."
+        code = 3
     elif aqi <= 300:
-        return "Very Unhealthy", "#8f3f97", "Health alert: everyone may experience serious health effects. Stay indoors."
+        code = 4
     else:
-        return "Hazardous", "#7e0023", "Health warning: emergency conditions. Everyone should avoid all outdoor activities."
+        code = 5
+    return AQI_CATEGORIES[code], AQI_COLORS[code], AQI_MESSAGES[code]
+
+
+def aqi_category_codes(aqi):
+    """
+    Return the AQI category code (index into AQI_CATEGORIES) of every value.
+
+    searchsorted with side='left' puts a value equal to a breakpoint in the
+    lower category, and NaN sorts past every breakpoint (Hazardous), both
+    exactly as get_aqi_category does.
+    """
+    return np.searchsorted(_AQI_BREAKPOINTS_ARRAY, np.asarray(aqi, dtype=np.float64), side='left')
+
+
+def categorize_aqi(aqi):
+    """
+    Categorize a whole array of AQI values at once.
+
+    Returns:
+        Tuple (codes, categories, colors) of arrays shaped like aqi
+    """
+    codes = aqi_category_codes(aqi)
+    return codes, _AQI_CATEGORIES_ARRAY[codes], _AQI_COLORS_ARRAY[codes]
+
+
+def aqi_category_counts(aqi):
+    """Return {category: count} for an array of AQI values (empty categories omitted)."""
+    counts = np.bincount(np.ravel(aqi_category_codes(aqi)), minlength=len(AQI_CATEGORIES))
+    return {AQI_CATEGORIES[i]: int(c) for i, c in enumerate(counts) if c}
+
+
+def aqi_category_sql(column='aqi', codes=False):
+    """
+    SQL CASE expression giving the same category as get_aqi_category, for
+    GROUP BY in PostgreSQL. With codes=True it yields the category code.
+    """
+    labels = list(range(len(AQI_CATEGORIES))) if codes else [f"'{name}'" for name in AQI_CATEGORIES]
+    whens = '\n'.join(f"    WHEN {column} <= {bound} THEN {label}"
+                       for bound, label in zip(AQI_BREAKPOINTS, labels))
+    return f"CASE\n{whens}\n    ELSE {labels[-1]}\nEND"
 
 
 def sanitize_float(value, default=0.0):
@@ -175,3 +242,30 @@ def validate_csv_columns(columns):
         return False, f"Missing required columns: {', '.join(missing)}"
     
     return True, ""
+
+
+def map_csv_columns(columns):
+    """
+    Map CSV column names onto FEATURE_ORDER + AQI names.
+    Uses the same matching rules as validate_csv_columns.
+    Returns dict {original_column: canonical_name}
+
+    A column already named exactly like a canonical name keeps it; other
+    columns matching that name are left unmapped (and so ignored), so the
+    renamed frame never has two columns with the same name.
+    """
+    canonical = FEATURE_ORDER + ['AQI']
+    mapping = {}
+    taken = {col for col in columns if col in canonical}
+    for col in columns:
+        if col in taken:
+            continue
+        col_clean = str(col).strip().lower().replace(' ', '_')
+        for feature in canonical:
+            req = feature.lower().replace(' ', '_')
+            if col_clean == req or col_clean.replace('_', '') == req.replace('_', ''):
+                if feature not in taken:
+                    mapping[col] = feature
+                    taken.add(feature)
+                break
+    return mapping
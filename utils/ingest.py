@@ -0,0 +1,149 @@
+import io
+import os
+import time
+import numpy as np
+import pandas as pd
+
+from utils.helpers import FEATURE_ORDER, map_csv_columns, validate_csv_columns
+from utils.db_connect import pooled_connection
+
+AIRDATA_COLUMNS = FEATURE_ORDER + ['AQI']
+AIRDATA_DB_COLUMNS = [col.lower() for col in AIRDATA_COLUMNS]
+COPY_CHUNK_ROWS = int(os.environ.get('INGEST_COPY_CHUNK_ROWS', '50000'))
+CSV_CHUNK_ROWS = int(os.environ.get('INGEST_CSV_CHUNK_ROWS', '100000'))
+
+COPY_AIRDATA_SQL = (
+    f"COPY airdata ({', '.join(AIRDATA_DB_COLUMNS)}) "
+    "FROM STDIN WITH (FORMAT binary)"
+)
+
+# PostgreSQL binary COPY layout: signature, flags, header extension length,
+# then per tuple an int16 field count and (int32 length, float4 value) pairs.
+COPY_BINARY_HEADER = b'PGCOPY\n\xff\r\n\x00' + (0).to_bytes(4, 'big') + (0).to_bytes(4, 'big')
+COPY_BINARY_TRAILER = (-1).to_bytes(2, 'big', signed=True)
+_COPY_ROW_DTYPE = np.dtype(
+    [('fields', '>i2')] +
+    [item for i in range(len(AIRDATA_COLUMNS)) for item in ((f'len{i}', '>i4'), (f'val{i}', '>f4'))]
+)
+
+
+def clean_airdata_frame(df):
+    """
+    Normalize an uploaded DataFrame into the airdata column layout.
+
+    Columns are mapped with map_csv_columns, values are coerced with
+    pd.to_numeric(errors='coerce') and rows with any missing or infinite
+    value dropped.
+
+    Returns:
+        Tuple (clean_df, rejected_rows)
+    """
+    df = df.rename(columns=map_csv_columns(df.columns))
+
+    for col in AIRDATA_COLUMNS:
+        if col not in df.columns:
+            raise ValueError(f"Missing required column: {col}")
+
+    clean = df[AIRDATA_COLUMNS].apply(pd.to_numeric, errors='coerce')
+    clean = clean.replace([np.inf, -np.inf], np.nan).dropna()
+    return clean, len(df) - len(clean)
+
+
+def read_airdata_csv(source, chunk_rows=CSV_CHUNK_ROWS):
+    """
+    Parse a CSV file or stream lazily into DataFrame chunks.
+
+    The header is checked with validate_csv_columns before any rows are
+    yielded, and only one chunk of chunk_rows rows is held at a time, so
+    memory use does not depend on the size of the upload.
+
+    Args:
+        source: Path or readable binary/text stream
+        chunk_rows: Rows per parsed chunk
+
+    Yields:
+        Raw DataFrame chunks
+    """
+    reader = pd.read_csv(source, chunksize=chunk_rows)
+    try:
+        first = True
+        for chunk in reader:
+            if first:
+                valid, msg = validate_csv_columns(chunk.columns.tolist())
+                if not valid:
+                    raise ValueError(msg)
+                first = False
+            yield chunk
+    finally:
+        reader.close()
+
+
+def encode_airdata_copy(values):
+    """
+    Encode an (N, 9) array of airdata values as a binary COPY payload.
+    Values are stored as float4 to match the REAL airdata columns.
+    """
+    rows = np.empty(len(values), dtype=_COPY_ROW_DTYPE)
+    rows['fields'] = len(AIRDATA_COLUMNS)
+    for i in range(len(AIRDATA_COLUMNS)):
+        rows[f'len{i}'] = 4
+        rows[f'val{i}'] = values[:, i]
+    return COPY_BINARY_HEADER + rows.tobytes() + COPY_BINARY_TRAILER
+
+
+def copy_airdata_chunk(cursor, df):
+    """Stream one cleaned DataFrame chunk into airdata with COPY FROM STDIN."""
+    payload = encode_airdata_copy(df.to_numpy(dtype=np.float32))
+    cursor.copy_expert(COPY_AIRDATA_SQL, io.BytesIO(payload))
+
+
+def ingest_airdata(frames, chunk_rows=COPY_CHUNK_ROWS, on_chunk=None, before_commit=None):
+    """
+    Clean and bulk-load DataFrames into airdata in a single transaction.
+
+    Each frame is cleaned with clean_airdata_frame and sent to PostgreSQL
+    with binary COPY in slices of at most chunk_rows rows, so the buffer held
+    in memory never grows beyond one slice.
+
+    Args:
+        frames: Iterable of raw DataFrames with validated columns
+        chunk_rows: Maximum rows per COPY buffer
+        on_chunk: Optional callable receiving each cleaned frame after it
+            has been sent (used to maintain incremental statistics)
+        before_commit: Optional callable receiving the cursor after the last
+            chunk, run inside the same transaction just before commit
+
+    Returns:
+        Dictionary with rows, rejected, seconds and rows_per_sec
+    """
+    started = time.perf_counter()
+    rows = 0
+    rejected = 0
+
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            for frame in frames:
+                clean, bad = clean_airdata_frame(frame)
+                rejected += bad
+                for offset in range(0, len(clean), chunk_rows):
+                    copy_airdata_chunk(cursor, clean.iloc[offset:offset + chunk_rows])
+                if on_chunk is not None:
+                    on_chunk(clean)
+                rows += len(clean)
+            if before_commit is not None:
+                before_commit(cursor)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    seconds = time.perf_counter() - started
+    return {
+        'rows': rows,
+        'rejected': rejected,
+        'seconds': seconds,
+        'rows_per_sec': rows / seconds if seconds > 0 else 0.0
+    }
@@ -0,0 +1,160 @@
+import os
+import time
+import threading
+from bisect import bisect_left
+from functools import wraps
+
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+METRICS_PREFIX = 'aurora'
+
+# Seconds; the last (implicit) bucket is +Inf.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PHASES = ('db', 'preprocess', 'inference', 'render')
+
+
+class Histogram:
+    """
+    Fixed-bucket latency histogram.
+
+    observe() does a bisect and two in-place additions with no lock and no
+    allocation. Updates rely on the GIL, so under heavy contention an
+    increment can occasionally be lost, which is fine for monitoring.
+    Buckets are stored per bucket and made cumulative when exported.
+    """
+
+    __slots__ = ('buckets', 'counts', 'sum')
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+
+    def snapshot(self):
+        """Return (cumulative bucket counts, sum, count)."""
+        counts = list(self.counts)
+        cumulative = []
+        total = 0
+        for count in counts:
+            total += count
+            cumulative.append(total)
+        return cumulative, self.sum, total
+
+
+_request_histograms = {}
+_phase_histograms = {phase: Histogram() for phase in PHASES}
+_status_counts = {}
+_create_lock = threading.Lock()
+_in_flight_lock = threading.Lock()
+_in_flight = [0]
+
+
+def _request_histogram(endpoint):
+    histogram = _request_histograms.get(endpoint)
+    if histogram is None:
+        with _create_lock:
+            histogram = _request_histograms.setdefault(endpoint, Histogram())
+    return histogram
+
+
+def request_started():
+    """Mark a request as in flight and return its start time."""
+    with _in_flight_lock:
+        _in_flight[0] += 1
+    return time.perf_counter()
+
+
+def request_finished(endpoint, started):
+    """Record a request's latency under its endpoint and drop it from in-flight."""
+    with _in_flight_lock:
+        _in_flight[0] -= 1
+    _request_histogram(endpoint or 'unmatched').observe(time.perf_counter() - started)
+
+
+def count_response(endpoint, method, status):
+    key = (endpoint or 'unmatched', method, status)
+    try:
+        _status_counts[key] += 1
+    except KeyError:
+        with _create_lock:
+            _status_counts[key] = _status_counts.get(key, 0) + 1
+
+
+def observe_phase(phase, seconds):
+    """Add a duration to one of the PHASES histograms."""
+    _phase_histograms[phase].observe(seconds)
+
+
+def timed(phase):
+    """Decorator recording each call's duration in the given phase histogram."""
+    histogram = _phase_histograms[phase]
+
+    def decorator(f):
+        if not METRICS_ENABLED:
+            return f
+
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _histogram_lines(name, label, histograms):
+    lines = []
+    for key, histogram in sorted(histograms.items()):
+        cumulative, total_sum, count = histogram.snapshot()
+        labels = f'{label}="{_escape(key)}"'
+        for bound, value in zip(histogram.buckets, cumulative):
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {value}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {count}')
+        lines.append(f'{name}_sum{{{labels}}} {total_sum}')
+        lines.append(f'{name}_count{{{labels}}} {count}')
+    return lines
+
+
+def render_prometheus(extra_gauges=None):
+    """
+    Return all metrics of this process in the Prometheus text format (0.0.4).
+
+    Args:
+        extra_gauges: Optional {name: (help, value)} appended as gauges
+    """
+    request_name = f'{METRICS_PREFIX}_request_duration_seconds'
+    phase_name = f'{METRICS_PREFIX}_phase_duration_seconds'
+    total_name = f'{METRICS_PREFIX}_requests_total'
+    in_flight_name = f'{METRICS_PREFIX}_requests_in_flight'
+
+    lines = [f'# HELP {request_name} Request latency by Flask endpoint.',
+             f'# TYPE {request_name} histogram']
+    lines += _histogram_lines(request_name, 'endpoint', dict(_request_histograms))
+
+    lines += [f'# HELP {phase_name} Time spent in DB calls, preprocessing, model inference and rendering.',
+              f'# TYPE {phase_name} histogram']
+    lines += _histogram_lines(phase_name, 'phase', _phase_histograms)
+
+    lines += [f'# HELP {total_name} Responses by endpoint, method and status.',
+              f'# TYPE {total_name} counter']
+    for (endpoint, method, status), count in sorted(dict(_status_counts).items()):
+        lines.append(f'{total_name}{{endpoint="{_escape(endpoint)}",method="{method}",status="{status}"}} {count}')
+
+    lines += [f'# HELP {in_flight_name} Requests currently being handled.',
+              f'# TYPE {in_flight_name} gauge',
+              f'{in_flight_name} {_in_flight[0]}']
+
+    for name, (help_text, value) in (extra_gauges or {}).items():
+        lines += [f'# HELP {METRICS_PREFIX}_{name} {help_text}',
+                  f'# TYPE {METRICS_PREFIX}_{name} gauge',
+                  f'{METRICS_PREFIX}_{name} {value}']
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,208 @@
+import struct
+import zipfile
+
+import numpy as np
+from sklearn.linear_model import LinearRegression
+from xgboost import XGBRegressor
+
+# sklearn marks leaves with feature -2 and children -1.
+LEAF_FEATURE = -2
+PREDICT_CHUNK_ROWS = 4096
+
+_ZIP_LOCAL_HEADER = struct.Struct('<4s5H3L2H')
+
+
+def save_npz(arrays, path):
+    """Write arrays to an uncompressed .npz so load_npz can memory-map them."""
+    with open(path, 'wb') as f:
+        np.savez(f, **arrays)
+
+
+def load_npz(path):
+    """
+    Load an uncompressed .npz with every member memory-mapped read-only.
+
+    Each member of an np.savez archive is a stored (not deflated) .npy
+    file, so its data can be mapped straight from the archive: nothing is
+    copied, and gunicorn workers mapping the same file share its pages
+    through the page cache. Compressed members are read normally.
+
+    Returns:
+        Dictionary mapping member names (without .npy) to arrays
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as f:
+        for info in archive.infolist():
+            name = info.filename[:-4] if info.filename.endswith('.npy') else info.filename
+            if info.compress_type != zipfile.ZIP_STORED:
+                with archive.open(info) as member:
+                    arrays[name] = np.lib.format.read_array(member)
+                continue
+
+            f.seek(info.header_offset)
+            header = _ZIP_LOCAL_HEADER.unpack(f.read(_ZIP_LOCAL_HEADER.size))
+            f.seek(info.header_offset + _ZIP_LOCAL_HEADER.size + header[-2] + header[-1])
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+
+            if dtype.hasobject:
+                raise ValueError(f"{path}: member {name} holds Python objects")
+            if not shape:
+                arrays[name] = np.fromfile(f, dtype=dtype, count=1).reshape(())
+            elif int(np.prod(shape)) == 0:
+                arrays[name] = np.empty(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=f.tell(), shape=shape,
+                                         order='F' if fortran_order else 'C')
+    return arrays
+
+
+class FlatForest:
+    """
+    Random forest regressor stored as flat node arrays.
+
+    All trees share one set of arrays (left, right, feature, threshold,
+    value) with child indices already offset into them, and roots holds
+    the index of each tree's root. Prediction walks every tree at once,
+    one level per step, and averages the leaf values, matching
+    RandomForestRegressor.predict (inputs are compared as float32, as
+    sklearn does).
+    """
+
+    ARRAYS = ('left', 'right', 'feature', 'threshold', 'value', 'roots', 'tree_importances')
+
+    def __init__(self, left, right, feature, threshold, value, roots, tree_importances, max_depth):
+        self.left = left
+        self.right = right
+        self.feature = feature
+        self.threshold = threshold
+        self.value = value
+        self.roots = roots
+        self.tree_importances = tree_importances
+        self.max_depth = int(max_depth)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Flatten a fitted RandomForestRegressor (single output)."""
+        left, right, feature, threshold, value, roots, importances = [], [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            is_leaf = tree.children_left < 0
+            left.append(np.where(is_leaf, -1, tree.children_left + offset))
+            right.append(np.where(is_leaf, -1, tree.children_right + offset))
+            feature.append(np.where(is_leaf, LEAF_FEATURE, tree.feature))
+            threshold.append(tree.threshold)
+            value.append(tree.value[:, 0, 0])
+            roots.append(offset)
+            importances.append(estimator.feature_importances_)
+            max_depth = max(max_depth, tree.max_depth)
+            offset += tree.node_count
+
+        return cls(
+            np.concatenate(left).astype(np.int32),
+            np.concatenate(right).astype(np.int32),
+            np.concatenate(feature).astype(np.int32),
+            np.concatenate(threshold).astype(np.float64),
+            np.concatenate(value).astype(np.float64),
+            np.asarray(roots, dtype=np.int32),
+            np.vstack(importances).astype(np.float64),
+            max_depth
+        )
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        return cls(*(arrays[name] for name in cls.ARRAYS), max_depth=arrays['max_depth'])
+
+    def to_arrays(self):
+        arrays = {name: np.ascontiguousarray(getattr(self, name)) for name in self.ARRAYS}
+        arrays['max_depth'] = np.asarray(self.max_depth, dtype=np.int64)
+        return arrays
+
+    def concat(self, other):
+        """Return a forest with the trees of both, all averaged with equal weight."""
+        offset = len(self.left)
+        shift = lambda children: np.where(children < 0, children, children + offset)
+        return FlatForest(
+            np.concatenate([self.left, shift(other.left)]),
+            np.concatenate([self.right, shift(other.right)]),
+            np.concatenate([self.feature, other.feature]),
+            np.concatenate([self.threshold, other.threshold]),
+            np.concatenate([self.value, other.value]),
+            np.concatenate([self.roots, other.roots + offset]),
+            np.vstack([self.tree_importances, other.tree_importances]),
+            max(self.max_depth, other.max_depth)
+        )
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    @property
+    def feature_importances_(self):
+        # sklearn averages the normalized importances of the trees that split.
+        splitting = self.tree_importances[self.tree_importances.sum(axis=1) > 0]
+        if len(splitting) == 0:
+            return np.zeros(self.tree_importances.shape[1])
+        importances = splitting.mean(axis=0)
+        return importances / importances.sum()
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        out = np.empty(len(X), dtype=np.float64)
+        for start in range(0, len(X), PREDICT_CHUNK_ROWS):
+            chunk = X[start:start + PREDICT_CHUNK_ROWS]
+            rows = np.arange(len(chunk))[:, None]
+            node = np.broadcast_to(self.roots, (len(chunk), len(self.roots))).copy()
+            for _ in range(self.max_depth):
+                feature = self.feature[node]
+                leaf = feature == LEAF_FEATURE
+                if leaf.all():
+                    break
+                go_left = chunk[rows, np.where(leaf, 0, feature)] <= self.threshold[node]
+                node = np.where(leaf, node, np.where(go_left, self.left[node], self.right[node]))
+            out[start:start + len(chunk)] = self.value[node].mean(axis=1)
+        return out
+
+
+def save_forest(model, path):
+    """Save a FlatForest (or a fitted RandomForestRegressor) as an .npz."""
+    if not isinstance(model, FlatForest):
+        model = FlatForest.from_sklearn(model)
+    save_npz(model.to_arrays(), path)
+
+
+def load_forest(path):
+    return FlatForest.from_arrays(load_npz(path))
+
+
+def save_linear(model, path):
+    """Save a fitted LinearRegression as its coefficients and intercept."""
+    save_npz({
+        'coef': np.asarray(model.coef_, dtype=np.float64),
+        'intercept': np.asarray(model.intercept_, dtype=np.float64)
+    }, path)
+
+
+def load_linear(path):
+    arrays = load_npz(path)
+    model = LinearRegression()
+    model.coef_ = np.array(arrays['coef'])
+    model.intercept_ = float(arrays['intercept'])
+    model.n_features_in_ = len(model.coef_)
+    return model
+
+
+def save_xgb(model, path):
+    """Save an XGBRegressor as a native UBJSON model (booster plus sklearn attributes)."""
+    model.save_model(path)
+
+
+def load_xgb(path):
+    model = XGBRegressor()
+    model.load_model(path)
+    return model
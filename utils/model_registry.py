@@ -0,0 +1,133 @@
+import os
+import time
+import threading
+import joblib
+
+CHECK_INTERVAL = float(os.environ.get('MODEL_REGISTRY_CHECK_INTERVAL', '1.0'))
+
+_registry = {}
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _path_lock(path):
+    with _locks_guard:
+        lock = _locks.get(path)
+        if lock is None:
+            lock = _locks[path] = threading.Lock()
+        return lock
+
+
+def get_artifact_version(path):
+    """
+    Return a version stamp for an artifact file, or None if it does not exist.
+    The stamp changes whenever the file is rewritten (mtime, size and inode).
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return f"{st.st_mtime_ns}-{st.st_size}-{st.st_ino}"
+
+
+def load_artifact(path, loader=joblib.load):
+    """
+    Return the resident object for an artifact, loading it on first use.
+
+    The file's version stamp is re-checked at most every CHECK_INTERVAL
+    seconds; when it changes the new object is fully loaded before it
+    replaces the old one, so callers never see a half-loaded model.
+
+    Args:
+        path: Path to the artifact file
+        loader: Callable that loads the file (joblib.load by default)
+
+    Returns:
+        Loaded object, or None if the file does not exist
+    """
+    now = time.monotonic()
+    entry = _registry.get(path)
+    if entry is not None and now - entry['checked'] < CHECK_INTERVAL:
+        return entry['object']
+
+    version = get_artifact_version(path)
+    if version is None:
+        _registry.pop(path, None)
+        return None
+    if entry is not None and entry['version'] == version:
+        entry['checked'] = now
+        return entry['object']
+
+    with _path_lock(path):
+        entry = _registry.get(path)
+        version = get_artifact_version(path)
+        if version is None:
+            return None
+        if entry is not None and entry['version'] == version:
+            entry['checked'] = time.monotonic()
+            return entry['object']
+
+        obj = loader(path)
+        _registry[path] = {'version': version, 'object': obj, 'checked': time.monotonic()}
+        return obj
+
+
+def save_artifact(obj, path, dumper=joblib.dump):
+    """
+    Atomically write an artifact and install it in this process's registry.
+
+    The object is dumped to a temporary file next to the target and moved
+    into place with os.replace, so other workers either see the old file or
+    the complete new one.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Keep the extension: some dumpers (e.g. XGBoost) pick the format from it.
+    root, ext = os.path.splitext(path)
+    tmp_path = f"{root}.{os.getpid()}.{threading.get_ident()}.tmp{ext}"
+    try:
+        dumper(obj, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    with _path_lock(path):
+        _registry[path] = {
+            'version': get_artifact_version(path),
+            'object': obj,
+            'checked': time.monotonic()
+        }
+    return path
+
+
+def install_artifact(staged_path, path):
+    """
+    Move an artifact written elsewhere (e.g. by save_artifact to a staging
+    path on the same filesystem) into place with os.replace. This process
+    loads the new file on next use; other workers on their next version
+    check.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(staged_path, path)
+    with _path_lock(path):
+        _registry.pop(path, None)
+        _registry.pop(staged_path, None)
+    return path
+
+
+def get_loaded_version(path, load=True, loader=joblib.load):
+    """
+    Return the version stamp of the resident object for path, if any.
+
+    With load=True the artifact is loaded (or re-checked) first with
+    loader; with load=False only what is already resident is reported.
+    """
+    if load:
+        load_artifact(path, loader=loader)
+    entry = _registry.get(path)
+    return entry['version'] if entry else None
+
+
+def clear_registry():
+    """Drop all resident artifacts so the next access reloads from disk."""
+    _registry.clear()
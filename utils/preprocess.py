@@ -1,12 +1,14 @@
 import os
+from functools import lru_cache
 import numpy as np
 import pandas as pd
 from sklearn.preprocessing import StandardScaler
 from sklearn.impute import SimpleImputer
 from sklearn.pipeline import Pipeline
-import joblib
 
 from utils.helpers import FEATURE_ORDER, sanitize_float
+from utils.model_registry import load_artifact, save_artifact
+from utils.instrumentation import timed
 
 MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'models')
 PREPROCESSOR_PATH = os.path.join(MODELS_DIR, 'preprocessor.pkl')
@@ -20,55 +22,165 @@ def build_preprocessor():
     return pipeline
 
 
-def fit_preprocessor(X):
-    os.makedirs(MODELS_DIR, exist_ok=True)
+def fit_preprocessor(X, save=True):
+    """Fit the preprocessor on raw X; save (install) it unless save=False."""
     preprocessor = build_preprocessor()
     preprocessor.fit(X)
-    joblib.dump(preprocessor, PREPROCESSOR_PATH)
+    if save:
+        save_preprocessor(preprocessor)
+    return preprocessor
+
+
+def save_preprocessor(preprocessor):
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    save_artifact(preprocessor, PREPROCESSOR_PATH)
     print(f"Preprocessor saved to {PREPROCESSOR_PATH}")
+
+
+def fit_preprocessor_streaming(batches, sample_rows=100000, random_state=42):
+    """
+    Fit and save the preprocessor from an iterable of raw (n, 8) batches
+    without holding them all in memory. The scaler is fitted exactly with
+    partial_fit; the imputer medians come from a uniform sample of at most
+    sample_rows rows (smallest random keys across all batches).
+    """
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    rng = np.random.default_rng(random_state)
+    scaler = StandardScaler()
+    sample = np.empty((0, len(FEATURE_ORDER)))
+    keys = np.empty(0)
+
+    for X in batches:
+        X = np.asarray(X, dtype=np.float64)
+        if len(X) == 0:
+            continue
+        scaler.partial_fit(X)
+        sample = np.vstack([sample, X])
+        keys = np.concatenate([keys, rng.random(len(X))])
+        if len(keys) > sample_rows:
+            keep = np.argpartition(keys, sample_rows)[:sample_rows]
+            sample, keys = sample[keep], keys[keep]
+
+    if len(sample) == 0:
+        raise ValueError("No rows to fit the preprocessor on")
+
+    preprocessor = Pipeline([
+        ('imputer', SimpleImputer(strategy='median').fit(sample)),
+        ('scaler', scaler)
+    ])
+    save_preprocessor(preprocessor)
     return preprocessor
 
 
 def load_preprocessor():
-    if os.path.exists(PREPROCESSOR_PATH):
-        return joblib.load(PREPROCESSOR_PATH)
-    return None
+    return load_artifact(PREPROCESSOR_PATH)
 
 
-def preprocess_data(data, fit=False):
-    if isinstance(data, dict):
-        df = pd.DataFrame([data])
-    elif isinstance(data, pd.DataFrame):
-        df = data.copy()
-    else:
-        df = pd.DataFrame(data)
+@lru_cache(maxsize=256)
+def resolve_feature_columns(columns):
+    """
+    Resolve which input column feeds each FEATURE_ORDER feature.
 
-    for col in FEATURE_ORDER:
-        col_lower = col.lower().replace(' ', '_')
-        matching_col = None
-        for c in df.columns:
-            if c.lower().replace(' ', '_') == col_lower:
-                matching_col = c
-                break
-        if matching_col and matching_col != col:
-            df.rename(columns={matching_col: col}, inplace=True)
+    Names are matched case-insensitively with spaces treated as underscores.
+    Results are cached per column tuple, so repeated batches with the same
+    schema skip the search entirely.
 
-    for col in FEATURE_ORDER:
-        if col not in df.columns:
-            df[col] = 0.0
-        else:
-            df[col] = df[col].apply(sanitize_float)
+    Args:
+        columns: Tuple of input column names
+
+    Returns:
+        Tuple with the matching input column (or None) for each feature
+    """
+    lookup = {}
+    for col in columns:
+        lookup.setdefault(str(col).lower().replace(' ', '_'), col)
+    return tuple(lookup.get(feature.lower().replace(' ', '_')) for feature in FEATURE_ORDER)
+
+
+def _coerce_column(series):
+    if series.dtype.kind in 'biuf':
+        return series.to_numpy(dtype=np.float64, na_value=np.nan)
+    numeric = pd.to_numeric(series, errors='coerce')
+    # Unparseable values become 0.0 as sanitize_float does; missing cells
+    # stay NaN and are filled by the preprocessor's median imputer.
+    numeric = numeric.where(numeric.notna() | series.isna(), 0.0)
+    return numeric.to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def features_to_array(data):
+    """
+    Build a contiguous float64 (N, 8) matrix in FEATURE_ORDER.
 
-    df = df[FEATURE_ORDER]
+    Accepts a dict for a single row (built directly as a NumPy row without
+    pandas), a DataFrame or records convertible to one, or an array whose
+    columns are already in FEATURE_ORDER. Missing features are filled
+    with 0.0.
+    """
+    if isinstance(data, dict):
+        columns = resolve_feature_columns(tuple(data.keys()))
+        row = [sanitize_float(data[col]) if col is not None else 0.0 for col in columns]
+        return np.array([row], dtype=np.float64)
+
+    if isinstance(data, np.ndarray):
+        return np.ascontiguousarray(data, dtype=np.float64).reshape(-1, len(FEATURE_ORDER))
+
+    df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+    columns = resolve_feature_columns(tuple(df.columns))
+
+    X = np.zeros((len(df), len(FEATURE_ORDER)), dtype=np.float64)
+    for i, col in enumerate(columns):
+        if col is not None:
+            X[:, i] = _coerce_column(df[col])
+    return X
+
+
+@timed('preprocess')
+def apply_preprocessor(preprocessor, X):
+    """
+    Transform a raw feature matrix with the fitted preprocessor.
+
+    For the standard median-imputer + StandardScaler pipeline the fitted
+    statistics are applied directly with NumPy, which avoids sklearn's
+    per-call input validation; anything else goes through transform().
+    """
+    steps = getattr(preprocessor, 'named_steps', {})
+    imputer = steps.get('imputer')
+    scaler = steps.get('scaler')
+    if (len(steps) != 2 or not isinstance(imputer, SimpleImputer) or not isinstance(scaler, StandardScaler)
+            or not (isinstance(imputer.missing_values, float) and np.isnan(imputer.missing_values))):
+        return preprocessor.transform(X)
+
+    X = np.where(np.isnan(X), imputer.statistics_, X)
+    if scaler.with_mean:
+        X -= scaler.mean_
+    if scaler.with_std:
+        X /= scaler.scale_
+    return X
+
+
+def preprocess_data(data, fit=False, preprocessor=None):
+    X = features_to_array(data)
 
     if fit:
-        preprocessor = fit_preprocessor(df.values)
-    else:
+        preprocessor = fit_preprocessor(X)
+    elif preprocessor is None:
         preprocessor = load_preprocessor()
         if preprocessor is None:
             raise ValueError("No preprocessor found. Please train models first.")
 
-    return preprocessor.transform(df.values)
+    return apply_preprocessor(preprocessor, X)
+
+
+def transform_features(X, preprocessor=None):
+    """
+    Apply the saved preprocessor to a raw (N, 8) feature matrix whose
+    columns are already in FEATURE_ORDER.
+    """
+    if preprocessor is None:
+        preprocessor = load_preprocessor()
+        if preprocessor is None:
+            raise ValueError("No preprocessor found. Please train models first.")
+    return apply_preprocessor(preprocessor, features_to_array(np.asarray(X, dtype=np.float64)))
 
 
 def prepare_training_data(df):
@@ -0,0 +1,189 @@
+import os
+import re
+import time
+import threading
+from collections import deque
+from functools import lru_cache
+
+PROFILE_ENABLED = os.environ.get('QUERY_PROFILE', '1') == '1'
+PROFILE_SAMPLES = int(os.environ.get('QUERY_PROFILE_SAMPLES', '512'))
+SLOW_QUERY_MS = float(os.environ.get('QUERY_SLOW_MS', '200'))
+SLOW_LOG_SIZE = int(os.environ.get('QUERY_SLOW_LOG_SIZE', '200'))
+# Capture EXPLAIN for slow statements (debug only). Plain SELECTs get
+# EXPLAIN (ANALYZE, BUFFERS), which runs them a second time; everything
+# else gets a plain EXPLAIN, which does not execute the statement.
+EXPLAIN_SLOW = os.environ.get('QUERY_EXPLAIN_SLOW', '0') == '1'
+EXPLAIN_INTERVAL = float(os.environ.get('QUERY_EXPLAIN_INTERVAL', '60'))
+QUERY_TEXT_LIMIT = 2000
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+_SELECT = re.compile(r"^\s*select\b", re.IGNORECASE)
+_WRITES = re.compile(
+    r"\bfor\s+(?:no\s+key\s+)?update\b|\bfor\s+(?:key\s+)?share\b|\b(?:nextval|setval)\s*\(",
+    re.IGNORECASE
+)
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(query):
+    """
+    Normalize a statement so calls that differ only in literals or
+    parameters share one entry: strings, numbers and %s placeholders
+    become ?, IN lists collapse to (?...), whitespace is collapsed.
+    """
+    text = _STRING.sub('?', query)
+    text = _PLACEHOLDER.sub('?', text)
+    text = _NUMBER.sub('?', text)
+    text = _IN_LIST.sub('(?...)', text)
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def _percentile(ordered, q):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+class StatementStats:
+    """Aggregated timings (seconds) and row counts for one fingerprint."""
+
+    __slots__ = ('calls', 'errors', 'total', 'connect', 'execute', 'fetch', 'rows', 'max', 'samples')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total = 0.0
+        self.connect = 0.0
+        self.execute = 0.0
+        self.fetch = 0.0
+        self.rows = 0
+        self.max = 0.0
+        self.samples = deque(maxlen=PROFILE_SAMPLES)
+
+    def to_dict(self, statement):
+        ordered = sorted(self.samples)
+        calls = max(1, self.calls)
+        return {
+            'statement': statement,
+            'calls': self.calls,
+            'errors': self.errors,
+            'total_ms': self.total * 1000,
+            'mean_ms': self.total / calls * 1000,
+            'p50_ms': _percentile(ordered, 0.50) * 1000,
+            'p95_ms': _percentile(ordered, 0.95) * 1000,
+            'p99_ms': _percentile(ordered, 0.99) * 1000,
+            'max_ms': self.max * 1000,
+            'connect_ms': self.connect * 1000,
+            'execute_ms': self.execute * 1000,
+            'fetch_ms': self.fetch * 1000,
+            'rows': self.rows,
+            'rows_per_call': self.rows / calls
+        }
+
+
+_stats = {}
+_slow_log = deque(maxlen=SLOW_LOG_SIZE)
+_explained_at = {}
+_lock = threading.Lock()
+
+
+def record_query(query, connect, execute, fetch, rows, error=False):
+    """
+    Add one statement's timings to its fingerprint's stats.
+
+    Returns:
+        True if the statement was slower than QUERY_SLOW_MS (and was logged)
+    """
+    total = connect + execute + fetch
+    key = fingerprint(query)
+    with _lock:
+        stats = _stats.get(key)
+        if stats is None:
+            stats = _stats[key] = StatementStats()
+        stats.calls += 1
+        stats.errors += int(error)
+        stats.total += total
+        stats.connect += connect
+        stats.execute += execute
+        stats.fetch += fetch
+        stats.rows += rows
+        stats.max = max(stats.max, total)
+        stats.samples.append(total)
+
+    if total * 1000 < SLOW_QUERY_MS:
+        return False
+    entry = {
+        'at': time.time(),
+        'statement': key,
+        'query': query[:QUERY_TEXT_LIMIT],
+        'total_ms': total * 1000,
+        'connect_ms': connect * 1000,
+        'execute_ms': execute * 1000,
+        'fetch_ms': fetch * 1000,
+        'rows': rows,
+        'error': error
+    }
+    with _lock:
+        _slow_log.append(entry)
+    print(f"Slow query ({total * 1000:.1f} ms, {rows} rows): {key[:200]}")
+    return True
+
+
+def explain_options(query):
+    """
+    Return the EXPLAIN prefix for a statement: with ANALYZE only for a plain
+    SELECT that takes no row locks and advances no sequences, since ANALYZE
+    executes the statement again.
+    """
+    if _SELECT.match(query) and not _WRITES.search(query):
+        return 'EXPLAIN (ANALYZE, BUFFERS)'
+    return 'EXPLAIN'
+
+
+def should_explain(query):
+    """True if a slow statement should get an EXPLAIN capture (debug, rate-limited)."""
+    if not EXPLAIN_SLOW:
+        return False
+    key = fingerprint(query)
+    now = time.monotonic()
+    with _lock:
+        if now - _explained_at.get(key, -EXPLAIN_INTERVAL) < EXPLAIN_INTERVAL:
+            return False
+        _explained_at[key] = now
+    return True
+
+
+def attach_explain(query, plan):
+    """Store an EXPLAIN plan on the newest slow-log entry for query."""
+    with _lock:
+        for entry in reversed(_slow_log):
+            if entry['query'] == query[:QUERY_TEXT_LIMIT]:
+                entry['plan'] = plan
+                break
+
+
+def top_statements(limit=20, sort='total_ms'):
+    """Return the aggregated stats of the top statements, sorted descending by sort."""
+    with _lock:
+        rows = [stats.to_dict(statement) for statement, stats in _stats.items()]
+    if rows and sort not in rows[0]:
+        sort = 'total_ms'
+    rows.sort(key=lambda row: row[sort], reverse=True)
+    return rows[:limit]
+
+
+def slow_queries(limit=50):
+    """Return the most recent slow-query log entries, newest first."""
+    with _lock:
+        return list(reversed(_slow_log))[:limit]
+
+
+def reset_profile():
+    with _lock:
+        _stats.clear()
+        _slow_log.clear()
+        _explained_at.clear()
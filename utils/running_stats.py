@@ -0,0 +1,116 @@
+import numpy as np
+
+
+class RunningStats:
+    """
+    Mergeable single-pass statistics for a fixed set of columns.
+
+    Keeps the row count, column means, min/max and the co-moment matrix
+    C[i, j] = sum((x_i - mean_i) * (x_j - mean_j)); its diagonal is the
+    Welford M2 of each column. Chunks are folded in with the pairwise
+    update of Chan et al., so statistics over a table can be maintained
+    from just the newly ingested rows.
+    """
+
+    def __init__(self, n_columns):
+        self.n_columns = n_columns
+        self.count = 0
+        self.mean = np.zeros(n_columns)
+        self.comoment = np.zeros((n_columns, n_columns))
+        self.min = np.full(n_columns, np.inf)
+        self.max = np.full(n_columns, -np.inf)
+
+    @classmethod
+    def from_array(cls, X):
+        """Build statistics for an (N, k) array in one vectorized pass."""
+        X = np.asarray(X, dtype=np.float64)
+        stats = cls(X.shape[1])
+        if len(X) == 0:
+            return stats
+        stats.count = len(X)
+        stats.mean = X.mean(axis=0)
+        centered = X - stats.mean
+        stats.comoment = centered.T @ centered
+        stats.min = X.min(axis=0)
+        stats.max = X.max(axis=0)
+        return stats
+
+    @classmethod
+    def from_moments(cls, count, mean, covariance_pop, minimum, maximum):
+        """Build statistics from a row count, means and population covariance."""
+        mean = np.asarray(mean, dtype=np.float64)
+        stats = cls(len(mean))
+        stats.count = int(count)
+        if stats.count == 0:
+            return stats
+        stats.mean = mean
+        stats.comoment = np.asarray(covariance_pop, dtype=np.float64) * stats.count
+        stats.min = np.asarray(minimum, dtype=np.float64)
+        stats.max = np.asarray(maximum, dtype=np.float64)
+        return stats
+
+    def merge(self, other):
+        """Fold another RunningStats over the same columns into this one."""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count = other.count
+            self.mean = other.mean.copy()
+            self.comoment = other.comoment.copy()
+            self.min = other.min.copy()
+            self.max = other.max.copy()
+            return self
+
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.comoment = (self.comoment + other.comoment +
+                         np.outer(delta, delta) * (self.count * other.count / total))
+        self.mean = self.mean + delta * (other.count / total)
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+        self.count = total
+        return self
+
+    def update(self, X):
+        """Fold an (N, k) chunk of rows into the statistics."""
+        return self.merge(RunningStats.from_array(X))
+
+    @property
+    def m2(self):
+        return np.diag(self.comoment).copy()
+
+    def variance(self, ddof=1):
+        if self.count <= ddof:
+            return np.full(self.n_columns, np.nan)
+        return self.m2 / (self.count - ddof)
+
+    def std(self, ddof=1):
+        return np.sqrt(self.variance(ddof))
+
+    def correlation(self):
+        """Pearson correlation matrix, NaN where a column has zero variance."""
+        m2 = self.m2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = self.comoment / np.sqrt(np.outer(m2, m2))
+        corr[~np.isfinite(corr)] = np.nan
+        return corr
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'mean': self.mean.tolist(),
+            'comoment': self.comoment.tolist(),
+            'min': self.min.tolist(),
+            'max': self.max.tolist()
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        mean = np.asarray(data['mean'], dtype=np.float64)
+        stats = cls(len(mean))
+        stats.count = int(data['count'])
+        stats.mean = mean
+        stats.comoment = np.asarray(data['comoment'], dtype=np.float64)
+        stats.min = np.asarray(data['min'], dtype=np.float64)
+        stats.max = np.asarray(data['max'], dtype=np.float64)
+        return stats